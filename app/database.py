@@ -1,24 +1,100 @@
 # app/database.py
 
-from sqlalchemy import create_engine, MetaData
+from contextlib import asynccontextmanager
+from sqlalchemy import create_engine, event, MetaData
+from sqlalchemy.ext.asyncio import create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-from databases import Database
+import asyncio
+import logging
 import os
 
+from app.services.telemetry import gauge
+
+log = logging.getLogger(__name__)
+
 # --- Configuración Táctica: Nuevo nombre de DB para evitar bloqueos ---
 DB_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'db')
 os.makedirs(DB_DIR, exist_ok=True)
 DATABASE_FILE = "adgenie_v3.db" # 👈 Nombre de archivo nuevo
-SQLALCHEMY_DATABASE_URL = f"sqlite:///{os.path.join(DB_DIR, DATABASE_FILE)}"
+# ADGENIE_DB_PATH permite apuntar a otra base (benchmarks, entornos locales)
+DATABASE_PATH = os.getenv("ADGENIE_DB_PATH", os.path.join(DB_DIR, DATABASE_FILE))
+SQLALCHEMY_DATABASE_URL = f"sqlite:///{DATABASE_PATH}"
+ASYNC_DATABASE_URL = f"sqlite+aiosqlite:///{DATABASE_PATH}"
+
+# --- PRAGMAs de SQLite para carga concurrente (se aplican a cada conexión) ---
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL") # NORMAL es seguro con WAL
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "16384"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(64 * 1024 * 1024)))
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "8"))
+
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}") # negativo = KiB
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+    cursor.close()
+
+
+# --- Configuración Asíncrona (para FastAPI: rutas calientes de chat y métricas) ---
+# uri=True habilita ATTACH 'file:...?mode=ro' (particiones de archivo, ver app/services/archive.py);
+# una ruta que no empieza con 'file:' se sigue interpretando como ruta normal
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    connect_args={"uri": True},
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+)
+event.listen(async_engine.sync_engine, "connect", _apply_sqlite_pragmas)
+gauge("db_pool_connections_in_use", "Conexiones del pool asíncrono prestadas en este momento",
+      read=lambda: async_engine.pool.checkedout())
+
+# SQLite admite un único escritor: serializamos las transacciones de escritura
+# del proceso en un asyncio.Lock en lugar de competir por el lock del archivo
+# (cuyo busy handler duerme con backoff y puede terminar en "database is locked").
+_write_lock = asyncio.Lock()
+
+
+@asynccontextmanager
+async def write_transaction():
+    """Transacción de escritura asíncrona (commit al salir, rollback ante excepción)."""
+    async with _write_lock:
+        async with async_engine.begin() as conn:
+            yield conn
+
+
+@asynccontextmanager
+async def write_lock():
+    """
+    Solo el lock de escritura, para escrituras síncronas que corren en un
+    hilo con el motor síncrono (ingesta masiva): el chat espera en el lock
+    en lugar de chocar con el lock del archivo.
+    """
+    async with _write_lock:
+        yield
+
 
-# --- Configuración Asíncrona (para FastAPI) ---
-database = Database(SQLALCHEMY_DATABASE_URL)
+@asynccontextmanager
+async def write_connection():
+    """
+    Conexión con el lock de escritura tomado y sin transacción abierta, para
+    lo que no puede ir dentro de una (ATTACH/DETACH). El llamador hace commit.
+    """
+    async with _write_lock:
+        async with async_engine.connect() as conn:
+            yield conn
 
 # --- Configuración Síncrona (para SQLAlchemy ORM y creación de tablas) ---
 engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False} # Requerido para SQLite con múltiples hilos
+    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False, "uri": True} # Requerido para SQLite con múltiples hilos
 )
+event.listen(engine, "connect", _apply_sqlite_pragmas)
 
 # Base Declarativa (donde los modelos heredarán)
 Base = declarative_base()
@@ -34,7 +110,7 @@ def get_db():
         yield db
     except Exception as e:
         db.rollback() # Garantiza el rollback en caso de error
-        print(f"[ERROR: get_db] Excepción durante la solicitud: {e}")
+        log.error("Excepción durante la solicitud (get_db): %s", e)
         raise
     finally:
         db.close() # Garantiza el cierre de la sesión
\ No newline at end of file
@@ -1,16 +1,77 @@
-from fastapi import FastAPI
-from app.routers import chat, metrics
-from app.database import database, metadata, engine # Importa motor y metadata
-import os
+# Logging estructurado antes de importar el resto (ver app/services/structured_logging.py)
+from app.services.structured_logging import setup_logging, shutdown_logging
+setup_logging()
+
+from app.services.startup_profile import startup_profile
+
+# Cada grupo de imports es una fase del perfil de arranque (/metrics/startup)
+with startup_profile.phase("import.fastapi"):
+    from fastapi import FastAPI
+    # Importación de CORS (para desarrollo)
+    from fastapi.middleware.cors import CORSMiddleware
+with startup_profile.phase("import.app"):
+    from app.routers import campaigns, chat, export, metrics
+    from app.database import async_engine # Motor asíncrono (se cierra en el apagado)
+    from app.services import azure_client, schema
+    from app.services.archive import archive_rotator
+    from app.services.near_duplicate import near_duplicates
+    from app.services.reply_cache import reply_cache
+    from app.services.text_codec import text_codec
+    from app.services.write_behind import WRITE_BEHIND_ENABLED, write_behind
+from contextlib import asynccontextmanager
+import logging
 import sys
 import uvicorn
-# Importación de CORS (para desarrollo)
-from fastapi.middleware.cors import CORSMiddleware 
 
 # --- Configuración de Logging ---
-print("--- [DEBUG: main.py] Iniciando configuración de AdGenie Backend API... ---")
-
-app = FastAPI(title="AdGenie Backend API")
+log = logging.getLogger(__name__)
+log.info("Iniciando configuración de AdGenie Backend API")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    log.debug("Arranque (lifespan) iniciado")
+
+    # Solo se crean tablas/índices si la versión de esquema guardada en la
+    # base es anterior a la de la app (ver app/services/schema.py)
+    with startup_profile.phase("startup.schema"):
+        if not schema.ensure_schema():
+            log.info("Esquema v%d al día", schema.SCHEMA_VERSION)
+    # Diccionarios de compresión de message_text antes de la primera escritura
+    with startup_profile.phase("startup.text_codec"):
+        await text_codec.start()
+
+    if WRITE_BEHIND_ENABLED:
+        with startup_profile.phase("startup.write_behind"):
+            await write_behind.start()
+        log.info("Persistencia write-behind activada")
+
+    # Rotación periódica de filas viejas a las particiones mensuales (si está configurada)
+    await archive_rotator.start()
+    # Índice de casi duplicados: se recarga en segundo plano (mientras tanto, sin aciertos)
+    await near_duplicates.start()
+
+    # El cliente de Azure (import de openai incluido) se arma fuera de la ruta de arranque
+    azure_client.prewarm()
+    startup_profile.mark_ready()
+
+    yield
+
+    log.info("Apagado iniciado")
+    await archive_rotator.stop()
+    await near_duplicates.stop()
+    await text_codec.stop()
+    # Vaciar la cola write-behind ANTES de cerrar el pool de conexiones
+    await write_behind.drain()
+    await async_engine.dispose() # Cierra el pool de conexiones aiosqlite
+    await azure_client.close_client()
+    reply_cache.close()
+    log.info("Desconexión de la base de datos completada. Servidor detenido.")
+    # Último paso: vacía la cola de logs
+    shutdown_logging()
+
+
+app = FastAPI(title="AdGenie Backend API", lifespan=lifespan)
 
 # Configuración de CORS
 # app.add_middleware(
@@ -27,66 +88,33 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
-print("[DEBUG: main.py] CORS Middleware configurado exitosamente.")
+log.debug("CORS Middleware configurado")
 
 # 🛑 SOLUCIÓN AL CICLO DE IMPORTACIÓN: Importar modelos aquí
-print("[DEBUG: main.py] Importando modelos ORM para la creación de tablas.")
 # Importamos los modelos (asegúrate de que app/models/ existe)
 try:
     # 🚨 ¡Ajuste CRÍTICO aquí! Solo importamos los modelos que existen.
-    from app.models import users, interactions 
-    print("[DEBUG: main.py] Modelos ORM cargados exitosamente.")
+    from app.models import users, interactions, aggregates
+    log.debug("Modelos ORM cargados")
 except ImportError as e:
     # Esto ahora solo fallará si falta 'users' o 'interactions'
-    print(f"[ERROR: main.py] No se pudieron importar los modelos ORM: {e}")
+    log.critical("No se pudieron importar los modelos ORM: %s", e)
+    shutdown_logging()
     sys.exit(1) # Detener el servidor si los modelos son inaccesibles
 
 
-# # Crear tablas SQLite si no existen
-# print("[DEBUG: main.py] Intentando crear tablas SQLite si no existen...")
-# metadata.create_all(engine)
-# print("[DEBUG: main.py] Base de datos y tablas verificadas/creadas.")
-
-
 # Inclusión de Routers
 app.include_router(chat.router)
-print("[DEBUG: main.py] Router de Chat incluido.")
-
 app.include_router(metrics.router)
-print("[DEBUG: main.py] Router de Métricas incluido.")
-
+app.include_router(export.router)
+app.include_router(campaigns.router)
+log.debug("Routers de Chat, Métricas, Exportación y Campañas incluidos")
 
-@app.on_event("startup")
-async def startup():
-    print("[DEBUG: STARTUP] Evento 'startup' iniciado.")
-    await database.connect()
-    print("[DEBUG: STARTUP] Conexión a la base de datos establecida exitosamente.")
-
-@app.on_event("shutdown")
-async def shutdown():
-    print("[DEBUG: SHUTDOWN] Evento 'shutdown' iniciado.")
-    await database.disconnect()
-    print("[DEBUG: SHUTDOWN] Desconexión de la base de datos completada. Servidor detenido.")
 
 @app.get("/")
 async def root():
     return {"message": "AdGenie Backend Online"}
 
-@app.on_event("startup")
-async def startup():
-    print("[DEBUG: STARTUP] Evento 'startup' iniciado.")
-
-    # 👈 NUEVA POSICIÓN: Creamos las tablas después de que los modelos
-    # se cargaron y antes de conectarse a la BD.
-    print("[DEBUG: STARTUP] Creando tablas SQLite si no existen (Ejecución Post-Models).")
-    metadata.create_all(engine) 
-    print("[DEBUG: STARTUP] Base de datos y tablas verificadas/creadas.")
-
-    await database.connect()
-    print("[DEBUG: STARTUP] Conexión a la base de datos establecida exitosamente.")
-
-    print("--- [DEBUG: main.py] Configuración inicial de FastAPI completada. ---")
-
 
 if __name__ == "__main__":
     uvicorn.run("app.main:app", host="0.0.0.0", port=8000)
\ No newline at end of file
@@ -0,0 +1,32 @@
+# app/models/aggregates.py
+
+from sqlalchemy import Column, DateTime, Integer, String
+from app.database import Base
+
+
+class ContextCounter(Base):
+    """
+    Agregado incremental de 'chat_interactions' por contexto. Se actualiza en
+    la misma transacción que el insert de las interacciones, así que
+    /metrics/summary no necesita recorrer la tabla de interacciones.
+    """
+    __tablename__ = "chat_context_counters"
+
+    # Las interacciones con context NULL se acumulan bajo la clave ''
+    context = Column(String, primary_key=True)
+    interactions = Column(Integer, nullable=False, default=0)
+
+
+class InteractionRollup(Base):
+    """
+    Rollup horario de 'chat_interactions' por (bucket_start, context,
+    message_type). Se mantiene en la misma transacción que el insert y
+    alimenta las consultas por ventana de tiempo de /metrics.
+    """
+    __tablename__ = "chat_interaction_rollups"
+
+    bucket_start = Column(DateTime, primary_key=True)
+    # Las interacciones con context NULL se acumulan bajo la clave ''
+    context = Column(String, primary_key=True)
+    message_type = Column(String, primary_key=True)
+    interactions = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,19 @@
+# app/models/archive.py
+
+from sqlalchemy import Column, DateTime, Integer, String, func
+from app.database import Base
+
+
+class ArchivePartition(Base):
+    """
+    Catálogo de particiones mensuales de 'chat_interactions' archivadas en
+    archivos SQLite aparte (ver app/services/archive.py). La fila se crea
+    antes de mover datos, así el catálogo siempre cubre lo archivado.
+    """
+    __tablename__ = "chat_archive_partitions"
+
+    # Primer instante del mes (UTC): la partición cubre [month_start, mes siguiente)
+    month_start = Column(DateTime, primary_key=True)
+    path = Column(String, nullable=False)
+    rows = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
@@ -0,0 +1,43 @@
+# app/models/campaigns.py
+
+from sqlalchemy import Column, Date, DateTime, Float, ForeignKey, Index, Integer, String, func
+from app.database import Base
+
+
+class Campaign(Base):
+    """
+    Campañas de Google/Meta Ads. Mismas columnas que la tabla 'campaigns'
+    original; el nombre es único porque es lo que traen los exports de
+    métricas (ver app/services/campaign_ingest.py).
+    """
+    __tablename__ = "campaigns"
+    __table_args__ = (
+        Index("ux_campaigns_name", "name", unique=True),
+    )
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String, nullable=False)
+    budget = Column(Integer)
+    # server_default: la ingesta crea campañas con SQL directo
+    status = Column(String, default="draft", server_default="draft")
+    created_at = Column(DateTime, default=func.now(), server_default=func.now())
+
+
+class CampaignDailyStat(Base):
+    """
+    Métricas diarias de una campaña, una fila por (campaña, día): volver a
+    cargar un export reemplaza los valores del día en lugar de duplicarlos.
+    """
+    __tablename__ = "campaign_daily_stats"
+    # Sin rowid: la tabla es el propio índice (campaign_id, date)
+    __table_args__ = {"sqlite_with_rowid": False}
+
+    campaign_id = Column(Integer, ForeignKey("campaigns.id"), primary_key=True)
+    date = Column(Date, primary_key=True)
+    impressions = Column(Integer, nullable=False, default=0)
+    clicks = Column(Integer, nullable=False, default=0)
+    cost = Column(Float, nullable=False, default=0.0)
+    # Float: los modelos de atribución reparten conversiones fraccionarias
+    conversions = Column(Float, nullable=False, default=0.0)
+    # Valor (ingresos) atribuido a las conversiones: ROAS = conversion_value / cost
+    conversion_value = Column(Float, nullable=False, default=0.0, server_default="0")
@@ -0,0 +1,20 @@
+# app/models/fingerprints.py
+
+from sqlalchemy import BigInteger, Column, Integer, String
+from app.database import Base
+
+
+class ReplyFingerprint(Base):
+    """
+    Huella SimHash de un mensaje USER respondido por Azure sin historial,
+    apuntando a la fila BOT con la respuesta (ver app/services/near_duplicate.py).
+    Se escribe en la misma transacción que el par; al arrancar se recarga
+    el índice en memoria desde esta tabla, sin recalcular huellas.
+    """
+    __tablename__ = "chat_reply_fingerprints"
+
+    # id de la fila BOT en 'chat_interactions' (sin FK: puede archivarse)
+    reply_id = Column(Integer, primary_key=True)
+    context = Column(String, nullable=False)
+    # 64 bits con signo (INTEGER de SQLite)
+    simhash = Column(BigInteger, nullable=False)
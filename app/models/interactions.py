@@ -1,16 +1,30 @@
 # app/models/interactions.py - Versión FINAL y COMPLETA
 
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, func
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Index, func
 from sqlalchemy.orm import relationship
 from app.database import Base 
-
-print("--- [DEBUG: interactions.py] Modelo ChatInteraction cargado exitosamente. ---")
+from app.services.text_codec import CompressedText
 
 class ChatInteraction(Base):
     """
     Modelo ORM para la tabla 'chat_interactions'. 
     """
     __tablename__ = "chat_interactions"
+    __table_args__ = (
+        # Consultas por ventana de tiempo (parte no cubierta por los rollups)
+        Index("ix_chat_interactions_created_at_context", "created_at", "context"),
+        # Exportación filtrada solo por context: en SQLite el índice es (context, rowid),
+        # así que acota [min(id), max(id)] y cada página keyset sin leer las demás filas
+        Index("ix_chat_interactions_context", "context"),
+        # Historial por sesión (keyset sobre user_id, created_at, id) e hidratación
+        # de la memoria de conversación. Sin message_text: duplicaría cada mensaje
+        # en el índice; el texto se lee por rowid solo para las filas de la página
+        Index("ix_chat_interactions_user_history",
+              "user_id", "created_at", "id", "message_type", "context"),
+        # AUTOINCREMENT: los ids no se reutilizan aunque la rotación vacíe la tabla
+        # (chocarían con los ya archivados y con chat_reply_fingerprints.reply_id)
+        {"sqlite_autoincrement": True},
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), index=True)
@@ -18,8 +32,12 @@ class ChatInteraction(Base):
     # Columnas de Lógica del Chat
     context = Column(String, nullable=True, default="DEFAULT_PROCESSING")
     message_type = Column(String, nullable=False)
-    message_text = Column(String)
+    # Comprimido con diccionario (ver app/services/text_codec.py); se lee y escribe como str
+    message_text = Column(CompressedText)
     created_at = Column(DateTime, default=func.now())
+    # Uso de tokens de Azure (solo en filas BOT respondidas por el LLM)
+    prompt_tokens = Column(Integer, nullable=True)
+    completion_tokens = Column(Integer, nullable=True)
     
     # 👈 ¡LA PROPIEDAD QUE FALTABA Y CAUSÓ ESTE ERROR!
     # Define la relación de muchos a uno: muchas interacciones a un solo usuario.
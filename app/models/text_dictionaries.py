@@ -0,0 +1,19 @@
+# app/models/text_dictionaries.py
+
+from sqlalchemy import Column, DateTime, Integer, LargeBinary, func
+from app.database import Base
+
+
+class TextDictionary(Base):
+    """
+    Diccionarios de compresión (zdict) de 'chat_interactions.message_text',
+    uno por versión (ver app/services/text_codec.py). Cada valor comprimido
+    lleva la versión con la que se codificó: una versión en uso no se borra.
+    """
+    __tablename__ = "chat_text_dictionaries"
+
+    version = Column(Integer, primary_key=True)
+    dictionary = Column(LargeBinary, nullable=False)
+    # Filas de la muestra con la que se entrenó
+    sample_rows = Column(Integer, nullable=False)
+    created_at = Column(DateTime, default=func.now())
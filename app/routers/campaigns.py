@@ -0,0 +1,46 @@
+# app/routers/campaigns.py
+
+from typing import Literal
+
+from fastapi import APIRouter, HTTPException, Request, status
+from pydantic import BaseModel
+
+from app.services.campaign_ingest import IngestError, campaign_ingestor
+
+router = APIRouter(
+    prefix="/campaigns",
+    tags=["Campaigns"],
+)
+
+
+class IngestRowError(BaseModel):
+    row: int
+    reason: str
+
+
+class IngestResult(BaseModel):
+    """Resultado de una carga de métricas (ver app/services/campaign_ingest.py)."""
+    rows: int
+    accepted: int
+    rejected: int
+    campaigns_created: int
+    batches: int
+    elapsed_ms: float
+    errors: list[IngestRowError]
+
+
+@router.post("/stats/ingest", response_model=IngestResult)
+async def ingest_campaign_stats(request: Request, format: Literal["csv", "ndjson"] = "csv"):
+    """
+    Carga un export de métricas diarias (campaign, date, impressions,
+    clicks, cost, conversions) enviado como cuerpo CSV o NDJSON, opcionalmente
+    con Content-Encoding: gzip. Las filas de un (campaña, día) ya cargado
+    reemplazan a las anteriores; las inválidas se cuentan y se detallan
+    (las primeras) sin frenar la carga.
+    """
+    gzipped = "gzip" in request.headers.get("content-encoding", "").lower()
+    try:
+        report = await campaign_ingestor.ingest_stream(request.stream(), format, gzipped)
+    except IngestError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e)) from e
+    return IngestResult(**vars(report))
@@ -1,44 +1,41 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from app.database import get_db
-from app.models.users import User
-from app.models.interactions import ChatInteraction
+from fastapi import APIRouter, Body, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 from pydantic import BaseModel
+import asyncio
 import datetime
-import sys
+import json
+import logging
 import os
-#import openai # Necesitas instalar la librería 'openai' (pip install openai)
-
-from dotenv import load_dotenv
-
-load_dotenv()
-#from openai import OpenAI
-import openai
-# --- CONFIGURACIÓN DE AZURE (DEBE USAR VARIABLES DE ENTORNO) ---
-# Importante: Estas variables DEBEN estar definidas en su entorno (.env o similar)
-AZURE_ENDPOINT = os.getenv("AZURE_OPENAI_ENDPOINT")
-AZURE_API_KEY = os.getenv("AZURE_OPENAI_API_KEY")
-AZURE_DEPLOYMENT_NAME = "gpt-5-chat-optiFoodAI-1" # O el nombre de su implementación en Azure
-
-# Configuración del cliente de OpenAI para Azure
-try:
-    print("Iniciando configuración del cliente de Azure OpenAI...")
-    print(f"AZURE_ENDPOINT: {AZURE_ENDPOINT}")
-    print(f"AZURE_API_KEY: {AZURE_API_KEY}")
-    if AZURE_ENDPOINT and AZURE_API_KEY:
-        openai_client = openai.AzureOpenAI(
-            azure_endpoint=AZURE_ENDPOINT,
-            api_key=AZURE_API_KEY,
-            api_version="2025-01-01-preview" # Asegúrese de usar una versión compatible
-        )
-        print("Cliente de Azure OpenAI configurado correctamente.")
-    else:
-        openai_client = None
-        print("ADVERTENCIA: Variables de entorno de Azure no cargadas. Usando lógica de prueba.")
+import time
+from app.services import azure_client
+from app.services.admission import AdmissionRejected, AdmissionTicket, admission
+from app.services.azure_client import AZURE_DEPLOYMENT_NAME
+from app.services.resilience import AZURE_LATENCY_BUDGET_MS, CircuitOpenError
+from app.services import reply_cache as reply_cache_service
+from app.services.reply_cache import reply_cache
+from app.services.single_flight import azure_single_flight
+from app.services.interaction_store import InteractionPair, load_user_ids, persist_pairs, utc_now
+from app.services.write_behind import write_behind
+from app.services import history as history_service
+from app.services.intent import intent_classifier
+from app.services.near_duplicate import near_duplicates
+from app.services.conversation_memory import Turn, conversation_memory
+from app.services.streaming import ReplyFieldExtractor
+from app.services.structured_logging import debug_sampled
+from app.services.telemetry import counter, histogram
+
+log = logging.getLogger(__name__)
+
+# El cliente asíncrono de Azure OpenAI (y su pool HTTP) se crea una sola vez,
+# en segundo plano al terminar el arranque o en la primera llamada
+# (ver app/services/azure_client.py).
 
-except Exception as e:
-    openai_client = None
-    print(f"ERROR: Fallo al inicializar el cliente de Azure OpenAI: {e}")
+# --- Instrumentación de la ruta caliente (exportada en /metrics/prometheus) ---
+llm_call_seconds = histogram("chat_llm_call_seconds", "Llamada a Azure (incluye espera en semáforo, reintentos y hedging)")
+json_parse_seconds = histogram("chat_json_parse_seconds", "Parseo del JSON devuelto por el LLM")
+chat_requests_total = counter("chat_requests_total", "Peticiones de chat respondidas, por contexto", label="context")
+tokens_total = counter("azure_tokens_total", "Tokens consumidos en Azure OpenAI", label="type")
 
 router = APIRouter(
     prefix="/chat",
@@ -64,120 +61,542 @@ Tu respuesta DEBE ser un objeto JSON con dos campos:
    - GENERAL_INQUIRY (para saludos o preguntas no relacionadas con marketing/tech).
 """
 
-def call_azure_ai(message: str) -> tuple[str, str]:
-    """Llama a la API de Azure y parsea la respuesta JSON."""
-    if not openai_client:
+def build_prompt(message: str, history: tuple[Turn, ...] = ()) -> list[dict]:
+    """SYSTEM_PROMPT + turnos previos (ya recortados al presupuesto) + mensaje actual."""
+    messages = [{"role": "system", "content": SYSTEM_PROMPT}]
+    for turn in history:
+        messages.append({"role": "user", "content": turn.user_message})
+        # Las respuestas previas van en el mismo formato JSON que se le pide al modelo
+        messages.append({"role": "assistant", "content": json.dumps(
+            {"reply": turn.bot_reply, "context": turn.context}, ensure_ascii=False
+        )})
+    messages.append({"role": "user", "content": message})
+    return messages
+
+
+async def call_azure_ai(message: str, history: tuple[Turn, ...] = (), usage: dict | None = None) -> tuple[str, str]:
+    """
+    Llama a la API de Azure (sin bloquear el event loop) y parsea la respuesta JSON.
+    Si se pasa `usage`, se completa con los tokens consumidos por esta petición
+    y, si la respuesta es reutilizable para paráfrasis, con la huella del mensaje.
+    """
+    if not azure_client.is_configured():
         # Si Azure no está configurado, vuelve a la lógica de prueba (fallback)
-        print("[DEBUG: AZURE] Cliente no configurado. Usando Fallback de prueba.")
+        debug_sampled(log, "Cliente de Azure no configurado. Usando fallback de prueba.")
         return get_ai_response_fallback(message)
 
+    # Memoria de conversación: últimos turnos de la sesión dentro del presupuesto de tokens
+    history = conversation_memory.within_budget(history)
+
+    # Caché de respuestas (LRU+TTL): las preguntas repetidas no llegan a Azure
+    cache_key = reply_cache_service.make_key(message, SYSTEM_PROMPT, AZURE_DEPLOYMENT_NAME, history)
+    cached = await reply_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    # Paráfrasis de una pregunta ya respondida (solo sin historial, mismo contexto)
+    if not history:
+        reused = await near_duplicates.lookup(message)
+        if reused is not None:
+            return reused
+
     try:
-        print(f"[DEBUG: AZURE_API_CALL] Enviando mensaje a Azure: '{message}'")
-        print(f"[DEBUG: AZURE_API_CALL] Usando endpoint: {AZURE_ENDPOINT}")
-        print(f"[DEBUG: AZURE_API_CALL] Usando deployment: {AZURE_DEPLOYMENT_NAME}")
-        print(f"SYSTEM_PROMPT: {SYSTEM_PROMPT} ")
-        response = openai_client.chat.completions.create(
-            model=AZURE_DEPLOYMENT_NAME,
-            messages=[
-                {"role": "system", "content": SYSTEM_PROMPT},
-                {"role": "user", "content": message},
-            ],
-            # Importante: Pedimos el formato JSON
-            response_format={"type": "json_object"}
+        # Single-flight: las peticiones concurrentes con la misma clave
+        # (mensaje normalizado + prompt + deployment + historial) comparten
+        # una sola llamada a Azure; cada sesión persiste luego sus propias filas.
+        prompt = build_prompt(message, history)
+        reply, context, call_usage = await azure_single_flight.do(
+            cache_key, lambda: _complete_with_azure(prompt, cache_key)
         )
-        
-        # El modelo de Azure devuelve un string JSON
-        json_output = response.choices[0].message.content
-        
-        # 1. Parsear JSON
-        import json
-        data = json.loads(json_output)
-        
-        reply = data.get("reply", "Lo siento, la IA no pudo generar una respuesta válida.")
-        context = data.get("context", "DEFAULT_PROCESSING")
-        
+        # El uso de una llamada compartida se atribuye a una sola petición
+        if usage is not None and call_usage:
+            usage.update(call_usage)
+            call_usage.clear()
+        mark_reusable(message, history, usage)
         return reply, context
 
+    except CircuitOpenError:
+        # Azure viene fallando: respuesta inmediata sin esperar otro timeout
+        debug_sampled(log, "Circuito abierto. Usando fallback de prueba.")
+        return get_ai_response_fallback(message)
+
+    except asyncio.TimeoutError:
+        log.warning("Presupuesto de latencia de Azure agotado (%.0f ms). Usando fallback.", AZURE_LATENCY_BUDGET_MS)
+        return get_ai_response_fallback(message)
+
     except Exception as e:
-        print(f"[ERROR: AZURE_API_CALL] Fallo en la llamada a Azure: {e}")
+        log.warning("Fallo en la llamada a Azure: %s", e)
         # En caso de error de API, volvemos a la lógica de prueba
         return get_ai_response_fallback(message)
 
 
+async def _complete_with_azure(prompt: list[dict], cache_key: str) -> tuple[str, str, dict]:
+    """Una llamada a Azure + parseo JSON + caché. Los errores se propagan."""
+    # Solo metadatos: ni el SYSTEM_PROMPT ni el texto del usuario van al log
+    debug_sampled(log, "Llamada a Azure", deployment=AZURE_DEPLOYMENT_NAME, history_messages=len(prompt) - 2)
+    with llm_call_seconds.time():
+        response = await azure_client.create_chat_completion(
+            messages=prompt,
+            # Importante: Pedimos el formato JSON
+            response_format={"type": "json_object"}
+        )
+
+    # El modelo de Azure devuelve un string JSON
+    json_output = response.choices[0].message.content
+
+    # 1. Parsear JSON
+    with json_parse_seconds.time():
+        data = json.loads(json_output)
+
+    reply = data.get("reply", "Lo siento, la IA no pudo generar una respuesta válida.")
+    context = data.get("context", "DEFAULT_PROCESSING")
+
+    # Solo se cachean respuestas válidas de Azure (nunca el fallback)
+    await reply_cache.put(cache_key, reply, context)
+
+    usage = record_token_usage(response.usage)
+    return reply, context, usage
+
+
+def mark_reusable(message: str, history: tuple[Turn, ...], usage: dict | None) -> None:
+    """
+    Respuesta nueva de Azure a un mensaje sin historial: su huella viaja en
+    `usage` hasta el par persistido y queda en el índice de casi duplicados.
+    """
+    if usage is None or history:
+        return
+    fingerprint = near_duplicates.fingerprint(message)
+    if fingerprint is not None:
+        usage["simhash"] = fingerprint
+
+
+def record_token_usage(usage) -> dict:
+    """Suma el uso de tokens a los contadores y lo devuelve como dict (vacío si no vino)."""
+    if usage is None:
+        return {}
+    tokens_total.inc("prompt", usage.prompt_tokens)
+    tokens_total.inc("completion", usage.completion_tokens)
+    return {"prompt_tokens": usage.prompt_tokens, "completion_tokens": usage.completion_tokens}
+
+
 # Lógica de prueba anterior (se convierte en fallback)
 def get_ai_response_fallback(message: str) -> tuple[str, str]:
-    # Placeholder para la lógica contextual
-    marketing_keywords = ["optimizar", "ctr", "cpc", "campaña", "métricas"]
-    tech_keywords = ["python", "fastapi", "react", "vite", "azure"]
-    off_topic_keywords = ["capital", "tiempo", "edad", "quién eres"]
-    
-    if any(keyword in message.lower() for keyword in marketing_keywords):
-        return "¡Excelente! Hemos detectado una consulta sobre optimización de campañas. Estamos listos para analizar sus métricas.", "MARKETING_OPTIMIZATION"
-    if any(keyword in message.lower() for keyword in tech_keywords):
-        return "Claro, nuestra pila tecnológica está basada en Python/FastAPI y React/Vite, todo escalado en Azure.", "TECH_STACK"
-    if any(keyword in message.lower() for keyword in off_topic_keywords):
-        return "Soy AdGenie, tu asistente de campañas. Mi foco es el marketing digital. ¿En qué puedo ayudar?", "GENERAL_INQUIRY"
+    # Clasificador local precompilado (app/services/intent.py)
+    match = intent_classifier.classify(message)
+    if match.intent is not None:
+        return match.reply, match.intent
 
     return f"He recibido tu solicitud: '{message}'. Estoy buscando la mejor decisión de un experto. ¡Gracias por usar AdGenie!", "DEFAULT_PROCESSING"
 
 
 # Reemplazamos la función original por la que llama a Azure
-def get_ai_response(message: str) -> tuple[str, str]:
-    return call_azure_ai(message)
+async def get_ai_response(message: str, history: tuple[Turn, ...] = (), usage: dict | None = None) -> tuple[str, str]:
+    # Saludos y consultas fuera de tema clasificadas con alta confianza se
+    # responden localmente, sin llamada al LLM
+    local = intent_classifier.answer_locally(message)
+    if local is not None:
+        return local
+    return await call_azure_ai(message, history, usage)
+
+# ----------------------------------------------------------------
+# --- PERSISTENCIA -----------------------------------------------
+# ----------------------------------------------------------------
+
+async def persist_interaction_pair(session_id: str, user_message: str, bot_reply: str, context: str,
+                                   usage: dict | None = None) -> None:
+    """
+    Busca/crea el usuario y guarda el par USER/BOT en una única transacción
+    sobre el motor asíncrono (no bloquea el event loop). Cualquier excepción,
+    incluida la cancelación por desconexión, provoca rollback.
+
+    Con CHAT_WRITE_BEHIND=1 el par se encola y se inserta por lotes.
+    """
+    usage = usage or {}
+    pair = InteractionPair(session_id, user_message, bot_reply, context, utc_now(),
+                           usage.get("prompt_tokens"), usage.get("completion_tokens"), usage.get("simhash"))
+
+    if write_behind.running:
+        await write_behind.submit(pair)
+    else:
+        await persist_pairs([pair])
+        debug_sampled(log, "Par USER/BOT persistido", session_id=session_id)
+
+    # El turno entra al ring buffer de la sesión solo una vez persistido
+    conversation_memory.record(session_id, user_message, bot_reply, context)
+
+# ----------------------------------------------------------------
+# --- CONTROL DE ADMISIÓN ----------------------------------------
+# ----------------------------------------------------------------
+
+def admit_or_429(session_id: str | None) -> AdmissionTicket:
+    """
+    Ritmo por sesión y tope global de trabajo pendiente del LLM (ver
+    app/services/admission.py). Si no se admite, 429 inmediato con
+    Retry-After, antes de hidratar memoria o llamar a Azure.
+    """
+    try:
+        return admission.admit(session_id)
+    except AdmissionRejected as e:
+        debug_sampled(log, "Petición rechazada por control de admisión", session_id=session_id, reason=e.reason)
+        detail = ("Demasiadas peticiones para esta sesión." if e.reason == "session_rate"
+                  else "Servidor saturado, reintentar más tarde.")
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=detail,
+            headers={"Retry-After": e.retry_after_header},
+        ) from e
 
 # ----------------------------------------------------------------
 # --- ENDPOINT DE CHAT (Se mantiene sin cambios) ------------------
 # ----------------------------------------------------------------
 
 @router.post("/message")
-async def send_message(req: MessageRequest, db: Session = Depends(get_db)):
+async def send_message(req: MessageRequest):
     # ... (El resto del código del router permanece igual, usando la nueva get_ai_response)
-    print(f"[DEBUG: /chat/message] Recibida nueva solicitud. Session ID: '{req.session_id}'")
-    
+    debug_sampled(log, "Nueva solicitud /chat/message", session_id=req.session_id)
+    ticket = admit_or_429(req.session_id)
+
     try:
-        # 1. Buscar o Crear Usuario (Transacción atómica)
-        user = db.query(User).filter(User.session_id == req.session_id).first()
-        
-        if not user:
-            user = User(session_id=req.session_id, name="Anonymous")
-            db.add(user)
-            db.flush()
-            print(f"[DEBUG: DB_USER] Nuevo usuario creado con ID: {user.id}")
-        else:
-            print(f"[DEBUG: DB_USER] Usuario existente encontrado con ID: {user.id}")
-
-        # 2. Generar Respuesta (AQUÍ se llama a la nueva lógica de Azure)
-        bot_reply, context = get_ai_response(req.message)
-        print(f"[DEBUG: AI_LOGIC] Contexto de respuesta detectado: '{context}'")
-
-        # 3. Guardar Interacciones
-        user_interaction = ChatInteraction(
-            user_id=user.id, 
-            context=context, 
-            message_type="USER", 
-            message_text=req.message
-        )
-        db.add(user_interaction)
-        
-        bot_interaction = ChatInteraction(
-            user_id=user.id, 
-            context=context, 
-            message_type="BOT", 
-            message_text=bot_reply
-        )
-        db.add(bot_interaction)
+        # 1. Generar Respuesta (AQUÍ se llama a la nueva lógica de Azure)
+        # Se hace ANTES de abrir la transacción: así no retenemos el lock de
+        # escritura de SQLite mientras esperamos al LLM.
+        # El lugar en el pendiente global se libera apenas responde el LLM
+        with ticket:
+            history = await conversation_memory.history(req.session_id)
+            usage: dict = {}
+            bot_reply, context = await get_ai_response(req.message, history, usage)
+        debug_sampled(log, "Contexto de respuesta detectado", session_id=req.session_id, context=context)
+        chat_requests_total.inc(context)
 
-        # 4. Commit Final
-        db.commit()
-        print("[DEBUG: DB_PERSIST] Transacción completa: Mensajes guardados.")
+        # 2. Guardar Usuario + Interacciones en una sola transacción
+        await persist_interaction_pair(req.session_id, req.message, bot_reply, context, usage)
         
         # 5. Respuesta
         return {"reply": bot_reply}
 
     except Exception as e:
-        db.rollback()
-        print(f"[ERROR: DB_TXN_FAILED] Fallo de transacción. Rollback ejecutado: {e}", file=sys.stderr)
+        log.exception("Fallo de transacción. Rollback ejecutado", extra={"session_id": req.session_id})
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Error interno del servidor al procesar la solicitud de chat."
-        ) from e
\ No newline at end of file
+        ) from e
+
+# ----------------------------------------------------------------
+# --- ENDPOINT DE CHAT EN STREAMING (Server-Sent Events) ---------
+# ----------------------------------------------------------------
+
+stream_ttfb = histogram(
+    "chat_stream_ttfb_seconds",
+    "Tiempo hasta el primer token enviado por /chat/stream",
+)
+
+
+def _sse(data: dict, event: str | None = None) -> str:
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def _stream_reply_tokens(message: str, result: dict, history: tuple[Turn, ...] = ()):
+    """
+    Genera los tokens del campo "reply" a medida que llegan de Azure y deja
+    en `result` el par (reply, context) final una vez completado el stream.
+    """
+    local = intent_classifier.answer_locally(message)
+    if local is not None:
+        result["reply"], result["context"] = local
+        yield local[0]
+        return
+
+    if azure_client.is_configured():
+        history = conversation_memory.within_budget(history)
+        cache_key = reply_cache_service.make_key(message, SYSTEM_PROMPT, AZURE_DEPLOYMENT_NAME, history)
+        cached = await reply_cache.get(cache_key)
+        if cached is None and not history:
+            cached = await near_duplicates.lookup(message)
+        if cached is not None:
+            result["reply"], result["context"] = cached
+            yield cached[0]
+            return
+
+        extractor = ReplyFieldExtractor()
+        emitted = False
+        usage: dict = {}
+        try:
+            async for fragment in azure_client.stream_chat_completion(
+                messages=build_prompt(message, history),
+                usage=usage,
+                response_format={"type": "json_object"}
+            ):
+                text = extractor.feed(fragment)
+                if text:
+                    emitted = True
+                    yield text
+
+            with json_parse_seconds.time():
+                data = extractor.result()
+            if usage:
+                tokens_total.inc("prompt", usage["prompt_tokens"])
+                tokens_total.inc("completion", usage["completion_tokens"])
+            mark_reusable(message, history, usage)
+            result["usage"] = usage
+            result["reply"] = data.get("reply", "Lo siento, la IA no pudo generar una respuesta válida.")
+            result["context"] = data.get("context", "DEFAULT_PROCESSING")
+            await reply_cache.put(cache_key, result["reply"], result["context"])
+            return
+
+        except Exception as e:
+            log.warning("Fallo en el stream de Azure: %s", e)
+            # Si ya se enviaron tokens no podemos cambiar de respuesta a mitad
+            if emitted:
+                raise
+
+    # Sin Azure (o fallo antes del primer token): fallback en un solo bloque
+    result["reply"], result["context"] = get_ai_response_fallback(message)
+    yield result["reply"]
+
+
+@router.post("/stream")
+async def stream_message(req: MessageRequest, request: Request):
+    """
+    Igual que /chat/message pero reenvía los tokens como Server-Sent Events.
+    El par USER/BOT se persiste solo cuando el stream termina completo.
+    """
+    started = time.perf_counter()
+    ticket = admit_or_429(req.session_id)
+
+    async def event_stream():
+        result: dict = {}
+        first_token = True
+        try:
+            with ticket:
+                history = await conversation_memory.history(req.session_id)
+                async for token in _stream_reply_tokens(req.message, result, history):
+                    if first_token:
+                        stream_ttfb.observe(time.perf_counter() - started)
+                        first_token = False
+                    yield _sse({"token": token})
+        except Exception:
+            yield _sse({"detail": "Error al generar la respuesta."}, event="error")
+            return
+
+        # El cliente se fue antes del final: no se persiste nada
+        if await request.is_disconnected():
+            debug_sampled(log, "Cliente desconectado de /chat/stream", session_id=req.session_id)
+            return
+
+        try:
+            # Si el cliente se desconecta durante el commit, la cancelación
+            # hace rollback al salir de write_transaction() (ver persist_pairs)
+            chat_requests_total.inc(result["context"])
+            await persist_interaction_pair(req.session_id, req.message, result["reply"], result["context"],
+                                           result.get("usage"))
+        except Exception:
+            log.exception("Fallo de transacción (stream). Rollback ejecutado", extra={"session_id": req.session_id})
+            yield _sse({"detail": "Error interno del servidor al guardar la conversación."}, event="error")
+            return
+
+        yield _sse({"reply": result["reply"], "context": result["context"]}, event="done")
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        # Si el cliente se va antes de que empiece el cuerpo, el generador no corre
+        background=BackgroundTask(ticket.release),
+    )
+
+
+# ----------------------------------------------------------------
+# --- ENDPOINT DE CHAT POR LOTES ---------------------------------
+# ----------------------------------------------------------------
+
+# Máximo de ítems por petición a /chat/batch
+CHAT_BATCH_MAX_ITEMS = int(os.getenv("CHAT_BATCH_MAX_ITEMS", "1000"))
+# Llamadas al LLM en vuelo por lote (además del tope global AZURE_OPENAI_MAX_CONCURRENCY)
+CHAT_BATCH_CONCURRENCY = int(os.getenv("CHAT_BATCH_CONCURRENCY", "16"))
+
+batch_items_total = counter("chat_batch_items_total", "Ítems procesados por /chat/batch, por resultado", label="outcome")
+
+
+class BatchItemResult(BaseModel):
+    index: int
+    session_id: str
+    reply: str | None = None
+    context: str | None = None
+    # Presente solo si el ítem falló (el resto del lote sigue)
+    error: str | None = None
+
+class BatchResponse(BaseModel):
+    results: list[BatchItemResult]
+    succeeded: int
+    failed: int
+
+
+async def _answer_batch_item(index: int, req: MessageRequest,
+                             semaphore: asyncio.Semaphore) -> tuple[BatchItemResult, dict | None]:
+    """Respuesta de un ítem bajo el semáforo del lote; (resultado, uso) o (error, None)."""
+    async with semaphore:
+        try:
+            # El lote ya fue admitido: cada ítem en curso cuenta en el pendiente global
+            with admission.reserve():
+                history = await conversation_memory.history(req.session_id)
+                usage: dict = {}
+                bot_reply, context = await get_ai_response(req.message, history, usage)
+        except Exception:
+            log.exception("Fallo en un ítem de /chat/batch", extra={"session_id": req.session_id})
+            batch_items_total.inc("error")
+            return BatchItemResult(index=index, session_id=req.session_id,
+                                   error="Error al generar la respuesta."), None
+
+    chat_requests_total.inc(context)
+    batch_items_total.inc("ok")
+    return BatchItemResult(index=index, session_id=req.session_id, reply=bot_reply, context=context), usage
+
+
+async def _persist_batch(items: list[MessageRequest], answers: list[tuple[BatchItemResult, dict | None]]) -> None:
+    """
+    Todos los pares USER/BOT del lote en una sola transacción, en el orden
+    de los ítems y con el mismo created_at (los de una misma sesión quedan
+    ordenados por id).
+    """
+    created_at = utc_now()
+    pairs = [
+        InteractionPair(result.session_id, items[result.index].message, result.reply, result.context, created_at,
+                        usage.get("prompt_tokens"), usage.get("completion_tokens"), usage.get("simhash"))
+        for result, usage in sorted(answers, key=lambda answer: answer[0].index)
+        if usage is not None
+    ]
+    if not pairs:
+        return
+    await persist_pairs(pairs)
+    for pair in pairs:
+        conversation_memory.record(pair.session_id, pair.user_message, pair.bot_reply, pair.context)
+
+
+@router.post("/batch", response_model=BatchResponse)
+async def send_batch(
+    items: list[MessageRequest] = Body(..., min_length=1, max_length=CHAT_BATCH_MAX_ITEMS),
+    stream: bool = False,
+):
+    """
+    Varios mensajes en una petición (p. ej. auditorías de campañas). Los
+    usuarios se resuelven con una sola consulta, las llamadas al LLM corren
+    en paralelo (hasta CHAT_BATCH_CONCURRENCY) y todas las interacciones se
+    guardan en una única transacción al final. Un ítem que falla devuelve
+    `error` sin afectar al resto.
+
+    Los ítems de una misma sesión comparten el historial previo al lote.
+    Con `stream=true` la respuesta es NDJSON: una línea por ítem a medida
+    que termina (con su `index`) y una línea final con el resumen.
+
+    El lote se rechaza entero (429) si el pendiente global está lleno; el
+    ritmo por sesión no se aplica a los ítems (los acota CHAT_BATCH_CONCURRENCY).
+    """
+    debug_sampled(log, "Nueva solicitud /chat/batch", items=len(items))
+    admit_or_429(None).release()
+    semaphore = asyncio.Semaphore(CHAT_BATCH_CONCURRENCY)
+    try:
+        # Los ids encontrados quedan en caché para la memoria y el upsert
+        await load_user_ids({item.session_id for item in items})
+    except Exception as e:
+        log.exception("Fallo al resolver los usuarios del lote")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error interno del servidor al procesar el lote."
+        ) from e
+
+    if not stream:
+        answers = await asyncio.gather(*(
+            _answer_batch_item(index, item, semaphore) for index, item in enumerate(items)
+        ))
+        try:
+            await _persist_batch(items, answers)
+        except Exception as e:
+            log.exception("Fallo de transacción (lote). Rollback ejecutado")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Error interno del servidor al guardar el lote."
+            ) from e
+        failed = sum(usage is None for _, usage in answers)
+        return BatchResponse(results=[result for result, _ in answers],
+                             succeeded=len(answers) - failed, failed=failed)
+
+    async def ndjson_stream():
+        tasks = [asyncio.create_task(_answer_batch_item(index, item, semaphore))
+                 for index, item in enumerate(items)]
+        answers = []
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                answer = await next_done
+                answers.append(answer)
+                yield answer[0].model_dump_json() + "\n"
+        finally:
+            # Cliente desconectado: se cancela lo pendiente y no se persiste nada
+            for task in tasks:
+                task.cancel()
+
+        failed = sum(usage is None for _, usage in answers)
+        summary = {"done": True, "succeeded": len(answers) - failed, "failed": failed, "persisted": True}
+        try:
+            await _persist_batch(items, answers)
+        except Exception:
+            log.exception("Fallo de transacción (lote en streaming). Rollback ejecutado")
+            summary.update(persisted=False, detail="Error interno del servidor al guardar el lote.")
+        yield json.dumps(summary, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(ndjson_stream(), media_type="application/x-ndjson")
+
+
+# ----------------------------------------------------------------
+# --- HISTORIAL POR SESIÓN ---------------------------------------
+# ----------------------------------------------------------------
+
+class HistoryMessage(BaseModel):
+    id: int
+    message_type: str
+    message_text: str | None
+    context: str | None
+    created_at: datetime.datetime
+
+class SessionHistory(BaseModel):
+    session_id: str
+    messages: list[HistoryMessage]
+    # Quedan mensajes en la dirección pedida (más viejos, o más nuevos con `after`)
+    has_more: bool
+    # Cursores: `before` para la página anterior, `after` para lo nuevo
+    before: str | None
+    after: str | None
+
+@router.get("/sessions/{session_id}/history", response_model=SessionHistory)
+async def get_session_history(
+    session_id: str,
+    limit: int = Query(50, ge=1, le=500),
+    before: str | None = None,
+    after: str | None = None,
+):
+    """
+    Historial de la sesión en orden cronológico, paginado por cursor: sin
+    cursores, los últimos `limit` mensajes; con `before`, los anteriores;
+    con `after`, los siguientes (p. ej. para traer lo nuevo).
+    """
+    if before and after:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Usar 'before' o 'after', no ambos.")
+    try:
+        page = await history_service.read_page(
+            session_id,
+            limit,
+            before=history_service.decode_cursor(before) if before else None,
+            after=history_service.decode_cursor(after) if after else None,
+        )
+    except history_service.InvalidCursor as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    if page is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Sesión no encontrada.")
+
+    return SessionHistory(
+        session_id=session_id,
+        messages=page.rows,
+        has_more=page.has_more,
+        before=history_service.encode_cursor(page.before) if page.before else None,
+        after=history_service.encode_cursor(page.after) if page.after else None,
+    )
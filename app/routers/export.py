@@ -0,0 +1,48 @@
+# app/routers/export.py
+
+import datetime
+from typing import Literal, Optional
+
+from fastapi import APIRouter, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
+
+from app.services.export import MEDIA_TYPES, ExportFilters, export_stream
+
+router = APIRouter(
+    prefix="/export",
+    tags=["Export"],
+)
+
+
+def _to_utc_naive(value: datetime.datetime) -> datetime.datetime:
+    if value.tzinfo is not None:
+        value = value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return value
+
+
+@router.get("/interactions")
+async def export_interactions(
+    request: Request,
+    format: Literal["ndjson", "csv"] = "ndjson",
+    start: Optional[datetime.datetime] = None,
+    end: Optional[datetime.datetime] = None,
+    context: Optional[str] = None,
+    message_type: Optional[Literal["USER", "BOT"]] = None,
+):
+    """
+    Interacciones (con session_id) en [start, end), en streaming NDJSON o
+    CSV. Si el cliente acepta gzip (Accept-Encoding), el cuerpo se
+    comprime a medida que se genera.
+    """
+    start = _to_utc_naive(start) if start else None
+    end = _to_utc_naive(end) if end else None
+    if start and end and start >= end:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="'start' debe ser anterior a 'end'.")
+
+    gzip = "gzip" in request.headers.get("accept-encoding", "").lower()
+    headers = {"Content-Disposition": f'attachment; filename="chat_interactions.{format}"'}
+    if gzip:
+        headers.update({"Content-Encoding": "gzip", "Vary": "Accept-Encoding"})
+
+    filters = ExportFilters(start=start, end=end, context=context, message_type=message_type)
+    return StreamingResponse(export_stream(filters, format, gzip), media_type=MEDIA_TYPES[format], headers=headers)
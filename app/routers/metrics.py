@@ -1,12 +1,29 @@
 # app/routers/metrics.py
 
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from sqlalchemy import func
-from app.database import get_db
-from app.models.interactions import ChatInteraction
+from fastapi import APIRouter, HTTPException, Query, Response, status
+from app.services.metrics_aggregates import NULL_CONTEXT_KEY, context_counters
+from app.services import metrics_rollups
+from app.services.reply_cache import reply_cache
+from app.services.intent import intent_classifier
+from app.services.near_duplicate import near_duplicates
+from app.services.single_flight import azure_single_flight
+from app.services.azure_client import azure_guard
+from app.services.archive import archive_rotator
+from app.services.admission import admission
+from app.services.campaign_analytics import campaign_analytics
+from app.services.campaign_ingest import campaign_ingestor
+from app.services.text_codec import text_codec
+from app.services.conversation_memory import conversation_memory
+from app.services.schema import SCHEMA_VERSION
+from app.services.startup_profile import startup_profile
+from app.services.structured_logging import debug_sampled
+from app.services.telemetry import PROMETHEUS_CONTENT_TYPE, latency_snapshot, prometheus_text
 from pydantic import BaseModel
-from typing import Dict, Any
+from typing import Dict, Any, List, Literal, Optional
+import datetime
+import logging
+
+log = logging.getLogger(__name__)
 
 router = APIRouter(
     prefix="/metrics",
@@ -22,35 +39,407 @@ class MetricsSummary(BaseModel):
 
 # 2. Endpoint Principal: /metrics/summary
 @router.get("/summary", response_model=MetricsSummary)
-def get_metrics_summary(db: Session = Depends(get_db)):
+async def get_metrics_summary():
     """
     Calcula el resumen de las interacciones del chat, incluyendo el total 
     y la distribución por contexto (MARKETING, TECH, DEFAULT).
     """
     
-    # 1. Total de Interacciones
-    total_interactions = db.query(ChatInteraction).count()
-
-    # 2. Distribución por Contexto
-    # Usamos func.count() y func.group_by() para contar las filas por el valor de la columna 'context'.
-    context_results = (
-        db.query(
-            ChatInteraction.context, 
-            func.count(ChatInteraction.context)
-        )
-        .group_by(ChatInteraction.context)
-        .all()
-    )
+    # Se responde desde los agregados incrementales (chat_context_counters)
+    # en memoria: O(1) sin importar el tamaño de la tabla de interacciones.
+    total_interactions, context_distribution = await context_counters.summary()
 
-    # 3. Formatear la Distribución
-    # Convertimos la lista de tuplas [(contexto, conteo), ...] a un diccionario {contexto: conteo}
-    context_distribution = {context: count for context, count in context_results}
-
-    print(f"[DEBUG: METRICS] Interacciones totales: {total_interactions}")
-    print(f"[DEBUG: METRICS] Distribución de contextos: {context_distribution}")
+    debug_sampled(log, "Resumen de métricas", total_interactions=total_interactions,
+                  context_distribution=context_distribution)
     
     # 4. Retornar el Modelo de Respuesta
     return MetricsSummary(
         total_interactions=total_interactions,
         context_distribution=context_distribution
-    )
\ No newline at end of file
+    )
+
+# 3. Endpoint: /metrics/cache
+class ReplyCacheStats(BaseModel):
+    """Contadores de la caché de respuestas del LLM."""
+    entries: int
+    max_entries: int
+    ttl_seconds: float
+    persistent: bool
+    hits: int
+    persistent_hits: int
+    misses: int
+    evictions: int
+    expirations: int
+
+@router.get("/cache", response_model=ReplyCacheStats)
+async def get_cache_stats():
+    """Aciertos, fallos y desalojos de la caché de respuestas (LRU+TTL)."""
+    return ReplyCacheStats(**reply_cache.stats())
+
+
+# 3b. Endpoint: /metrics/intent
+class IntentStats(BaseModel):
+    """Mensajes clasificados localmente y llamadas al LLM evitadas."""
+    classified: int
+    short_circuited: int
+    llm_calls_saved_ratio: float
+
+@router.get("/intent", response_model=IntentStats)
+async def get_intent_stats():
+    return IntentStats(**intent_classifier.stats())
+
+# 3b2. Endpoint: /metrics/near-duplicates
+class NearDuplicateStats(BaseModel):
+    """Paráfrasis respondidas con una respuesta guardada (ver app/services/near_duplicate.py)."""
+    enabled: bool
+    threshold: float
+    max_distance_bits: int
+    entries: int
+    max_entries: int
+    loading: bool
+    load_ms: Optional[float]
+    lookups: int
+    hits: int
+    hit_ratio: float
+    skipped_duplicates: int
+    dropped: int
+    stale: int
+    memory_bytes: int
+
+@router.get("/near-duplicates", response_model=NearDuplicateStats)
+async def get_near_duplicate_stats():
+    return NearDuplicateStats(**near_duplicates.stats())
+
+# 3c. Endpoint: /metrics/coalescing
+class CoalescingStats(BaseModel):
+    """Peticiones idénticas en vuelo agrupadas en una sola llamada a Azure."""
+    enabled: bool
+    in_flight: int
+    upstream_calls: int
+    joined_waiters: int
+    saved_calls: int
+    saved_ratio: float
+
+@router.get("/coalescing", response_model=CoalescingStats)
+async def get_coalescing_stats():
+    return CoalescingStats(**azure_single_flight.stats())
+
+# 3d. Endpoint: /metrics/azure
+class CircuitBreakerStats(BaseModel):
+    state: Literal["closed", "open", "half_open"]
+    consecutive_failures: int
+    trips: int
+    rejected: int
+
+class AzureCallStats(BaseModel):
+    """Presupuesto de latencia, timeouts, hedging y estado del circuit breaker."""
+    budget_ms: float
+    calls: int
+    failures: int
+    timeouts: int
+    hedging: bool
+    hedge_delay_ms: Optional[float]
+    hedges_launched: int
+    hedges_won: int
+    breaker: CircuitBreakerStats
+
+@router.get("/azure", response_model=AzureCallStats)
+async def get_azure_stats():
+    return AzureCallStats(**azure_guard.stats())
+
+# 3e. Endpoint: /metrics/conversations
+class ConversationMemoryStats(BaseModel):
+    """Sesiones residentes en la memoria de conversación y lecturas de hidratación."""
+    sessions: int
+    max_sessions: int
+    max_turns: int
+    token_budget: int
+    hits: int
+    hydrations: int
+    evictions: int
+
+@router.get("/conversations", response_model=ConversationMemoryStats)
+async def get_conversation_stats():
+    return ConversationMemoryStats(**conversation_memory.stats())
+
+# 3f. Endpoint: /metrics/startup
+class StartupStats(BaseModel):
+    """Perfil del arranque en frío de este proceso (ver app/services/startup_profile.py)."""
+    ready: bool
+    phases_ms: Dict[str, float]
+    total_ms: float
+    process_age_at_ready_ms: Optional[float]
+    schema_version: int
+
+@router.get("/startup", response_model=StartupStats)
+async def get_startup_stats():
+    return StartupStats(**startup_profile.stats(), schema_version=SCHEMA_VERSION)
+
+# 3g. Endpoint: /metrics/archive
+class ArchivePartitionInfo(BaseModel):
+    month: str
+    path: str
+    rows: int
+
+class ArchiveStats(BaseModel):
+    """Rotación de interacciones viejas a particiones mensuales (ver app/services/archive.py)."""
+    after_days: int
+    cutoff: datetime.datetime
+    interval_seconds: float
+    running: bool
+    runs: int
+    batches: int
+    rows_moved: int
+    last_run_at: Optional[datetime.datetime]
+    last_run_ms: Optional[float]
+    partitions: List[ArchivePartitionInfo]
+
+@router.get("/archive", response_model=ArchiveStats)
+async def get_archive_stats():
+    return ArchiveStats(**archive_rotator.stats(), partitions=await archive_rotator.partitions())
+
+# 3h. Endpoint: /metrics/admission
+class AdmissionStats(BaseModel):
+    """Control de admisión: ritmo por sesión (throttled) y tope de trabajo pendiente (shed)."""
+    session_rate: float
+    session_burst: int
+    max_pending: int
+    pending: int
+    sessions: int
+    max_sessions: int
+    admitted: int
+    throttled: int
+    shed: int
+    evictions: int
+
+@router.get("/admission", response_model=AdmissionStats)
+async def get_admission_stats():
+    return AdmissionStats(**admission.stats())
+
+# 3i. Endpoint: /metrics/text-codec
+class TextCodecStats(BaseModel):
+    """Compresión de message_text con diccionario (ver app/services/text_codec.py)."""
+    enabled: bool
+    level: int
+    current_version: Optional[int]
+    dictionaries: int
+    dictionary_bytes: int
+    encoded: int
+    stored_plain: int
+    raw_bytes: int
+    encoded_bytes: int
+    ratio: Optional[float]
+    decoded: int
+    migrated_rows: int
+
+@router.get("/text-codec", response_model=TextCodecStats)
+async def get_text_codec_stats():
+    return TextCodecStats(**text_codec.stats())
+
+# 3j. Endpoint: /metrics/campaign-ingest
+class CampaignIngestStats(BaseModel):
+    """Cargas de métricas de campañas (endpoint y CLI de este proceso)."""
+    batch_rows: int
+    running: int
+    runs: int
+    rows: int
+    accepted: int
+    rejected: int
+    campaigns_created: int
+    last_rows_per_s: Optional[float]
+
+@router.get("/campaign-ingest", response_model=CampaignIngestStats)
+async def get_campaign_ingest_stats():
+    return CampaignIngestStats(**campaign_ingestor.stats())
+
+# 3k. Endpoints: /metrics/campaigns (analítica de campañas en columnas en memoria)
+CampaignMetric = Literal["impressions", "clicks", "cost", "conversions", "conversion_value", "ctr", "cpc", "cpa", "roas"]
+
+class CampaignWindow(BaseModel):
+    """Ventana [start, end) y el período anterior del mismo largo [previous_start, start)."""
+    start: datetime.date
+    end: datetime.date
+    previous_start: datetime.date
+    # True: calculado con las columnas anteriores a la última ingesta (se están recargando)
+    stale: bool
+
+class CampaignDailyPoint(BaseModel):
+    date: datetime.date
+    metrics: Dict[str, Optional[float]]
+
+class CampaignSummary(CampaignWindow):
+    totals: Dict[str, Optional[float]]
+    previous: Dict[str, Optional[float]]
+    change_pct: Dict[str, Optional[float]]
+    daily: List[CampaignDailyPoint]
+
+class CampaignRow(BaseModel):
+    campaign_id: int
+    name: str
+    metrics: Dict[str, Optional[float]]
+    change_pct: Dict[str, Optional[float]]
+
+class CampaignTable(CampaignWindow):
+    active_campaigns: int
+    campaigns: List[CampaignRow]
+
+class CampaignMover(BaseModel):
+    campaign_id: int
+    name: str
+    current: Optional[float]
+    previous: Optional[float]
+    delta: Optional[float]
+    change_pct: Optional[float]
+
+class CampaignMovers(CampaignWindow):
+    metric: str
+    eligible_campaigns: int
+    up: List[CampaignMover]
+    down: List[CampaignMover]
+
+class CampaignAnalyticsStats(BaseModel):
+    loaded: bool
+    generation: Optional[int]
+    ingest_generation: int
+    stale: Optional[bool]
+    rows: int
+    campaigns: int
+    memory_bytes: int
+    age_s: Optional[float]
+    loads: int
+    last_load_ms: Optional[float]
+    queries: int
+    stale_reads: int
+
+@router.get("/campaigns/summary", response_model=CampaignSummary)
+async def get_campaigns_summary(
+    end: Optional[datetime.date] = None,
+    days: int = Query(7, ge=1, le=366),
+):
+    """
+    Totales de impresiones, clics, costo, conversiones, CTR, CPC, CPA y ROAS
+    de los `days` días anteriores a `end` (exclusivo; por defecto, el día
+    siguiente al último con datos), contra el período anterior, y la serie
+    diaria.
+    """
+    return CampaignSummary(**await campaign_analytics.summary(end, days))
+
+@router.get("/campaigns", response_model=CampaignTable)
+async def get_campaigns_table(
+    end: Optional[datetime.date] = None,
+    days: int = Query(7, ge=1, le=366),
+    sort: CampaignMetric = "cost",
+    limit: int = Query(50, ge=1, le=1000),
+):
+    """Métricas por campaña en la misma ventana, ordenadas por `sort` (desc), con la variación contra el período anterior."""
+    return CampaignTable(**await campaign_analytics.campaigns(end, days, sort, limit))
+
+@router.get("/campaigns/movers", response_model=CampaignMovers)
+async def get_campaigns_movers(
+    metric: CampaignMetric = "roas",
+    end: Optional[datetime.date] = None,
+    days: int = Query(7, ge=1, le=366),
+    limit: int = Query(10, ge=1, le=100),
+    min_impressions: int = Query(100, ge=0),
+):
+    """Campañas con mayor suba y mayor baja de `metric` contra el período anterior."""
+    return CampaignMovers(**await campaign_analytics.movers(end, days, metric, limit, min_impressions))
+
+@router.get("/campaign-analytics", response_model=CampaignAnalyticsStats)
+async def get_campaign_analytics_stats():
+    return CampaignAnalyticsStats(**campaign_analytics.stats())
+
+# 4. Endpoint: /metrics/latency
+@router.get("/latency")
+async def get_latency_metrics() -> Dict[str, Dict[str, Any]]:
+    """Histogramas de latencia (count, sum y p50/p95/p99 en segundos), p. ej. el TTFB de /chat/stream."""
+    return latency_snapshot()
+
+
+# 4b. Endpoint: /metrics/prometheus
+@router.get("/prometheus", response_class=Response)
+async def get_prometheus_metrics():
+    """
+    Histogramas por etapa (user lookup, LLM, parseo JSON, insert, commit),
+    peticiones por contexto, tokens consumidos y gauges (LLM en vuelo,
+    conexiones del pool) en formato de texto de Prometheus.
+    """
+    return Response(content=prometheus_text(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+
+# 5. Endpoints por ventana de tiempo (rollups horarios + filas crudas en los bordes)
+def _to_utc_naive(value: datetime.datetime) -> datetime.datetime:
+    if value.tzinfo is not None:
+        value = value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return value
+
+
+class TimeSeriesPoint(BaseModel):
+    bucket_start: datetime.datetime
+    context: Optional[str]
+    message_type: str
+    interactions: int
+
+class TimeSeries(BaseModel):
+    """Serie temporal de interacciones por bucket, contexto y tipo de mensaje."""
+    start: datetime.datetime
+    end: datetime.datetime
+    bucket: str
+    points: List[TimeSeriesPoint]
+
+@router.get("/timeseries", response_model=TimeSeries)
+async def get_metrics_timeseries(
+    start: Optional[datetime.datetime] = None,
+    end: Optional[datetime.datetime] = None,
+    bucket: Literal["minute", "hour", "day"] = "hour",
+    context: Optional[str] = None,
+):
+    """
+    Interacciones en [start, end) por bucket (minute/hour/day). Por defecto,
+    las últimas 24 horas. Se responde desde los rollups horarios; solo los
+    tramos parciales (o los buckets por minuto) leen filas crudas.
+    """
+    end = _to_utc_naive(end) if end else datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+    start = _to_utc_naive(start) if start else end - datetime.timedelta(days=1)
+    if start >= end:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="'start' debe ser anterior a 'end'.")
+    if bucket == "minute" and end - start > metrics_rollups.MAX_MINUTE_RANGE:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Los buckets por minuto admiten como máximo 24 horas.")
+
+    counts = await metrics_rollups.count_range(start, end, metrics_rollups.BUCKET_SIZES[bucket], context)
+    points = [
+        TimeSeriesPoint(
+            bucket_start=bucket_start,
+            context=None if row_context == NULL_CONTEXT_KEY else row_context,
+            message_type=message_type,
+            interactions=count,
+        )
+        for (bucket_start, row_context, message_type), count in sorted(counts.items())
+    ]
+    return TimeSeries(start=start, end=end, bucket=bucket, points=points)
+
+
+class WindowSummary(BaseModel):
+    """Total y distribución por contexto de los últimos N minutos."""
+    start: datetime.datetime
+    end: datetime.datetime
+    total_interactions: int
+    context_distribution: Dict[str, int]
+
+@router.get("/window", response_model=WindowSummary)
+async def get_metrics_window(minutes: int = Query(15, ge=1, le=60 * 24 * 30)):
+    """Resumen tipo /metrics/summary restringido a los últimos `minutes` minutos."""
+    end = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+    start = end - datetime.timedelta(minutes=minutes)
+
+    counts = await metrics_rollups.count_range(start, end)
+    distribution: Dict[str, int] = {}
+    for (_, row_context, _), count in counts.items():
+        if row_context != NULL_CONTEXT_KEY:
+            distribution[row_context] = distribution.get(row_context, 0) + count
+    return WindowSummary(
+        start=start,
+        end=end,
+        total_interactions=sum(counts.values()),
+        context_distribution=distribution,
+    )
@@ -0,0 +1,162 @@
+# app/services/admission.py
+"""
+Control de admisión delante del LLM: una sesión no puede acaparar la cuota
+de Azure y, con sobrecarga, las peticiones se rechazan rápido (429 con
+Retry-After) en lugar de encolarse sin límite.
+
+  - Por sesión: token bucket expresado como GCRA. En lugar de (tokens,
+    última recarga) se guarda un solo float por sesión: el "instante
+    teórico de llegada" (TAT). Una sesión con TAT vencido equivale a un
+    bucket lleno, así que se puede olvidar: las inactivas se desalojan
+    por el frente del OrderedDict (LRU) sin perder nada.
+  - Global: tope de trabajo pendiente del LLM (en cola del semáforo de
+    Azure + en vuelo). Cada petición admitida ocupa un lugar hasta que
+    get_ai_response termina.
+"""
+
+import math
+import os
+import time
+from collections import OrderedDict
+
+from app.services.telemetry import counter, gauge
+
+# --- Configuración (variables de entorno) ---
+# Peticiones por segundo sostenidas por sesión (0 = sin límite por sesión)
+ADMISSION_SESSION_RATE = float(os.getenv("ADMISSION_SESSION_RATE", "2"))
+# Ráfaga admitida por sesión por encima del ritmo sostenido
+ADMISSION_SESSION_BURST = int(os.getenv("ADMISSION_SESSION_BURST", "20"))
+# Trabajo pendiente del LLM en todo el proceso (0 = sin límite)
+ADMISSION_MAX_PENDING = int(os.getenv("ADMISSION_MAX_PENDING", "512"))
+# Sesiones con estado; por encima se desaloja la menos reciente
+ADMISSION_MAX_SESSIONS = int(os.getenv("ADMISSION_MAX_SESSIONS", "100000"))
+# Retry-After sugerido cuando se rechaza por sobrecarga
+ADMISSION_RETRY_AFTER_SECONDS = float(os.getenv("ADMISSION_RETRY_AFTER_SECONDS", "1"))
+
+rejections_total = counter("admission_rejections_total", "Peticiones rechazadas con 429, por motivo", label="reason")
+
+
+class AdmissionRejected(Exception):
+    """La petición no se admite: `reason` es "session_rate" u "overload"."""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+    @property
+    def retry_after_header(self) -> str:
+        # Retry-After en segundos enteros (nunca 0: el cliente reintentaría en el acto)
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+class AdmissionTicket:
+    """Lugar reservado en el trabajo pendiente; se libera una sola vez (release() o al salir del with)."""
+
+    __slots__ = ("_controller", "_released")
+
+    def __init__(self, controller: "AdmissionController"):
+        self._controller = controller
+        self._released = False
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self._controller._release()
+
+    def __enter__(self) -> "AdmissionTicket":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.release()
+
+
+class AdmissionController:
+    """Token bucket (GCRA) por sesión en un OrderedDict LRU + contador global de trabajo pendiente."""
+
+    def __init__(self, session_rate: float, session_burst: int, max_pending: int, max_sessions: int,
+                 retry_after_seconds: float):
+        self.session_rate = session_rate
+        self.session_burst = session_burst
+        self.max_pending = max_pending
+        self.max_sessions = max_sessions
+        self.retry_after_seconds = retry_after_seconds
+        # GCRA: intervalo entre peticiones y tolerancia de ráfaga
+        self._interval = 1.0 / session_rate if session_rate > 0 else 0.0
+        self._tolerance = self._interval * (session_burst - 1)
+
+        self._sessions: OrderedDict[str, float] = OrderedDict()
+        self.pending = 0
+
+        self.admitted = 0
+        self.throttled = 0
+        self.shed = 0
+        self.evictions = 0
+
+    def _check_session(self, session_id: str, now: float) -> None:
+        """GCRA: admite si el TAT no supera now + tolerancia; si no, rechaza con la espera exacta."""
+        tat = max(self._sessions.get(session_id, now), now)
+        if tat - now > self._tolerance:
+            self.throttled += 1
+            rejections_total.inc("session_rate")
+            raise AdmissionRejected("session_rate", tat - now - self._tolerance)
+        self._sessions[session_id] = tat + self._interval
+        self._sessions.move_to_end(session_id)
+        self._evict(now)
+
+    def _evict(self, now: float) -> None:
+        # Frente del LRU: TAT vencido = bucket lleno, olvidarla no cambia nada
+        while self._sessions:
+            session_id, tat = next(iter(self._sessions.items()))
+            if tat > now and len(self._sessions) <= self.max_sessions:
+                break
+            del self._sessions[session_id]
+            self.evictions += 1
+
+    def check(self, session_id: str | None = None) -> None:
+        """Lanza AdmissionRejected si la sesión excede su ritmo o el pendiente global está lleno."""
+        if self.max_pending and self.pending >= self.max_pending:
+            self.shed += 1
+            rejections_total.inc("overload")
+            raise AdmissionRejected("overload", self.retry_after_seconds)
+        if session_id is not None and self._interval:
+            self._check_session(session_id, time.monotonic())
+
+    def reserve(self) -> AdmissionTicket:
+        """Ocupa un lugar del pendiente sin controles (p. ej. ítems de un lote ya admitido)."""
+        self.pending += 1
+        return AdmissionTicket(self)
+
+    def admit(self, session_id: str | None = None) -> AdmissionTicket:
+        """check() + reserve(): el ticket debe liberarse cuando termina la llamada al LLM."""
+        self.check(session_id)
+        self.admitted += 1
+        return self.reserve()
+
+    def _release(self) -> None:
+        self.pending -= 1
+
+    def stats(self) -> dict:
+        return {
+            "session_rate": self.session_rate,
+            "session_burst": self.session_burst,
+            "max_pending": self.max_pending,
+            "pending": self.pending,
+            "sessions": len(self._sessions),
+            "max_sessions": self.max_sessions,
+            "admitted": self.admitted,
+            "throttled": self.throttled,
+            "shed": self.shed,
+            "evictions": self.evictions,
+        }
+
+
+admission = AdmissionController(
+    session_rate=ADMISSION_SESSION_RATE,
+    session_burst=ADMISSION_SESSION_BURST,
+    max_pending=ADMISSION_MAX_PENDING,
+    max_sessions=ADMISSION_MAX_SESSIONS,
+    retry_after_seconds=ADMISSION_RETRY_AFTER_SECONDS,
+)
+
+gauge("admission_pending", "Trabajo pendiente del LLM (admitido y sin terminar)", read=lambda: admission.pending)
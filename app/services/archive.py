@@ -0,0 +1,428 @@
+# app/services/archive.py
+"""
+Archivo por meses de 'chat_interactions': las filas con más de
+ARCHIVE_AFTER_DAYS días (redondeado al inicio del mes) se mueven a un
+archivo SQLite por mes (ARCHIVE_DIR/chat_interactions_AAAA_MM.db) con la
+misma tabla. La tabla viva queda acotada a los meses recientes.
+
+  - Rotación en línea: lotes de ARCHIVE_BATCH_ROWS filas, cada uno en su
+    propia transacción con el lock de escritura; entre lotes se suelta el
+    lock, así una escritura del chat espera como mucho un lote. Si el
+    proceso muere entre el commit de la partición y el de la base viva,
+    la siguiente rotación reconoce las filas ya copiadas (mismo id y mismo
+    contenido) y termina el lote sin duplicar; un id que ya está en la
+    partición con otro contenido es un error (ArchiveConflictError) y no
+    se borra nada de la tabla viva.
+  - Los ids de 'chat_interactions' son AUTOINCREMENT: aunque la rotación
+    vacíe la tabla, SQLite no vuelve a entregar ids archivados.
+    ensure_id_sequence() migra las tablas creadas antes (v8).
+  - Las huellas de casi duplicados de las filas archivadas se borran en
+    el mismo lote: solo apuntan a respuestas de la tabla viva.
+  - Lectura: interaction_tables() da la tabla viva y, solo si el rango
+    pedido empieza antes del corte, las particiones de los meses que
+    toca, adjuntas en solo lectura (ATTACH 'file:...?mode=ro').
+  - Los contadores y rollups horarios no se tocan: siguen cubriendo toda
+    la historia. La memoria de conversación solo lee la tabla viva.
+
+Uso:
+    python -m app.services.archive rotate
+    python -m app.services.archive list
+"""
+
+import argparse
+import asyncio
+import datetime
+import functools
+import logging
+import os
+import time
+import urllib.parse
+from contextlib import asynccontextmanager
+
+from sqlalchemy import Column, Connection, Index, MetaData, Table, and_, delete, func, insert, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.database import DATABASE_PATH, async_engine, engine, write_connection
+from app.models.archive import ArchivePartition
+from app.models.fingerprints import ReplyFingerprint
+from app.models.interactions import ChatInteraction
+from app.models import users # noqa: F401 (registra User para la relación de ChatInteraction)
+
+log = logging.getLogger(__name__)
+
+# --- Configuración (variables de entorno) ---
+# Antigüedad a partir de la cual una fila se archiva (se redondea al inicio del mes)
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "180"))
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", os.path.join(os.path.dirname(DATABASE_PATH), "archive"))
+ARCHIVE_BATCH_ROWS = int(os.getenv("ARCHIVE_BATCH_ROWS", "500"))
+# Rotación periódica dentro del proceso (0 = solo por CLI)
+ARCHIVE_ROTATE_INTERVAL_SECONDS = float(os.getenv("ARCHIVE_ROTATE_INTERVAL_SECONDS", "0"))
+
+LIVE_TABLE = ChatInteraction.__table__
+
+
+class ArchiveConflictError(RuntimeError):
+    """La partición ya tiene, con otro contenido, ids que se iban a archivar."""
+
+
+def _utcnow() -> datetime.datetime:
+    return datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+
+
+def month_start(value: datetime.datetime) -> datetime.datetime:
+    return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def next_month(value: datetime.datetime) -> datetime.datetime:
+    start = month_start(value)
+    return start.replace(year=start.year + start.month // 12, month=start.month % 12 + 1)
+
+
+def archive_cutoff(now: datetime.datetime | None = None, after_days: int = ARCHIVE_AFTER_DAYS) -> datetime.datetime:
+    """Todo lo que es >= al corte está en la tabla viva (el corte solo avanza)."""
+    return month_start((now or _utcnow()) - datetime.timedelta(days=after_days))
+
+
+def _schema_name(month: datetime.datetime) -> str:
+    return f"archive_{month:%Y_%m}"
+
+
+@functools.cache
+def partition_table(schema: str) -> Table:
+    """Misma estructura que 'chat_interactions' (sin FK a users) en el esquema adjunto."""
+    table = Table(
+        LIVE_TABLE.name, MetaData(schema=schema),
+        *(Column(column.name, column.type, primary_key=column.primary_key) for column in LIVE_TABLE.columns),
+    )
+    Index("ix_chat_interactions_created_at_context", table.c.created_at, table.c.context)
+    Index("ix_chat_interactions_context", table.c.context)
+    Index("ix_chat_interactions_user_history", table.c.user_id, table.c.created_at, table.c.id,
+          table.c.message_type, table.c.context)
+    return table
+
+
+def _attach_target(path: str, read_only: bool) -> str:
+    if not read_only:
+        return path
+    return f"file:{urllib.parse.quote(os.path.abspath(path))}?mode=ro"
+
+
+@asynccontextmanager
+async def attach(conn: AsyncConnection, month: datetime.datetime, path: str, read_only: bool = True):
+    """Adjunta la partición de `month` a `conn` y devuelve su tabla; deshace lo pendiente y la desadjunta al salir."""
+    schema = _schema_name(month)
+    attached = (await conn.exec_driver_sql("PRAGMA database_list")).all()
+    if any(name == schema for _, name, _ in attached):
+        # Quedó adjunta en esta conexión del pool (un DETACH que no llegó a correr): se rehace
+        log.warning("Partición %s ya adjunta en la conexión; se desadjunta", schema)
+        await conn.exec_driver_sql(f"DETACH DATABASE {schema}")
+    await conn.exec_driver_sql(f"ATTACH DATABASE ? AS {schema}", (_attach_target(path, read_only),))
+    try:
+        yield partition_table(schema)
+    except BaseException:
+        await conn.rollback()
+        raise
+    finally:
+        await conn.exec_driver_sql(f"DETACH DATABASE {schema}")
+
+
+async def archived_partitions(conn: AsyncConnection, start: datetime.datetime | None,
+                              end: datetime.datetime | None) -> list[tuple[datetime.datetime, str]]:
+    """(month_start, path) de las particiones que se solapan con [start, end)."""
+    if start is not None and start >= archive_cutoff():
+        return []
+    query = select(ArchivePartition.month_start, ArchivePartition.path).order_by(ArchivePartition.month_start)
+    if start is not None:
+        query = query.where(ArchivePartition.month_start >= month_start(start))
+    if end is not None:
+        query = query.where(ArchivePartition.month_start < end)
+    return [tuple(row) for row in (await conn.execute(query)).all()]
+
+
+async def interaction_tables(conn: AsyncConnection, start: datetime.datetime | None = None,
+                             end: datetime.datetime | None = None):
+    """
+    Tablas con las interacciones de [start, end): la viva y, si el rango
+    llega a meses archivados, cada partición (adjunta mientras se consume).
+    """
+    yield LIVE_TABLE
+    for month, path in await archived_partitions(conn, start, end):
+        async with attach(conn, month, path) as table:
+            yield table
+
+
+def interaction_tables_sync(conn: Connection):
+    """Igual que interaction_tables, sin rango y sobre una conexión síncrona (reconstrucciones por CLI)."""
+    yield LIVE_TABLE
+    partitions = conn.execute(select(ArchivePartition.month_start, ArchivePartition.path)).all()
+    for month, path in partitions:
+        schema = _schema_name(month)
+        conn.exec_driver_sql(f"ATTACH DATABASE ? AS {schema}", (_attach_target(path, read_only=True),))
+        try:
+            yield partition_table(schema)
+        finally:
+            conn.exec_driver_sql(f"DETACH DATABASE {schema}")
+
+
+def stale_index(conn: Connection, index: Index, schema: str = "main") -> bool:
+    """True si `index` existe en la base con otras columnas que las del modelo (hay que rehacerlo)."""
+    columns = [row[2] for row in conn.exec_driver_sql(f'PRAGMA {schema}.index_info("{index.name}")')]
+    return bool(columns) and columns != [column.name for column in index.columns]
+
+
+def ensure_partition_indexes() -> None:
+    """
+    Lleva los índices de cada partición a los del modelo: rehace los que
+    cambiaron de columnas (v9: historial sin message_text) y crea los que
+    faltan (v10: context).
+    """
+    with engine.connect() as conn:
+        partitions = conn.execute(select(ArchivePartition.month_start, ArchivePartition.path)).all()
+        for month, path in partitions:
+            schema = _schema_name(month)
+            conn.exec_driver_sql(f"ATTACH DATABASE ? AS {schema}", (path,))
+            try:
+                for index in partition_table(schema).indexes:
+                    if stale_index(conn, index, schema):
+                        conn.exec_driver_sql(f'DROP INDEX {schema}."{index.name}"')
+                        log.info("Índice %s rehecho en la partición %s", index.name, path)
+                    index.create(conn, checkfirst=True)
+                conn.commit()
+            finally:
+                conn.exec_driver_sql(f"DETACH DATABASE {schema}")
+
+
+def _max_archived_id() -> int:
+    """Mayor id entre la tabla viva, las particiones y las huellas (las huellas pueden sobrevivir a su fila)."""
+    # Fuera de transacción: ATTACH no se admite dentro de una
+    with engine.connect() as conn:
+        high = max((conn.execute(select(func.max(table.c.id))).scalar() or 0)
+                   for table in interaction_tables_sync(conn))
+        return max(high, conn.execute(select(func.max(ReplyFingerprint.reply_id))).scalar() or 0)
+
+
+def ensure_id_sequence() -> None:
+    """
+    Reconstruye 'chat_interactions' con AUTOINCREMENT si se creó sin él y
+    lleva su secuencia por encima de todo id ya entregado, incluidos los
+    archivados: con la tabla viva vacía, SQLite volvería a empezar en 1.
+    """
+    name = LIVE_TABLE.name
+    high = _max_archived_id()
+    with engine.begin() as conn:
+        ddl = conn.exec_driver_sql("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)).scalar()
+        if "AUTOINCREMENT" not in ddl.upper():
+            indexes = conn.exec_driver_sql(
+                "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL", (name,)
+            ).scalars().all()
+            for index in indexes:
+                conn.exec_driver_sql(f'DROP INDEX "{index}"')
+            conn.exec_driver_sql(f"ALTER TABLE {name} RENAME TO {name}_legacy")
+            LIVE_TABLE.create(conn)
+            columns = ", ".join(column.name for column in LIVE_TABLE.columns)
+            conn.exec_driver_sql(f"INSERT INTO {name} ({columns}) SELECT {columns} FROM {name}_legacy")
+            conn.exec_driver_sql(f"DROP TABLE {name}_legacy")
+            # Huellas que ya no apuntan a una respuesta viva: con ids reutilizados podrían apuntar a otra
+            conn.execute(delete(ReplyFingerprint).where(ReplyFingerprint.reply_id.not_in(
+                select(LIVE_TABLE.c.id).where(LIVE_TABLE.c.message_type == "BOT")
+            )))
+            log.info("'%s' reconstruida con AUTOINCREMENT", name)
+        conn.exec_driver_sql(
+            "INSERT INTO sqlite_sequence (name, seq) SELECT ?, 0 "
+            "WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = ?)", (name, name),
+        )
+        conn.exec_driver_sql("UPDATE sqlite_sequence SET seq = max(seq, ?) WHERE name = ?", (high, name))
+
+
+class ArchiveRotator:
+    """Mueve las filas viejas de la tabla viva a sus particiones mensuales."""
+
+    def __init__(self, after_days: int, batch_rows: int, interval_seconds: float, archive_dir: str):
+        self.after_days = after_days
+        self.batch_rows = batch_rows
+        self.interval_seconds = interval_seconds
+        self.archive_dir = archive_dir
+
+        self.runs = 0
+        self.batches = 0
+        self.rows_moved = 0
+        self.last_run_at: datetime.datetime | None = None
+        self.last_run_seconds: float | None = None
+        self._task: asyncio.Task | None = None
+
+    async def rotate(self, now: datetime.datetime | None = None) -> int:
+        """Archiva todo lo anterior al corte; devuelve cuántas filas movió."""
+        started = time.perf_counter()
+        cutoff = archive_cutoff(now, self.after_days)
+        moved = 0
+        while (month := await self._oldest_live_month(cutoff)) is not None:
+            path = await self._open_partition(month)
+            upper = min(next_month(month), cutoff)
+            moved_month = 0
+            while batch := await self._move_batch(month, path, upper):
+                moved_month += batch
+                # Entre lotes se suelta el lock: las escrituras del chat pasan
+                await asyncio.sleep(0)
+            await self._update_catalog(month, path)
+            if not moved_month:
+                log.warning("Rotación detenida: no se pudieron mover filas de %s", f"{month:%Y-%m}")
+                break
+            moved += moved_month
+            log.info("Mes %s archivado", f"{month:%Y-%m}", extra={"rows": moved_month, "path": path})
+
+        self.runs += 1
+        self.rows_moved += moved
+        self.last_run_at = _utcnow()
+        self.last_run_seconds = time.perf_counter() - started
+        return moved
+
+    async def _oldest_live_month(self, cutoff: datetime.datetime) -> datetime.datetime | None:
+        async with async_engine.connect() as conn:
+            oldest = (await conn.execute(
+                select(func.min(LIVE_TABLE.c.created_at)).where(LIVE_TABLE.c.created_at < cutoff)
+            )).scalar()
+        return month_start(oldest) if oldest is not None else None
+
+    async def _open_partition(self, month: datetime.datetime) -> str:
+        """Crea (si hace falta) el archivo de la partición y su fila en el catálogo."""
+        async with write_connection() as conn:
+            path = (await conn.execute(
+                select(ArchivePartition.path).where(ArchivePartition.month_start == month)
+            )).scalar()
+            if path is None:
+                os.makedirs(self.archive_dir, exist_ok=True)
+                path = os.path.join(self.archive_dir, f"chat_interactions_{month:%Y_%m}.db")
+            async with attach(conn, month, path, read_only=False) as table:
+                await conn.run_sync(lambda sync_conn: table.metadata.create_all(sync_conn))
+                await conn.execute(
+                    sqlite_insert(ArchivePartition)
+                    .values(month_start=month, path=path, rows=0)
+                    .on_conflict_do_nothing()
+                )
+                await conn.commit()
+        return path
+
+    async def _move_batch(self, month: datetime.datetime, path: str, upper: datetime.datetime) -> int:
+        async with write_connection() as conn:
+            async with attach(conn, month, path, read_only=False) as table:
+                ids = (await conn.execute(
+                    select(LIVE_TABLE.c.id)
+                    .where(LIVE_TABLE.c.created_at < upper)
+                    .order_by(LIVE_TABLE.c.created_at, LIVE_TABLE.c.id)
+                    .limit(self.batch_rows)
+                )).scalars().all()
+                if not ids:
+                    return 0
+                # Copiadas por un lote que murió antes de borrar de la tabla viva: mismo id y contenido
+                # (message_text se compara tal cual está guardado; la copia no lo recodifica). Con alias:
+                # la partición también se llama 'chat_interactions' y el nombre sin esquema sería ella
+                live = LIVE_TABLE.alias("live")
+                copied = select(table.c.id).join(live, and_(
+                    table.c.id == live.c.id,
+                    table.c.created_at == live.c.created_at,
+                    table.c.message_type == live.c.message_type,
+                    table.c.user_id.is_not_distinct_from(live.c.user_id),
+                    table.c.context.is_not_distinct_from(live.c.context),
+                    table.c.message_text.is_not_distinct_from(live.c.message_text),
+                )).where(table.c.id.in_(ids))
+                try:
+                    await conn.execute(
+                        insert(table).from_select(
+                            [column.name for column in LIVE_TABLE.columns],
+                            select(*LIVE_TABLE.columns).where(LIVE_TABLE.c.id.in_(ids), LIVE_TABLE.c.id.not_in(copied)),
+                        )
+                    )
+                except IntegrityError as e:
+                    raise ArchiveConflictError(
+                        f"La partición {path} ya tiene otras filas con ids del lote ({min(ids)}..{max(ids)}); "
+                        "no se borra nada de la tabla viva"
+                    ) from e
+                await conn.execute(delete(LIVE_TABLE).where(LIVE_TABLE.c.id.in_(ids)))
+                await conn.execute(delete(ReplyFingerprint).where(ReplyFingerprint.reply_id.in_(ids)))
+                await conn.commit()
+        self.batches += 1
+        return len(ids)
+
+    async def _update_catalog(self, month: datetime.datetime, path: str) -> None:
+        async with write_connection() as conn:
+            async with attach(conn, month, path) as table:
+                rows = (await conn.execute(select(func.count()).select_from(table))).scalar_one()
+                await conn.execute(
+                    update(ArchivePartition).where(ArchivePartition.month_start == month).values(rows=rows)
+                )
+                await conn.commit()
+
+    async def start(self) -> None:
+        if self._task is None and self.interval_seconds > 0:
+            self._task = asyncio.create_task(self._run(), name="archive-rotator")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.rotate()
+            except Exception:
+                log.exception("Fallo en la rotación del archivo")
+            await asyncio.sleep(self.interval_seconds)
+
+    async def partitions(self) -> list[dict]:
+        async with async_engine.connect() as conn:
+            rows = (await conn.execute(
+                select(ArchivePartition.month_start, ArchivePartition.path, ArchivePartition.rows)
+                .order_by(ArchivePartition.month_start)
+            )).all()
+        return [{"month": f"{month:%Y-%m}", "path": path, "rows": count} for month, path, count in rows]
+
+    def stats(self) -> dict:
+        return {
+            "after_days": self.after_days,
+            "cutoff": archive_cutoff(after_days=self.after_days),
+            "interval_seconds": self.interval_seconds,
+            "running": self._task is not None,
+            "runs": self.runs,
+            "batches": self.batches,
+            "rows_moved": self.rows_moved,
+            "last_run_at": self.last_run_at,
+            "last_run_ms": round(self.last_run_seconds * 1000, 1) if self.last_run_seconds is not None else None,
+        }
+
+
+archive_rotator = ArchiveRotator(
+    after_days=ARCHIVE_AFTER_DAYS,
+    batch_rows=ARCHIVE_BATCH_ROWS,
+    interval_seconds=ARCHIVE_ROTATE_INTERVAL_SECONDS,
+    archive_dir=ARCHIVE_DIR,
+)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["rotate", "list"])
+    args = parser.parse_args()
+
+    async def run() -> None:
+        try:
+            if args.command == "rotate":
+                moved = await archive_rotator.rotate()
+                print(f"Archivadas {moved} filas anteriores a {archive_cutoff():%Y-%m-%d}.")
+            for partition in await archive_rotator.partitions():
+                print(f"{partition['month']}  {partition['rows']:>10} filas  {partition['path']}")
+        finally:
+            await async_engine.dispose()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+# app/services/azure_client.py
+
+import asyncio
+import logging
+import os
+import threading
+
+from dotenv import load_dotenv
+
+from app.services.resilience import (
+    AZURE_BREAKER_FAILURES, AZURE_BREAKER_RESET_SECONDS, AZURE_HEDGE_ENABLED,
+    AZURE_HEDGE_MIN_DELAY_MS, AZURE_HEDGE_MIN_SAMPLES, AZURE_LATENCY_BUDGET_MS,
+    CircuitBreaker, CircuitOpenError, GuardedCall,
+)
+from app.services.telemetry import gauge, histogram
+
+load_dotenv()
+
+log = logging.getLogger(__name__)
+
+# --- CONFIGURACIÓN DE AZURE (DEBE USAR VARIABLES DE ENTORNO) ---
+AZURE_ENDPOINT = os.getenv("AZURE_OPENAI_ENDPOINT")
+AZURE_API_KEY = os.getenv("AZURE_OPENAI_API_KEY")
+AZURE_API_VERSION = os.getenv("AZURE_OPENAI_API_VERSION", "2025-01-01-preview")
+AZURE_DEPLOYMENT_NAME = os.getenv("AZURE_OPENAI_DEPLOYMENT", "gpt-5-chat-optiFoodAI-1")
+
+# --- Timeouts y límites del pool HTTP compartido ---
+AZURE_TIMEOUT_SECONDS = float(os.getenv("AZURE_OPENAI_TIMEOUT", "30"))
+AZURE_CONNECT_TIMEOUT_SECONDS = float(os.getenv("AZURE_OPENAI_CONNECT_TIMEOUT", "5"))
+AZURE_MAX_RETRIES = int(os.getenv("AZURE_OPENAI_MAX_RETRIES", "2"))
+# Máximo de llamadas simultáneas a Azure (el resto espera en el semáforo)
+AZURE_MAX_CONCURRENCY = int(os.getenv("AZURE_OPENAI_MAX_CONCURRENCY", "64"))
+AZURE_MAX_KEEPALIVE = int(os.getenv("AZURE_OPENAI_MAX_KEEPALIVE", "32"))
+# Construir el cliente en segundo plano al terminar el arranque (si no, en la primera llamada)
+AZURE_CLIENT_PREWARM = os.getenv("AZURE_OPENAI_PREWARM", "1") == "1"
+
+# Presupuesto de latencia + circuit breaker + hedging (app/services/resilience.py)
+azure_guard = GuardedCall(
+    breaker=CircuitBreaker(AZURE_BREAKER_FAILURES, AZURE_BREAKER_RESET_SECONDS),
+    budget_seconds=AZURE_LATENCY_BUDGET_MS / 1000.0,
+    hedge=AZURE_HEDGE_ENABLED,
+    latency=histogram("azure_completion_seconds", "Duración de cada intento de chat.completions en Azure"),
+    hedge_min_samples=AZURE_HEDGE_MIN_SAMPLES,
+    hedge_min_delay=AZURE_HEDGE_MIN_DELAY_MS / 1000.0,
+)
+
+llm_in_flight = gauge("azure_llm_calls_in_flight", "Llamadas a Azure OpenAI en curso (dentro del semáforo)")
+
+# openai (y httpx) se importan al construir el cliente: el import de openai
+# es ~1/3 del arranque en frío y no hace falta para quedar listo.
+_http_client = None  # httpx.AsyncClient
+_client = None  # openai.AsyncAzureOpenAI
+_semaphore: asyncio.Semaphore | None = None
+_init_failed = False
+_init_lock = threading.Lock()
+
+
+def _get_client():
+    """Devuelve el cliente compartido de Azure; lo crea (una sola vez) en el primer uso."""
+    global _http_client, _client, _semaphore, _init_failed
+
+    if _client is not None or _init_failed:
+        return _client
+    with _init_lock:
+        if _client is not None or _init_failed:
+            return _client
+        if not (AZURE_ENDPOINT and AZURE_API_KEY):
+            _init_failed = True
+            log.warning("Variables de entorno de Azure no cargadas. Usando lógica de prueba.")
+            return None
+
+        try:
+            import httpx
+            import openai
+
+            timeout = httpx.Timeout(AZURE_TIMEOUT_SECONDS, connect=AZURE_CONNECT_TIMEOUT_SECONDS)
+            http_client = httpx.AsyncClient(
+                timeout=timeout,
+                limits=httpx.Limits(
+                    max_connections=AZURE_MAX_CONCURRENCY,
+                    max_keepalive_connections=AZURE_MAX_KEEPALIVE,
+                ),
+            )
+            client = openai.AsyncAzureOpenAI(
+                azure_endpoint=AZURE_ENDPOINT,
+                api_key=AZURE_API_KEY,
+                api_version=AZURE_API_VERSION,
+                timeout=timeout,
+                max_retries=AZURE_MAX_RETRIES,
+                http_client=http_client,
+            )
+            _semaphore = asyncio.Semaphore(AZURE_MAX_CONCURRENCY)
+            _http_client = http_client
+            _client = client
+            # Nunca se loguea la API key (y el formateador la redacta igualmente)
+            log.info("Cliente de Azure OpenAI configurado", extra={"deployment": AZURE_DEPLOYMENT_NAME})
+        except Exception as e:
+            _init_failed = True
+            log.error("Fallo al inicializar el cliente de Azure OpenAI: %s", e)
+        return _client
+
+
+def prewarm() -> None:
+    """Construye el cliente en un hilo sin demorar el arranque (fin del lifespan)."""
+    if AZURE_CLIENT_PREWARM and AZURE_ENDPOINT and AZURE_API_KEY:
+        asyncio.get_running_loop().run_in_executor(None, _get_client)
+
+
+async def close_client() -> None:
+    """Cierra el pool HTTP compartido (fin del lifespan)."""
+    global _http_client, _client, _semaphore, _init_failed
+
+    if _http_client is not None:
+        await _http_client.aclose()
+    _http_client = None
+    _client = None
+    _semaphore = None
+    _init_failed = False
+
+
+def is_configured() -> bool:
+    return _get_client() is not None
+
+
+async def create_chat_completion(messages: list[dict], **kwargs):
+    """
+    Ejecuta chat.completions.create sobre el cliente compartido, limitando
+    el número de llamadas en vuelo con el semáforo global, dentro del
+    presupuesto de latencia y del circuit breaker (ver azure_guard).
+    """
+    client = _get_client()
+    if client is None:
+        raise RuntimeError("Cliente de Azure OpenAI no inicializado.")
+
+    async def attempt():
+        async with _semaphore:
+            with llm_in_flight.track():
+                return await client.chat.completions.create(
+                    model=AZURE_DEPLOYMENT_NAME,
+                    messages=messages,
+                    **kwargs,
+                )
+
+    return await azure_guard(attempt)
+
+
+async def stream_chat_completion(messages: list[dict], usage: dict | None = None, **kwargs):
+    """
+    Igual que create_chat_completion pero con stream=True: genera los
+    fragmentos de texto (delta.content) a medida que llegan de Azure.
+    El presupuesto de latencia limita la espera hasta abrir el stream
+    (no hay hedging: los tokens no se pueden duplicar).
+
+    Si se pasa `usage`, se pide el chunk final de uso (include_usage) y se
+    deja ahí {"prompt_tokens", "completion_tokens"}.
+    """
+    client = _get_client()
+    if client is None:
+        raise RuntimeError("Cliente de Azure OpenAI no inicializado.")
+    breaker = azure_guard.breaker
+    if not breaker.allow():
+        raise CircuitOpenError("Circuito abierto para Azure OpenAI.")
+
+    if usage is not None:
+        kwargs["stream_options"] = {"include_usage": True}
+
+    try:
+        async with _semaphore:
+            with llm_in_flight.track():
+                stream = await asyncio.wait_for(
+                    client.chat.completions.create(
+                        model=AZURE_DEPLOYMENT_NAME,
+                        messages=messages,
+                        stream=True,
+                        **kwargs,
+                    ),
+                    timeout=azure_guard.budget_seconds,
+                )
+                try:
+                    async for chunk in stream:
+                        if usage is not None and chunk.usage is not None:
+                            usage["prompt_tokens"] = chunk.usage.prompt_tokens
+                            usage["completion_tokens"] = chunk.usage.completion_tokens
+                        # Azure envía un primer chunk sin 'choices' (filtros de contenido)
+                        # y, con include_usage, uno final sin 'choices' con el uso
+                        if not chunk.choices:
+                            continue
+                        content = chunk.choices[0].delta.content
+                        if content:
+                            yield content
+                finally:
+                    await stream.close()
+    except (asyncio.CancelledError, GeneratorExit):
+        breaker.release()
+        raise
+    except Exception:
+        breaker.record_failure()
+        raise
+    breaker.record_success()
@@ -0,0 +1,364 @@
+# app/services/campaign_analytics.py
+"""
+Analítica de campañas (CTR, CPC, CPA, ROAS) sobre 'campaign_daily_stats'
+en columnas de NumPy en memoria, en lugar de un GROUP BY por consulta.
+
+  - Carga: un SELECT de la tabla entera a un arreglo estructurado
+    (np.fromiter, sin listas intermedias), repartido en una columna por
+    métrica y ordenado por día (argsort estable). Las campañas se
+    renumeran a un índice denso 0..n-1. ~40 bytes por fila.
+  - Consulta: una ventana de días es un tramo contiguo de las columnas
+    (searchsorted) y las sumas por campaña salen de np.bincount con la
+    métrica como peso; el período anterior es otro tramo. Las razones se
+    calculan sobre las sumas (CTR = clics / impresiones de la ventana, no
+    el promedio de los CTR diarios); sin denominador, None.
+  - Invalidación: cada lote confirmado por la ingesta sube
+    campaign_ingestor.generation; una consulta que ve una generación
+    distinta (o columnas con más de CAMPAIGN_ANALYTICS_MAX_AGE_SECONDS,
+    por cargas de otro proceso) dispara la recarga en segundo plano y se
+    responde con las columnas anteriores marcadas como stale. Solo la
+    primera consulta espera la carga; las concurrentes la comparten.
+"""
+
+import asyncio
+import datetime
+import logging
+import os
+import time
+from dataclasses import dataclass
+
+import numpy as np
+from sqlalchemy import select
+
+from app.database import engine
+from app.models.campaigns import Campaign
+from app.services.campaign_ingest import campaign_ingestor
+from app.services.single_flight import SingleFlight
+from app.services.telemetry import gauge, histogram
+
+log = logging.getLogger(__name__)
+
+# --- Configuración (variables de entorno) ---
+# Antigüedad máxima de las columnas aunque la ingesta de este proceso no haya cambiado nada
+# (cargas desde la CLI u otro worker); 0 = solo se recarga tras una ingesta de este proceso
+CAMPAIGN_ANALYTICS_MAX_AGE_SECONDS = float(os.getenv("CAMPAIGN_ANALYTICS_MAX_AGE_SECONDS", "300"))
+
+# Sumas por ventana y razones derivadas de ellas
+SUMS = ("impressions", "clicks", "cost", "conversions", "conversion_value")
+RATIOS = ("ctr", "cpc", "cpa", "roas")
+METRICS = SUMS + RATIOS
+
+_EPOCH = datetime.date(1970, 1, 1)
+# Días desde 1970-01-01: el orden y las ventanas se resuelven con enteros
+_ROW = np.dtype([
+    ("campaign_id", np.int64), ("day", np.int32),
+    ("impressions", np.int32), ("clicks", np.int32),
+    ("cost", np.float64), ("conversions", np.float64), ("conversion_value", np.float64),
+])
+_SELECT = """
+SELECT campaign_id, CAST(julianday(date) - 2440587.5 AS INTEGER),
+       impressions, clicks, cost, conversions, conversion_value
+FROM campaign_daily_stats
+"""
+
+load_seconds = histogram("campaign_analytics_load_seconds", "Carga de campaign_daily_stats a columnas en memoria",
+                         buckets=(0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300))
+
+
+def to_day(value: datetime.date) -> int:
+    return (value - _EPOCH).days
+
+
+def from_day(day: int) -> datetime.date:
+    return _EPOCH + datetime.timedelta(days=int(day))
+
+
+def _ratio(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    numerator = np.asarray(numerator, dtype=np.float64)
+    return np.divide(numerator, denominator, out=np.full_like(numerator, np.nan), where=denominator > 0)
+
+
+def with_ratios(sums: dict[str, np.ndarray]) -> dict[str, np.ndarray]:
+    """Agrega CTR, CPC, CPA y ROAS a las sumas (arreglos por campaña, por día o escalares)."""
+    return {
+        **sums,
+        "ctr": _ratio(sums["clicks"], sums["impressions"]),
+        "cpc": _ratio(sums["cost"], sums["clicks"]),
+        "cpa": _ratio(sums["cost"], sums["conversions"]),
+        "roas": _ratio(sums["conversion_value"], sums["cost"]),
+    }
+
+
+def change_pct(current: np.ndarray, previous: np.ndarray) -> np.ndarray:
+    """Variación porcentual contra el período anterior (NaN si el anterior es 0 o no existe)."""
+    return _ratio(np.asarray(current) - previous, np.nan_to_num(previous)) * 100
+
+
+def as_value(value) -> float | None:
+    """Escalar de NumPy a float de Python; NaN (sin denominador) a None."""
+    value = float(value)
+    # + 0.0: sin -0.0 en el JSON (p. ej. una variación de 0 calculada sobre negativos)
+    return None if np.isnan(value) else round(value, 6) + 0.0
+
+
+@dataclass(frozen=True)
+class CampaignColumns:
+    """Foto inmutable de 'campaign_daily_stats' ordenada por día."""
+    generation: int
+    loaded_at: float
+    # Por índice denso de campaña
+    campaign_ids: np.ndarray
+    names: list[str]
+    # Por fila
+    day: np.ndarray
+    campaign: np.ndarray
+    metrics: dict[str, np.ndarray]
+
+    @property
+    def rows(self) -> int:
+        return len(self.day)
+
+    @property
+    def nbytes(self) -> int:
+        return (self.day.nbytes + self.campaign.nbytes + self.campaign_ids.nbytes
+                + sum(column.nbytes for column in self.metrics.values()))
+
+    def last_day(self) -> int | None:
+        return int(self.day[-1]) if self.rows else None
+
+    def _slice(self, start: int, end: int) -> slice:
+        low, high = np.searchsorted(self.day, (start, end))
+        return slice(int(low), int(high))
+
+    def by_campaign(self, start: int, end: int) -> dict[str, np.ndarray]:
+        """Sumas de [start, end) por índice denso de campaña (una posición por campaña)."""
+        window = self._slice(start, end)
+        campaign = self.campaign[window]
+        size = len(self.campaign_ids)
+        return {name: np.bincount(campaign, weights=self.metrics[name][window], minlength=size) for name in SUMS}
+
+    def by_day(self, start: int, end: int) -> dict[str, np.ndarray]:
+        """Sumas de [start, end) por día (posición 0 = start)."""
+        window = self._slice(start, end)
+        offset = self.day[window] - start
+        return {name: np.bincount(offset, weights=self.metrics[name][window], minlength=end - start) for name in SUMS}
+
+    def totals(self, start: int, end: int) -> dict[str, np.ndarray]:
+        window = self._slice(start, end)
+        return {name: np.asarray(self.metrics[name][window].sum(dtype=np.float64)) for name in SUMS}
+
+
+def read_columns(generation: int) -> CampaignColumns:
+    """Lee la tabla entera (en un hilo) y arma las columnas."""
+    with engine.connect() as conn:
+        # Un solo SELECT: la foto es consistente (snapshot de lectura de WAL)
+        rows = np.fromiter(conn.connection.cursor().execute(_SELECT), dtype=_ROW)
+        names = dict(conn.execute(select(Campaign.id, Campaign.name)).all())
+
+    campaign_ids, campaign = np.unique(rows["campaign_id"], return_inverse=True)
+    # Estable: dentro de un día quedan en el orden de la clave primaria (campaña)
+    order = np.argsort(rows["day"], kind="stable")
+    return CampaignColumns(
+        generation=generation,
+        loaded_at=time.monotonic(),
+        campaign_ids=campaign_ids,
+        names=[names.get(int(campaign_id), "") for campaign_id in campaign_ids],
+        day=rows["day"][order],
+        campaign=campaign.astype(np.int32)[order],
+        metrics={name: rows[name][order] for name in SUMS},
+    )
+
+
+class CampaignAnalytics:
+    """Columnas cacheadas de 'campaign_daily_stats' y los agregados que se calculan sobre ellas."""
+
+    def __init__(self, max_age_seconds: float):
+        self.max_age_seconds = max_age_seconds
+
+        self._columns: CampaignColumns | None = None
+        self._loads = SingleFlight()
+        self._refresh: asyncio.Task | None = None
+
+        self.loads = 0
+        self.last_load_ms: float | None = None
+        self.stale_reads = 0
+        self.queries = 0
+
+    def is_stale(self, columns: CampaignColumns) -> bool:
+        if columns.generation != campaign_ingestor.generation:
+            return True
+        return self.max_age_seconds > 0 and time.monotonic() - columns.loaded_at > self.max_age_seconds
+
+    async def _load(self) -> CampaignColumns:
+        # La generación se toma antes de leer: un lote que entra durante la carga la deja vieja
+        generation = campaign_ingestor.generation
+        started = time.perf_counter()
+        columns = await asyncio.to_thread(read_columns, generation)
+        elapsed = time.perf_counter() - started
+        load_seconds.observe(elapsed)
+        self.loads += 1
+        self.last_load_ms = round(elapsed * 1000, 1)
+        self._columns = columns
+        log.info("Columnas de analítica de campañas cargadas", extra={
+            "rows": columns.rows, "campaigns": len(columns.campaign_ids), "elapsed_ms": self.last_load_ms,
+        })
+        return columns
+
+    async def load(self) -> CampaignColumns:
+        """Carga (o se suma a la carga en curso) y devuelve las columnas nuevas."""
+        return await self._loads.do("columns", self._load)
+
+    def _refresh_in_background(self) -> None:
+        if self._refresh is None or self._refresh.done():
+            self._refresh = asyncio.ensure_future(self.load())
+            self._refresh.add_done_callback(self._refresh_done)
+
+    @staticmethod
+    def _refresh_done(task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            log.error("Fallo al recargar las columnas de analítica de campañas", exc_info=task.exception())
+
+    async def columns(self) -> tuple[CampaignColumns, bool]:
+        """Columnas actuales y si están viejas (en ese caso ya se está recargando)."""
+        self.queries += 1
+        columns = self._columns
+        if columns is None:
+            return await self.load(), False
+        if self.is_stale(columns):
+            self.stale_reads += 1
+            self._refresh_in_background()
+            return columns, True
+        return columns, False
+
+    @staticmethod
+    def window(columns: CampaignColumns, end: datetime.date | None, days: int) -> tuple[int, int]:
+        """[start, end) en días; sin 'end', los últimos `days` días con datos."""
+        if end is not None:
+            last = to_day(end)
+        else:
+            last_day = columns.last_day()
+            last = last_day + 1 if last_day is not None else to_day(datetime.date.today()) + 1
+        return last - days, last
+
+    async def summary(self, end: datetime.date | None, days: int) -> dict:
+        """Totales de la ventana contra el período anterior del mismo largo, y la serie diaria."""
+        columns, stale = await self.columns()
+        start, end_day = self.window(columns, end, days)
+        current = with_ratios(columns.totals(start, end_day))
+        previous = with_ratios(columns.totals(start - days, start))
+        daily = with_ratios(columns.by_day(start, end_day))
+        return {
+            **self._header(columns, stale, start, end_day),
+            "totals": {name: as_value(current[name]) for name in METRICS},
+            "previous": {name: as_value(previous[name]) for name in METRICS},
+            "change_pct": {name: as_value(change_pct(current[name], previous[name])) for name in METRICS},
+            "daily": [
+                {"date": from_day(start + offset), "metrics": {name: as_value(daily[name][offset]) for name in METRICS}}
+                for offset in range(days)
+            ],
+        }
+
+    async def campaigns(self, end: datetime.date | None, days: int, sort: str, limit: int) -> dict:
+        """Métricas por campaña con actividad en la ventana, las `limit` primeras según `sort` (desc)."""
+        columns, stale = await self.columns()
+        start, end_day = self.window(columns, end, days)
+        current = with_ratios(columns.by_campaign(start, end_day))
+        previous = with_ratios(columns.by_campaign(start - days, start))
+
+        active = np.flatnonzero((current["impressions"] > 0) | (current["cost"] > 0))
+        # Sin denominador (NaN) al final
+        key = np.nan_to_num(current[sort][active], nan=-np.inf)
+        top = active[np.argsort(-key, kind="stable")[:limit]]
+        changes = {name: change_pct(current[name][top], previous[name][top]) for name in METRICS}
+        return {
+            **self._header(columns, stale, start, end_day),
+            "active_campaigns": len(active),
+            "campaigns": [
+                {
+                    "campaign_id": int(columns.campaign_ids[index]),
+                    "name": columns.names[index],
+                    "metrics": {name: as_value(current[name][index]) for name in METRICS},
+                    "change_pct": {name: as_value(changes[name][position]) for name in METRICS},
+                }
+                for position, index in enumerate(top)
+            ],
+        }
+
+    async def movers(self, end: datetime.date | None, days: int, metric: str, limit: int,
+                     min_impressions: int) -> dict:
+        """
+        Campañas con mayor suba y mayor baja de `metric` contra el período
+        anterior. Solo cuentan las que tienen al menos `min_impressions` en
+        ambos períodos (sin eso las razones son ruido) y la métrica definida.
+        """
+        columns, stale = await self.columns()
+        start, end_day = self.window(columns, end, days)
+        current = with_ratios(columns.by_campaign(start, end_day))
+        previous = with_ratios(columns.by_campaign(start - days, start))
+
+        delta = current[metric] - previous[metric]
+        eligible = np.flatnonzero(
+            (current["impressions"] >= min_impressions) & (previous["impressions"] >= min_impressions)
+            & ~np.isnan(delta)
+        )
+        order = eligible[np.argsort(delta[eligible], kind="stable")]
+        up = order[::-1][:limit]
+        down = order[:limit]
+
+        def rows(indexes: np.ndarray, keep) -> list[dict]:
+            return [
+                {
+                    "campaign_id": int(columns.campaign_ids[index]),
+                    "name": columns.names[index],
+                    "current": as_value(current[metric][index]),
+                    "previous": as_value(previous[metric][index]),
+                    "delta": as_value(delta[index]),
+                    "change_pct": as_value(change_pct(current[metric][index], previous[metric][index])),
+                }
+                for index in indexes if keep(delta[index])
+            ]
+
+        return {
+            **self._header(columns, stale, start, end_day),
+            "metric": metric,
+            "eligible_campaigns": len(eligible),
+            "up": rows(up, lambda value: value > 0),
+            "down": rows(down, lambda value: value < 0),
+        }
+
+    @staticmethod
+    def _header(columns: CampaignColumns, stale: bool, start: int, end: int) -> dict:
+        days = end - start
+        return {
+            "start": from_day(start),
+            "end": from_day(end),
+            "previous_start": from_day(start - days),
+            "stale": stale,
+        }
+
+    @property
+    def rows(self) -> int:
+        return self._columns.rows if self._columns is not None else 0
+
+    def stats(self) -> dict:
+        columns = self._columns
+        return {
+            "loaded": columns is not None,
+            "generation": columns.generation if columns is not None else None,
+            "ingest_generation": campaign_ingestor.generation,
+            "stale": self.is_stale(columns) if columns is not None else None,
+            "rows": self.rows,
+            "campaigns": len(columns.campaign_ids) if columns is not None else 0,
+            "memory_bytes": columns.nbytes if columns is not None else 0,
+            "age_s": round(time.monotonic() - columns.loaded_at, 1) if columns is not None else None,
+            "loads": self.loads,
+            "last_load_ms": self.last_load_ms,
+            "queries": self.queries,
+            "stale_reads": self.stale_reads,
+        }
+
+
+campaign_analytics = CampaignAnalytics(max_age_seconds=CAMPAIGN_ANALYTICS_MAX_AGE_SECONDS)
+
+gauge("campaign_analytics_rows", "Filas de campaign_daily_stats en las columnas en memoria",
+      read=lambda: campaign_analytics.rows)
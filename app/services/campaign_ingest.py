@@ -0,0 +1,386 @@
+# app/services/campaign_ingest.py
+"""
+Ingesta masiva de métricas diarias de campañas (exports CSV/NDJSON de
+Google/Meta Ads) en 'campaign_daily_stats': impresiones, clics, costo,
+conversiones y (si el export lo trae) valor de conversión por (campaña, día).
+
+  - Parseo en streaming y sin bucle de Python por fila: csv.reader o
+    json.loads + itemgetter encadenados con map(), consumidos por
+    executemany en trozos (islice). La memoria no depende del tamaño
+    del archivo.
+  - Por lote de CAMPAIGN_INGEST_BATCH_ROWS filas, una transacción:
+      1. executemany a una tabla TEMP de staging con afinidad INTEGER/REAL
+         (SQLite convierte '123' en 123 y deja como texto lo que no es
+         número);
+      2. validación en SQL: métricas numéricas y no negativas (vacío = 0),
+         fecha AAAA-MM-DD, campaña no vacía;
+      3. INSERT OR IGNORE de las campañas nuevas (por nombre);
+      4. INSERT ... SELECT ... ON CONFLICT (campaign_id, date) DO UPDATE:
+         sin duplicados por (campaña, día); gana la última aparición.
+    Una fila ilegible (columnas de menos, JSON inválido) deja un marcador
+    inválido en staging: se informa con su número y el resto sigue.
+  - Cada lote corre en un hilo con el lock de escritura del proceso
+    tomado: el chat espera como mucho un lote. El endpoint primero vuelca
+    el cuerpo a un archivo temporal: nunca se retiene el lock esperando
+    a un cliente lento.
+
+Uso:
+    python -m app.services.campaign_ingest stats.csv
+    python -m app.services.campaign_ingest stats.ndjson.gz
+"""
+
+import argparse
+import asyncio
+import csv
+import gzip
+import io
+import json
+import logging
+import os
+import re
+import sqlite3
+import tempfile
+import time
+import zlib
+from dataclasses import dataclass, field
+from itertools import chain, islice
+from operator import itemgetter
+from typing import AsyncIterator, Iterable, Iterator
+
+from sqlalchemy import inspect
+
+from app.database import async_engine, engine, write_lock
+from app.models.campaigns import Campaign, CampaignDailyStat
+from app.services.telemetry import counter
+
+log = logging.getLogger(__name__)
+
+# --- Configuración (variables de entorno) ---
+# Filas por transacción (y por tramo con el lock de escritura tomado)
+CAMPAIGN_INGEST_BATCH_ROWS = int(os.getenv("CAMPAIGN_INGEST_BATCH_ROWS", "100000"))
+# Filas rechazadas que se detallan en el informe (el total se cuenta siempre)
+CAMPAIGN_INGEST_MAX_ERRORS = int(os.getenv("CAMPAIGN_INGEST_MAX_ERRORS", "100"))
+# Cuerpo del endpoint en memoria hasta este tamaño; por encima, a disco
+CAMPAIGN_INGEST_SPOOL_BYTES = int(os.getenv("CAMPAIGN_INGEST_SPOOL_BYTES", str(8 * 1024 * 1024)))
+
+FORMATS = ("csv", "ndjson")
+FIELDS = ("campaign", "date", "impressions", "clicks", "cost", "conversions", "conversion_value")
+# Campos que un export puede no traer: sin la columna, la recarga no pisa el valor guardado
+OPTIONAL_FIELDS = ("conversion_value",)
+# Encabezados CSV aceptados (en minúsculas, sin sufijo entre paréntesis como "(USD)")
+CSV_ALIASES = {
+    "campaign": ("campaign", "campaign name", "campaign_name", "campaña"),
+    "date": ("date", "day", "reporting starts", "fecha", "día"),
+    "impressions": ("impressions", "impr.", "impresiones"),
+    "clicks": ("clicks", "link clicks", "clics"),
+    "cost": ("cost", "spend", "amount spent", "costo", "importe gastado"),
+    "conversions": ("conversions", "results", "conversiones", "resultados"),
+    "conversion_value": ("conversion value", "conv. value", "total conv. value", "purchases conversion value",
+                         "valor de conversión", "valor de las conversiones"),
+}
+
+rows_total = counter("campaign_ingest_rows_total", "Filas de métricas de campañas ingeridas, por resultado",
+                     label="outcome")
+
+# Errores de una fila que dejan el iterador en la fila siguiente
+_ROW_ERRORS = (IndexError, KeyError, TypeError, ValueError, csv.Error, sqlite3.ProgrammingError)
+
+_CREATE_STAGING = """
+CREATE TEMP TABLE IF NOT EXISTS campaign_stats_staging (
+    campaign TEXT, date TEXT, impressions INTEGER, clicks INTEGER, cost REAL, conversions REAL,
+    conversion_value REAL
+)
+"""
+# Filas en staging (rowid consecutivo desde 1 en cada lote: max es O(log n), count(*) recorre la tabla)
+_STAGED = "SELECT coalesce(max(rowid), 0) FROM campaign_stats_staging"
+
+
+def _metric(column: str) -> str:
+    # Celda vacía = 0 (los exports dejan en blanco los días sin conversiones)
+    return f"coalesce(nullif(s.{column}, ''), 0)"
+
+
+_VALID = f"""coalesce(
+    s.campaign IS NOT NULL AND trim(s.campaign) != ''
+    AND s.date IS NOT NULL AND date(s.date) IS s.date
+    AND typeof({_metric('impressions')}) = 'integer' AND {_metric('impressions')} >= 0
+    AND typeof({_metric('clicks')}) = 'integer' AND {_metric('clicks')} >= 0
+    AND typeof({_metric('cost')}) IN ('integer', 'real') AND {_metric('cost')} >= 0
+    AND typeof({_metric('conversions')}) IN ('integer', 'real') AND {_metric('conversions')} >= 0
+    AND typeof({_metric('conversion_value')}) IN ('integer', 'real') AND {_metric('conversion_value')} >= 0,
+    0)"""
+_CREATE_CAMPAIGNS = f"""
+INSERT OR IGNORE INTO campaigns (name)
+SELECT DISTINCT trim(s.campaign) FROM campaign_stats_staging AS s WHERE {_VALID}
+"""
+
+
+def _stage_sql(columns: tuple[str, ...]) -> str:
+    return f"INSERT INTO campaign_stats_staging ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+
+
+def _upsert_sql(columns: tuple[str, ...]) -> str:
+    metrics = FIELDS[2:]
+    updated = [name for name in metrics if name in columns]
+    return f"""
+INSERT INTO campaign_daily_stats (campaign_id, date, {', '.join(metrics)})
+SELECT c.id, s.date, {', '.join(_metric(name) for name in metrics)}
+FROM campaign_stats_staging AS s JOIN campaigns AS c ON c.name = trim(s.campaign)
+WHERE {_VALID}
+ORDER BY s.rowid
+ON CONFLICT (campaign_id, date) DO UPDATE SET
+    {', '.join(f'{name} = excluded.{name}' for name in updated)}
+"""
+
+
+_REJECTED = f"""
+SELECT s.rowid, CASE
+    WHEN s.campaign IS NULL THEN 'fila incompleta o ilegible'
+    WHEN trim(s.campaign) = '' THEN 'campaña vacía'
+    WHEN s.date IS NULL OR date(s.date) IS NOT s.date THEN 'fecha inválida (se espera AAAA-MM-DD)'
+    ELSE 'métrica no numérica o negativa'
+END
+FROM campaign_stats_staging AS s WHERE NOT {_VALID} ORDER BY s.rowid LIMIT ?
+"""
+
+
+class IngestError(ValueError):
+    """El archivo no se puede ingerir (formato desconocido, faltan columnas)."""
+
+
+@dataclass
+class IngestReport:
+    rows: int = 0
+    accepted: int = 0
+    rejected: int = 0
+    campaigns_created: int = 0
+    batches: int = 0
+    elapsed_ms: float = 0.0
+    # Primeras CAMPAIGN_INGEST_MAX_ERRORS filas rechazadas: {"row": n, "reason": ...}
+    errors: list[dict] = field(default_factory=list)
+
+
+def _csv_header(header: list[str]) -> dict[str, int]:
+    """Posición en el encabezado de cada campo de FIELDS presente (los opcionales pueden faltar)."""
+    names = [re.sub(r"\s*\(.*\)$", "", name.strip().lower()) for name in header]
+    positions = {}
+    for field_name in FIELDS:
+        found = next((names.index(alias) for alias in CSV_ALIASES[field_name] if alias in names), None)
+        if found is not None:
+            positions[field_name] = found
+        elif field_name not in OPTIONAL_FIELDS:
+            raise IngestError(f"El CSV no tiene la columna '{field_name}' (encabezado: {header})")
+    return positions
+
+
+def csv_rows(lines: Iterable[str]) -> tuple[tuple[str, ...], Iterator[tuple]]:
+    """Campos presentes y sus tuplas (en el orden de FIELDS); el encabezado elige las columnas."""
+    reader = csv.reader(lines)
+    header = next(reader, None)
+    if header is None:
+        return FIELDS, iter(())
+    positions = _csv_header(header)
+    return tuple(positions), map(itemgetter(*positions.values()), reader)
+
+
+def ndjson_rows(lines: Iterable[str]) -> tuple[tuple[str, ...], Iterator[tuple]]:
+    """Como csv_rows; los campos opcionales se toman si la primera línea los trae."""
+    lines = iter(lines)
+    first = next(lines, None)
+    if first is None:
+        return FIELDS, iter(())
+    try:
+        sample = json.loads(first)
+    except ValueError:
+        sample = {}
+    present = sample.keys() if isinstance(sample, dict) else ()
+    columns = tuple(name for name in FIELDS if name not in OPTIONAL_FIELDS or name in present)
+    return columns, map(itemgetter(*columns), map(json.loads, chain((first,), lines)))
+
+
+ROW_PARSERS = {"csv": csv_rows, "ndjson": ndjson_rows}
+
+
+def open_lines(path: str) -> io.TextIOBase:
+    """Líneas de un archivo (comprimido con gzip si termina en .gz), sin BOM y sin fallar por bytes inválidos."""
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8-sig", newline="", errors="replace")
+    return open(path, encoding="utf-8-sig", newline="", errors="replace")
+
+
+def format_for(path: str) -> str:
+    name = path.removesuffix(".gz").lower()
+    return "ndjson" if name.endswith((".ndjson", ".jsonl", ".json")) else "csv"
+
+
+class CampaignIngestor:
+    """Carga exports de métricas por lotes (staging + upsert) bajo el lock de escritura."""
+
+    def __init__(self, batch_rows: int, max_errors: int, spool_bytes: int):
+        self.batch_rows = batch_rows
+        self.max_errors = max_errors
+        self.spool_bytes = spool_bytes
+
+        self.running = 0
+        # Sube con cada lote confirmado
+        self.generation = 0
+        self.runs = 0
+        self.rows = 0
+        self.accepted = 0
+        self.rejected = 0
+        self.campaigns_created = 0
+        self.last_rows_per_s: float | None = None
+
+    def _stage(self, cursor, columns: tuple[str, ...], rows: Iterator[tuple]) -> int:
+        """Pasa hasta batch_rows filas a staging; devuelve cuántas (con los marcadores de filas ilegibles)."""
+        stage = _stage_sql(columns)
+        staged = 0
+        while staged < self.batch_rows:
+            try:
+                cursor.executemany(stage, islice(rows, self.batch_rows - staged))
+                staged = cursor.execute(_STAGED).fetchone()[0]
+                break
+            except _ROW_ERRORS as e:
+                if isinstance(e, OSError):
+                    # Falla al leer la fuente (p. ej. io.UnsupportedOperation), no una fila: se repetiría
+                    raise
+                # La fila que falló ya se consumió: marcador en su lugar (conserva la numeración)
+                cursor.execute(stage, (None,) * len(columns))
+                staged = cursor.execute(_STAGED).fetchone()[0]
+        return staged
+
+    def _load_batch(self, columns: tuple[str, ...], rows: Iterator[tuple], first_row: int, report: IngestReport) -> int:
+        """Un lote en una transacción (en un hilo); devuelve las filas leídas."""
+        with engine.begin() as conn:
+            cursor = conn.connection.cursor()
+            cursor.execute(_CREATE_STAGING)
+            staged = self._stage(cursor, columns, rows)
+            if staged:
+                cursor.execute(_CREATE_CAMPAIGNS)
+                report.campaigns_created += cursor.rowcount
+                cursor.execute(_upsert_sql(columns))
+                accepted = cursor.rowcount
+                report.rows += staged
+                report.accepted += accepted
+                report.rejected += staged - accepted
+                if staged > accepted and len(report.errors) < self.max_errors:
+                    for rowid, reason in cursor.execute(_REJECTED, (self.max_errors - len(report.errors),)):
+                        report.errors.append({"row": first_row + rowid - 1, "reason": reason})
+            cursor.execute("DELETE FROM campaign_stats_staging")
+        return staged
+
+    async def ingest(self, lines: Iterable[str], fmt: str) -> IngestReport:
+        """Ingiere las líneas de un export; IngestError si el formato o el encabezado no sirven."""
+        if fmt not in FORMATS:
+            raise IngestError(f"Formato de ingesta inválido: {fmt!r}")
+        started = time.perf_counter()
+        report = IngestReport()
+        self.running += 1
+        try:
+            # El encabezado se lee del archivo: fuera del loop de eventos
+            columns, rows = await asyncio.to_thread(ROW_PARSERS[fmt], lines)
+            first_row = 1
+            while True:
+                async with write_lock():
+                    staged = await asyncio.to_thread(self._load_batch, columns, rows, first_row, report)
+                if not staged:
+                    break
+                report.batches += 1
+                # Lote confirmado: las cachés derivadas (app/services/campaign_analytics.py) quedan viejas
+                self.generation += 1
+                first_row += staged
+                if staged < self.batch_rows:
+                    break
+        finally:
+            self.running -= 1
+            report.elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+            self._record(report)
+        return report
+
+    async def ingest_stream(self, chunks: AsyncIterator[bytes], fmt: str, gzipped: bool = False) -> IngestReport:
+        """Cuerpo HTTP: se vuelca entero a un temporal y recién entonces se ingiere."""
+        with tempfile.SpooledTemporaryFile(max_size=self.spool_bytes) as spool:
+            async for chunk in chunks:
+                spool.write(chunk)
+            spool.seek(0)
+            raw = gzip.GzipFile(fileobj=spool, mode="rb") if gzipped else spool
+            lines = io.TextIOWrapper(raw, encoding="utf-8-sig", newline="", errors="replace")
+            try:
+                return await self.ingest(lines, fmt)
+            except (OSError, EOFError, zlib.error) as e:
+                # gzip truncado o inválido (los lotes anteriores quedan cargados)
+                raise IngestError(f"Cuerpo comprimido inválido: {e}") from e
+
+    def _record(self, report: IngestReport) -> None:
+        self.runs += 1
+        self.rows += report.rows
+        self.accepted += report.accepted
+        self.rejected += report.rejected
+        self.campaigns_created += report.campaigns_created
+        rows_total.inc("accepted", report.accepted)
+        rows_total.inc("rejected", report.rejected)
+        if report.elapsed_ms:
+            self.last_rows_per_s = round(report.rows / (report.elapsed_ms / 1000))
+        log.info("Ingesta de métricas de campañas", extra={
+            "rows": report.rows, "accepted": report.accepted, "rejected": report.rejected,
+            "elapsed_ms": report.elapsed_ms,
+        })
+
+    def stats(self) -> dict:
+        return {
+            "batch_rows": self.batch_rows,
+            "running": self.running,
+            "runs": self.runs,
+            "rows": self.rows,
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "campaigns_created": self.campaigns_created,
+            "last_rows_per_s": self.last_rows_per_s,
+        }
+
+
+def ensure_columns() -> None:
+    """Agrega conversion_value a 'campaign_daily_stats' creadas antes de existir (v7)."""
+    existing = {column["name"] for column in inspect(engine).get_columns(CampaignDailyStat.__tablename__)}
+    if "conversion_value" not in existing:
+        with engine.begin() as conn:
+            conn.exec_driver_sql(
+                f"ALTER TABLE {CampaignDailyStat.__tablename__} ADD COLUMN conversion_value FLOAT NOT NULL DEFAULT 0"
+            )
+
+
+def ensure_index() -> None:
+    """Índice único por nombre en tablas 'campaigns' creadas antes que el modelo (sin él no hay dedupe de campañas)."""
+    index = next(i for i in Campaign.__table__.indexes if i.name == "ux_campaigns_name")
+    index.create(engine, checkfirst=True)
+
+
+campaign_ingestor = CampaignIngestor(
+    batch_rows=CAMPAIGN_INGEST_BATCH_ROWS,
+    max_errors=CAMPAIGN_INGEST_MAX_ERRORS,
+    spool_bytes=CAMPAIGN_INGEST_SPOOL_BYTES,
+)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=FORMATS, help="por defecto, según la extensión")
+    args = parser.parse_args()
+
+    async def run() -> IngestReport:
+        try:
+            with open_lines(args.path) as lines:
+                return await campaign_ingestor.ingest(lines, args.format or format_for(args.path))
+        finally:
+            await async_engine.dispose()
+
+    report = asyncio.run(run())
+    print(f"{report.rows} filas en {report.elapsed_ms / 1000:.1f}s: {report.accepted} cargadas, "
+          f"{report.rejected} rechazadas, {report.campaigns_created} campañas nuevas.")
+    for error in report.errors:
+        print(f"  fila {error['row']}: {error['reason']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+# app/services/conversation_memory.py
+
+import os
+from collections import OrderedDict, deque
+from typing import NamedTuple
+
+from sqlalchemy import select
+
+from app.database import async_engine, engine
+from app.models.interactions import ChatInteraction
+from app.models.users import User
+from app.services.archive import stale_index
+from app.services.single_flight import SingleFlight
+from app.services.user_cache import session_users
+
+# --- Configuración (variables de entorno) ---
+# Últimos N turnos (pregunta + respuesta) recordados por sesión
+CONVERSATION_MAX_TURNS = int(os.getenv("CONVERSATION_MAX_TURNS", "6"))
+# Presupuesto de tokens del historial enviado al LLM (estimado: ~4 caracteres por token)
+CONVERSATION_TOKEN_BUDGET = int(os.getenv("CONVERSATION_TOKEN_BUDGET", "1200"))
+# Sesiones residentes en memoria; las inactivas se desalojan (LRU)
+CONVERSATION_MAX_SESSIONS = int(os.getenv("CONVERSATION_MAX_SESSIONS", "10000"))
+
+
+class Turn(NamedTuple):
+    user_message: str
+    bot_reply: str
+    context: str | None
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // 4 + 1
+
+
+class ConversationMemory:
+    """
+    Ring buffer (deque acotado) de los últimos turnos de cada sesión, en un
+    OrderedDict con desalojo LRU. Una sesión fría se hidrata UNA vez desde
+    la base (índice user_id, created_at); a partir de ahí el prompt se arma
+    solo desde memoria y cada respuesta nueva se agrega con record().
+    """
+
+    def __init__(self, max_turns: int, token_budget: int, max_sessions: int):
+        self.max_turns = max_turns
+        self.token_budget = token_budget
+        self.max_sessions = max_sessions
+
+        self._sessions: OrderedDict[str, deque[Turn]] = OrderedDict()
+        # Hidrataciones concurrentes de la misma sesión comparten la lectura
+        self._hydration = SingleFlight()
+
+        self.hits = 0
+        self.hydrations = 0
+        self.evictions = 0
+
+    async def history(self, session_id: str) -> tuple[Turn, ...]:
+        """Turnos recordados de la sesión (del más antiguo al más reciente)."""
+        turns = self._sessions.get(session_id)
+        if turns is not None:
+            self._sessions.move_to_end(session_id)
+            self.hits += 1
+            return tuple(turns)
+
+        turns = await self._hydration.do(session_id, lambda: self._hydrate(session_id))
+        return tuple(turns)
+
+    async def _hydrate(self, session_id: str) -> deque[Turn]:
+        self.hydrations += 1
+        rows = await self._load_recent_rows(session_id)
+
+        turns: deque[Turn] = deque(maxlen=self.max_turns)
+        pending_user = None
+        for message_type, message_text, context in reversed(rows):
+            if message_type == "USER":
+                pending_user = message_text
+            elif message_type == "BOT" and pending_user is not None:
+                turns.append(Turn(pending_user, message_text, context))
+                pending_user = None
+
+        self._store(session_id, turns)
+        return turns
+
+    async def _load_recent_rows(self, session_id: str) -> list:
+        """Últimas 2*N filas de la sesión, de la más reciente a la más antigua."""
+        query = select(ChatInteraction.message_type, ChatInteraction.message_text, ChatInteraction.context)
+        user_id = session_users.get(session_id)
+        if user_id is not None:
+            query = query.where(ChatInteraction.user_id == user_id)
+        else:
+            query = query.join(User, User.id == ChatInteraction.user_id).where(User.session_id == session_id)
+        query = query.order_by(ChatInteraction.created_at.desc(), ChatInteraction.id.desc()).limit(2 * self.max_turns)
+
+        async with async_engine.connect() as conn:
+            return (await conn.execute(query)).all()
+
+    def _store(self, session_id: str, turns: deque[Turn]) -> None:
+        self._sessions[session_id] = turns
+        self._sessions.move_to_end(session_id)
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+            self.evictions += 1
+
+    def record(self, session_id: str, user_message: str, bot_reply: str, context: str | None) -> None:
+        """
+        Agrega el turno ya persistido. Si la sesión no está residente no se
+        crea: la próxima hidratación lo leerá de la base junto con el resto.
+        """
+        turns = self._sessions.get(session_id)
+        if turns is not None:
+            turns.append(Turn(user_message, bot_reply, context))
+
+    def within_budget(self, turns: tuple[Turn, ...]) -> tuple[Turn, ...]:
+        """Los turnos más recientes que caben en el presupuesto de tokens."""
+        kept = []
+        used = 0
+        for turn in reversed(turns):
+            used += estimate_tokens(turn.user_message) + estimate_tokens(turn.bot_reply)
+            if used > self.token_budget:
+                break
+            kept.append(turn)
+        return tuple(reversed(kept))
+
+    def clear(self) -> None:
+        self._sessions.clear()
+
+    def stats(self) -> dict:
+        return {
+            "sessions": len(self._sessions),
+            "max_sessions": self.max_sessions,
+            "max_turns": self.max_turns,
+            "token_budget": self.token_budget,
+            "hits": self.hits,
+            "hydrations": self.hydrations,
+            "evictions": self.evictions,
+        }
+
+
+def ensure_index() -> None:
+    """
+    Crea el índice del historial en bases existentes (reemplaza al de
+    (user_id, created_at)); si es el de v3, que incluía message_text, lo rehace.
+    """
+    index = next(i for i in ChatInteraction.__table__.indexes if i.name == "ix_chat_interactions_user_history")
+    with engine.begin() as conn:
+        if stale_index(conn, index):
+            conn.exec_driver_sql(f"DROP INDEX {index.name}")
+        index.create(conn, checkfirst=True)
+        conn.exec_driver_sql("DROP INDEX IF EXISTS ix_chat_interactions_user_id_created_at")
+
+
+conversation_memory = ConversationMemory(
+    max_turns=CONVERSATION_MAX_TURNS,
+    token_budget=CONVERSATION_TOKEN_BUDGET,
+    max_sessions=CONVERSATION_MAX_SESSIONS,
+)
@@ -0,0 +1,203 @@
+# app/services/export.py
+"""
+Exportación masiva de 'chat_interactions' (con users.session_id) en NDJSON
+o CSV, en streaming y con memoria constante:
+
+  - paginación keyset por id (id > último, ORDER BY id LIMIT n): cada
+    página es una búsqueda por rango de la PK, sin OFFSET;
+  - con rango de fechas, los límites [min(id), max(id)] salen del índice
+    cubriente (created_at, context) y el filtro de context también; si el
+    rango llega a meses archivados se recorren sus particiones;
+  - solo con context (sin fechas), el índice de context, que en SQLite es
+    (context, rowid), da los límites y cada página: no se recorren las
+    filas de los demás contextos;
+  - message_type (USER/BOT, mitad y mitad) se filtra sobre la página: un
+    índice no ahorraría lecturas;
+  - el cuerpo se comprime con gzip a medida que se genera (opcional).
+    Serializar y comprimir cada página corre en un hilo para no frenar el
+    event loop.
+
+Uso:
+    python -m app.services.export --format csv --start 2025-01-01 --output interacciones.csv.gz
+    python -m app.services.export --context MARKETING_OPTIMIZATION --message-type BOT > bot.ndjson
+"""
+
+import argparse
+import asyncio
+import csv
+import datetime
+import io
+import json
+import os
+import sys
+import zlib
+from contextlib import aclosing
+from dataclasses import dataclass
+from typing import AsyncIterator
+
+from sqlalchemy import Table, func, select
+
+from app.database import async_engine, engine
+from app.models.interactions import ChatInteraction
+from app.models.users import User
+from app.services.archive import interaction_tables
+from app.services.telemetry import counter
+
+# --- Configuración (variables de entorno) ---
+EXPORT_PAGE_ROWS = int(os.getenv("EXPORT_PAGE_ROWS", "2000"))
+EXPORT_GZIP_LEVEL = int(os.getenv("EXPORT_GZIP_LEVEL", "6"))
+
+FORMATS = ("ndjson", "csv")
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+FIELDS = (
+    "id", "session_id", "user_id", "context", "message_type", "message_text",
+    "created_at", "prompt_tokens", "completion_tokens",
+)
+
+exported_rows_total = counter("export_rows_total", "Filas exportadas por /export/interactions y la CLI", label="format")
+
+
+@dataclass(frozen=True)
+class ExportFilters:
+    start: datetime.datetime | None = None
+    end: datetime.datetime | None = None
+    context: str | None = None
+    message_type: str | None = None
+
+
+def _range_conditions(table: Table, filters: ExportFilters) -> list:
+    conditions = []
+    if filters.start is not None:
+        conditions.append(table.c.created_at >= filters.start)
+    if filters.end is not None:
+        conditions.append(table.c.created_at < filters.end)
+    if filters.context is not None:
+        conditions.append(table.c.context == filters.context)
+    return conditions
+
+
+async def _id_bounds(conn, table: Table, filters: ExportFilters) -> tuple[int, int] | None:
+    """
+    [min(id), max(id)] a recorrer: por el índice (created_at, context) si hay
+    fechas, por el de context si solo hay context, por la PK si no hay filtros.
+    """
+    query = select(func.min(table.c.id), func.max(table.c.id))
+    if filters.start is not None or filters.end is not None or filters.context is not None:
+        query = query.where(*_range_conditions(table, filters))
+    low, high = (await conn.execute(query)).one()
+    return None if low is None else (low, high)
+
+
+async def iter_pages(filters: ExportFilters, page_rows: int = EXPORT_PAGE_ROWS) -> AsyncIterator[list]:
+    """Páginas de filas (en el orden de FIELDS), tabla por tabla y por id creciente."""
+    async with async_engine.connect() as conn:
+        # aclosing: si el cliente corta a mitad de una partición, el DETACH corre
+        # acá, con la conexión todavía abierta (no cuando el GC finalice el generador)
+        async with aclosing(interaction_tables(conn, filters.start, filters.end)) as tables:
+            async for table in tables:
+                bounds = await _id_bounds(conn, table, filters)
+                if bounds is None:
+                    continue
+                last_id, max_id = bounds[0] - 1, bounds[1]
+                conditions = _range_conditions(table, filters)
+                if filters.message_type is not None:
+                    conditions.append(table.c.message_type == filters.message_type)
+
+                while True:
+                    rows = (await conn.execute(
+                        select(
+                            table.c.id, User.session_id, table.c.user_id, table.c.context, table.c.message_type,
+                            table.c.message_text, table.c.created_at, table.c.prompt_tokens, table.c.completion_tokens,
+                        )
+                        .select_from(table.outerjoin(User.__table__, User.id == table.c.user_id))
+                        .where(table.c.id > last_id, table.c.id <= max_id, *conditions)
+                        .order_by(table.c.id)
+                        .limit(page_rows)
+                    )).all()
+                    if not rows:
+                        break
+                    yield rows
+                    last_id = rows[-1][0]
+
+
+def _encode_ndjson(rows: list) -> str:
+    return "".join(
+        json.dumps(dict(zip(FIELDS, row)), ensure_ascii=False, default=datetime.datetime.isoformat) + "\n"
+        for row in rows
+    )
+
+
+def _encode_csv(rows: list) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(
+        [value.isoformat() if isinstance(value, datetime.datetime) else value for value in row] for row in rows
+    )
+    return buffer.getvalue()
+
+
+def _csv_header() -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(FIELDS)
+    return buffer.getvalue()
+
+
+async def export_stream(filters: ExportFilters, fmt: str = "ndjson", gzip: bool = False,
+                        page_rows: int = EXPORT_PAGE_ROWS) -> AsyncIterator[bytes]:
+    """Genera el cuerpo de la exportación en trozos de bytes (una página por trozo)."""
+    if fmt not in FORMATS:
+        raise ValueError(f"Formato de exportación inválido: {fmt!r}")
+    encode = _encode_ndjson if fmt == "ndjson" else _encode_csv
+    # wbits 16+MAX_WBITS: cabecera y trailer gzip
+    compressor = zlib.compressobj(EXPORT_GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS) if gzip else None
+
+    def render(text: str) -> bytes:
+        data = text.encode("utf-8")
+        return compressor.compress(data) if compressor is not None else data
+
+    if fmt == "csv":
+        yield render(_csv_header())
+    async with aclosing(iter_pages(filters, page_rows)) as pages:
+        async for rows in pages:
+            chunk = await asyncio.to_thread(lambda: render(encode(rows)))
+            exported_rows_total.inc(fmt, len(rows))
+            if chunk:
+                yield chunk
+    if compressor is not None:
+        yield compressor.flush()
+
+
+def ensure_index() -> None:
+    """Índice de context en tablas 'chat_interactions' creadas antes que él (exportación solo por context)."""
+    index = next(i for i in ChatInteraction.__table__.indexes if i.name == "ix_chat_interactions_context")
+    index.create(engine, checkfirst=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--format", choices=FORMATS, default="ndjson")
+    parser.add_argument("--start", type=datetime.datetime.fromisoformat, default=None, help="UTC, inclusive")
+    parser.add_argument("--end", type=datetime.datetime.fromisoformat, default=None, help="UTC, exclusivo")
+    parser.add_argument("--context", default=None)
+    parser.add_argument("--message-type", choices=["USER", "BOT"], default=None)
+    parser.add_argument("--output", default=None, help="archivo de salida (por defecto, stdout)")
+    parser.add_argument("--gzip", action="store_true", help="comprimir (implícito si --output termina en .gz)")
+    args = parser.parse_args()
+
+    filters = ExportFilters(args.start, args.end, args.context, args.message_type)
+    gzip = args.gzip or (args.output or "").endswith(".gz")
+
+    async def run() -> None:
+        output = open(args.output, "wb") if args.output else sys.stdout.buffer
+        try:
+            async for chunk in export_stream(filters, args.format, gzip):
+                output.write(chunk)
+        finally:
+            if args.output:
+                output.close()
+            await async_engine.dispose()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+# app/services/history.py
+"""
+Historial paginado de una sesión, sin cargar User.interactions por el ORM:
+paginación keyset sobre (user_id, created_at, id) con el índice compuesto
+ix_chat_interactions_user_history. Cada página es un recorrido contiguo del
+índice (que trae también message_type y context); message_text no está en
+el índice y se lee por rowid solo para las filas de la página.
+
+  - "últimos N": created_at/id descendentes desde el final (o antes de un
+    cursor), devueltos en orden cronológico;
+  - "desde cursor": los N siguientes a un cursor, ascendentes.
+
+El cursor es opaco (base64 de "created_at|id"). Si la tabla viva no llena
+la página, se sigue por las particiones archivadas (ver
+app/services/archive.py) en el orden de la página: de la más reciente a la
+más antigua para "últimos N", al revés para "desde cursor". Cada partición
+se adjunta solo si hace falta y el recorrido para en cuanto la página está
+completa.
+"""
+
+import base64
+import binascii
+import datetime
+from typing import NamedTuple
+
+from sqlalchemy import select, tuple_
+
+from app.database import async_engine
+from app.models.users import User
+from app.services.archive import LIVE_TABLE, archived_partitions, attach
+from app.services.user_cache import session_users
+
+# Columnas devueltas; todas menos message_text salen del índice
+FIELDS = ("id", "message_type", "message_text", "context", "created_at")
+INDEX_FIELDS = ("id", "message_type", "context", "created_at")
+
+
+class Cursor(NamedTuple):
+    created_at: datetime.datetime
+    id: int
+
+
+class InvalidCursor(ValueError):
+    """El cursor recibido no es uno emitido por esta API."""
+
+
+def encode_cursor(cursor: Cursor) -> str:
+    raw = f"{cursor.created_at.isoformat()}|{cursor.id}".encode("ascii")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: str) -> Cursor:
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)).decode("ascii")
+        created_at, _, row_id = raw.partition("|")
+        return Cursor(datetime.datetime.fromisoformat(created_at), int(row_id))
+    except (binascii.Error, UnicodeDecodeError, ValueError) as e:
+        raise InvalidCursor(f"Cursor inválido: {token!r}") from e
+
+
+class HistoryPage(NamedTuple):
+    rows: list[dict]            # orden cronológico
+    has_more: bool              # quedan filas en la dirección pedida
+    before: Cursor | None       # primera fila (para pedir la página anterior)
+    after: Cursor | None        # última fila (para pedir lo nuevo)
+
+
+async def _user_id(conn, session_id: str) -> int | None:
+    user_id = session_users.get(session_id)
+    if user_id is None:
+        user_id = (await conn.execute(select(User.id).where(User.session_id == session_id))).scalar()
+    return user_id
+
+
+async def _read_table(conn, table, user_id: int, limit: int, before: Cursor | None,
+                      after: Cursor | None) -> list[dict]:
+    """Hasta `limit` filas de `table` en el orden de la página, con message_text."""
+    key = tuple_(table.c.created_at, table.c.id)
+    query = select(*(table.c[field] for field in INDEX_FIELDS)).where(table.c.user_id == user_id)
+    if after is not None:
+        query = query.where(key > tuple_(after.created_at, after.id)).order_by(table.c.created_at, table.c.id)
+    else:
+        if before is not None:
+            query = query.where(key < tuple_(before.created_at, before.id))
+        query = query.order_by(table.c.created_at.desc(), table.c.id.desc())
+    rows = [row._asdict() for row in (await conn.execute(query.limit(limit))).all()]
+    if rows:
+        texts = dict((await conn.execute(
+            select(table.c.id, table.c.message_text).where(table.c.id.in_([row["id"] for row in rows]))
+        )).all())
+        for row in rows:
+            row["message_text"] = texts[row["id"]]
+    return rows
+
+
+async def read_page(session_id: str, limit: int, before: Cursor | None = None,
+                    after: Cursor | None = None) -> HistoryPage | None:
+    """
+    Sin cursores: los últimos `limit` mensajes. Con `before`: los `limit`
+    anteriores al cursor. Con `after`: los `limit` siguientes al cursor.
+    Devuelve None si la sesión no existe.
+    """
+    ascending = after is not None
+    async with async_engine.connect() as conn:
+        user_id = await _user_id(conn, session_id)
+        if user_id is None:
+            return None
+
+        # Una fila de más para saber si hay otra página
+        rows = []
+        if not ascending:
+            rows += await _read_table(conn, LIVE_TABLE, user_id, limit + 1, before, after)
+        if len(rows) <= limit:
+            # Cada partición guarda un mes entero y todas son anteriores a la tabla viva:
+            # recorridas en el orden de la página, sus filas se concatenan sin reordenar
+            partitions = await archived_partitions(conn, after.created_at if ascending else None,
+                                                   before.created_at if before else None)
+            for month, path in partitions if ascending else reversed(partitions):
+                async with attach(conn, month, path) as table:
+                    rows += await _read_table(conn, table, user_id, limit + 1 - len(rows), before, after)
+                if len(rows) > limit:
+                    break
+        if ascending and len(rows) <= limit:
+            rows += await _read_table(conn, LIVE_TABLE, user_id, limit + 1 - len(rows), before, after)
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if not ascending:
+        rows.reverse()
+
+    return HistoryPage(
+        rows=[{field: row[field] for field in FIELDS} for row in rows],
+        has_more=has_more,
+        before=Cursor(rows[0]["created_at"], rows[0]["id"]) if rows else before,
+        after=Cursor(rows[-1]["created_at"], rows[-1]["id"]) if rows else after,
+    )
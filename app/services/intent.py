@@ -0,0 +1,139 @@
+# app/services/intent.py
+
+import json
+import os
+import re
+import unicodedata
+from typing import NamedTuple
+
+# --- Configuración (variables de entorno) ---
+INTENT_KEYWORDS_PATH = os.getenv(
+    "INTENT_KEYWORDS_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "intent_keywords.json"),
+)
+# Confianza mínima para responder localmente sin llamar al LLM
+INTENT_SHORT_CIRCUIT_CONFIDENCE = float(os.getenv("INTENT_SHORT_CIRCUIT_CONFIDENCE", "0.9"))
+
+_NON_WORD_RE = re.compile(r"[^\w]+")
+
+# Palabras funcionales (ya normalizadas): no cuentan como contenido al medir
+# qué parte del mensaje explican las palabras clave
+_STOPWORDS = frozenset("""
+    a al ante con contra de del desde e el en entre es esta este esto hay la las le les lo los me mi mis muy
+    nos o para pero por que se si sin son su sus te tu tus u un una unas uno unos y ya yo
+    como cual cuales cuando donde quien
+""".split())
+
+
+def _strip_accents(text: str) -> str:
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+# Tabla precalculada para Latin-1 / Latin Extended-A-B (á -> a, ñ -> n, ...):
+# str.translate evita descomponer carácter por carácter en cada mensaje
+_ACCENT_TABLE = {
+    code: _strip_accents(chr(code))
+    for code in range(0xC0, 0x250)
+    if _strip_accents(chr(code)) != chr(code)
+}
+
+
+def normalize_text(text: str) -> str:
+    """Minúsculas, sin tildes y con la puntuación reducida a espacios."""
+    text = text.casefold()
+    if not text.isascii():
+        text = text.translate(_ACCENT_TABLE)
+    return _NON_WORD_RE.sub(" ", text).strip()
+
+
+def _content_words(words: list[str]) -> int:
+    return sum(1 for word in words if word not in _STOPWORDS)
+
+
+class IntentMatch(NamedTuple):
+    intent: str | None
+    confidence: float
+    reply: str | None
+    short_circuit: bool
+
+
+class IntentClassifier:
+    """
+    Clasificador por palabras clave: todas las palabras de todas las
+    intenciones se compilan en UNA sola expresión regular, de modo que el
+    mensaje normalizado se recorre una sola vez.
+
+    Las palabras terminadas en '*' coinciden por prefijo ("optimiz*").
+
+    La confianza es la parte de las palabras de contenido del mensaje que
+    cubren las palabras clave de la intención ganadora: "hola" a secas da
+    1.0, pero "hola, ¿cómo mejoro mis ventas?" queda en 0.33 y va al LLM.
+    """
+
+    def __init__(self, config: dict, short_circuit_confidence: float):
+        self.short_circuit_confidence = short_circuit_confidence
+        self.intents = list(config)  # el orden del archivo desempata
+        self.replies = {intent: spec["reply"] for intent, spec in config.items()}
+        self.short_circuit_intents = {intent for intent, spec in config.items() if spec.get("short_circuit")}
+
+        self._group_intent: dict[str, str] = {}
+        alternatives = []
+        for index, (intent, spec) in enumerate(config.items()):
+            patterns = []
+            # Más largas primero: "buenos dias" antes que "buenas"
+            for keyword in sorted(spec["keywords"], key=len, reverse=True):
+                normalized = normalize_text(keyword.rstrip("*"))
+                pattern = re.escape(normalized).replace(r"\ ", r"\s+")
+                patterns.append(pattern + (r"\w*" if keyword.endswith("*") else ""))
+            group = f"i{index}"
+            self._group_intent[group] = intent
+            alternatives.append(f"(?P<{group}>{'|'.join(patterns)})")
+        self._pattern = re.compile(r"\b(?:" + "|".join(alternatives) + r")\b")
+
+        self.classified = 0
+        self.short_circuited = 0
+
+    @classmethod
+    def from_file(cls, path: str = INTENT_KEYWORDS_PATH) -> "IntentClassifier":
+        with open(path, encoding="utf-8") as keywords_file:
+            config = json.load(keywords_file)
+        return cls(config, INTENT_SHORT_CIRCUIT_CONFIDENCE)
+
+    def classify(self, message: str) -> IntentMatch:
+        text = normalize_text(message)
+
+        hits: dict[str, int] = {}
+        covered: dict[str, int] = {}
+        for match in self._pattern.finditer(text):
+            intent = self._group_intent[match.lastgroup]
+            hits[intent] = hits.get(intent, 0) + 1
+            covered[intent] = covered.get(intent, 0) + _content_words(match.group().split())
+        if not hits:
+            return IntentMatch(None, 0.0, None, False)
+
+        intent = max(self.intents, key=lambda name: (hits.get(name, 0), -self.intents.index(name)))
+        # "¿En cuánto tiempo veo resultados?" tiene 'tiempo', pero no es una charla sobre el clima
+        confidence = min(1.0, covered[intent] / max(_content_words(text.split()), 1))
+
+        short_circuit = intent in self.short_circuit_intents and confidence >= self.short_circuit_confidence
+        return IntentMatch(intent, round(confidence, 3), self.replies[intent], short_circuit)
+
+    def answer_locally(self, message: str) -> tuple[str, str] | None:
+        """(reply, context) si el mensaje se puede responder sin LLM; si no, None."""
+        self.classified += 1
+        match = self.classify(message)
+        if not match.short_circuit:
+            return None
+        self.short_circuited += 1
+        return match.reply, match.intent
+
+    def stats(self) -> dict:
+        return {
+            "classified": self.classified,
+            "short_circuited": self.short_circuited,
+            "llm_calls_saved_ratio": round(self.short_circuited / self.classified, 4) if self.classified else 0.0,
+        }
+
+
+intent_classifier = IntentClassifier.from_file()
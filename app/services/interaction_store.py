@@ -0,0 +1,200 @@
+# app/services/interaction_store.py
+
+import datetime
+import time
+from collections import Counter
+from typing import NamedTuple
+
+from sqlalchemy import func, insert, inspect, select, text
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.database import async_engine, engine, write_transaction
+from app.models.fingerprints import ReplyFingerprint
+from app.models.interactions import ChatInteraction
+from app.models.users import User
+from app.services.metrics_aggregates import context_counters, increment_counters
+from app.services.metrics_rollups import increment_rollups, rollup_deltas
+from app.services.near_duplicate import near_duplicates, to_signed
+from app.services.telemetry import histogram
+from app.services.text_codec import text_codec
+from app.services.user_cache import session_users
+
+user_lookup_seconds = histogram("db_user_lookup_seconds", "Resolución session_id -> users.id (caché + upsert)")
+insert_seconds = histogram("db_insert_seconds", "INSERT de las filas USER/BOT (executemany)")
+commit_seconds = histogram("db_commit_seconds", "COMMIT de la transacción de escritura")
+
+
+class InteractionPair(NamedTuple):
+    """Par USER/BOT pendiente de persistir."""
+    session_id: str
+    user_message: str
+    bot_reply: str
+    context: str
+    created_at: datetime.datetime
+    # Uso de tokens de Azure (None si la respuesta no vino del LLM)
+    prompt_tokens: int | None = None
+    completion_tokens: int | None = None
+    # Huella SimHash del mensaje si la respuesta se puede reutilizar (ver near_duplicate)
+    simhash: int | None = None
+
+
+def utc_now() -> datetime.datetime:
+    # Naive en UTC, igual que CURRENT_TIMESTAMP de SQLite
+    return datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+
+
+def context_deltas(pairs: list[InteractionPair]) -> Counter:
+    """Filas nuevas por contexto (cada par aporta USER + BOT)."""
+    deltas = Counter()
+    for pair in pairs:
+        deltas[pair.context] += 2
+    return deltas
+
+
+async def resolve_user_ids(conn: AsyncConnection, session_ids: set[str]) -> dict[str, int]:
+    """
+    Devuelve {session_id: user.id}. Los aciertos salen de la caché en memoria;
+    los fallos se resuelven con un único upsert
+    INSERT ... ON CONFLICT(session_id) DO UPDATE ... RETURNING,
+    que crea los usuarios nuevos y devuelve el id de los existentes sin
+    carrera entre dos primeros mensajes concurrentes de la misma sesión.
+    """
+    found = {}
+    missing = []
+    for session_id in session_ids:
+        user_id = session_users.get(session_id)
+        if user_id is None:
+            missing.append(session_id)
+        else:
+            found[session_id] = user_id
+
+    if missing:
+        upsert = sqlite_insert(User).values([
+            {"session_id": session_id, "name": "Anonymous", "created_at": func.now()}
+            for session_id in missing
+        ])
+        # DO UPDATE sin cambios reales (en lugar de DO NOTHING) para que
+        # RETURNING también devuelva las filas que ya existían.
+        upsert = upsert.on_conflict_do_update(
+            index_elements=[User.session_id],
+            set_={"session_id": upsert.excluded.session_id},
+        ).returning(User.session_id, User.id)
+        found.update((await conn.execute(upsert)).all())
+
+    return found
+
+
+async def load_user_ids(session_ids: set[str]) -> dict[str, int]:
+    """
+    {session_id: user.id} de las sesiones que ya existen, con una sola
+    consulta de lectura (sin tomar el lock de escritura) para los fallos de
+    caché. Los ids leídos ya están confirmados y quedan en la caché: la
+    hidratación de la memoria y el upsert posterior no vuelven a buscarlos.
+    Las sesiones nuevas no aparecen; se crean al persistir.
+    """
+    found = {}
+    missing = []
+    for session_id in session_ids:
+        user_id = session_users.get(session_id)
+        if user_id is None:
+            missing.append(session_id)
+        else:
+            found[session_id] = user_id
+
+    if missing:
+        async with async_engine.connect() as conn:
+            rows = dict((await conn.execute(
+                select(User.session_id, User.id).where(User.session_id.in_(missing))
+            )).all())
+        session_users.update(rows)
+        found.update(rows)
+
+    return found
+
+
+async def next_interaction_id(conn: AsyncConnection) -> int:
+    """Primer id libre de 'chat_interactions' (llamar dentro de la transacción de escritura)."""
+    seq = (await conn.execute(
+        text("SELECT seq FROM sqlite_sequence WHERE name = :name"), {"name": ChatInteraction.__tablename__}
+    )).scalar()
+    return (seq or 0) + 1
+
+
+async def insert_interaction_pairs(conn: AsyncConnection,
+                                   pairs: list[InteractionPair]) -> tuple[dict[str, int], list[tuple]]:
+    """
+    Inserta todos los pares con un único executemany (dentro de la transacción
+    de `conn`), actualiza contadores por contexto y rollups y devuelve el mapa
+    session_id -> user.id usado y las huellas guardadas (reply_id, context, simhash).
+
+    Los ids se asignan acá, a continuación de la secuencia AUTOINCREMENT de
+    la tabla: bajo el lock de escritura nadie más la avanza, y cada fila
+    lleva el suyo explícito, sin depender del orden en que SQLite inserte.
+    (INSERT ... RETURNING con el orden de los parámetros garantizado pasa a
+    una sentencia por fila en SQLite.)
+    """
+    with user_lookup_seconds.time():
+        user_ids = await resolve_user_ids(conn, {pair.session_id for pair in pairs})
+
+    first_id = await next_interaction_id(conn)
+    rows = []
+    for pair in pairs:
+        user_id = user_ids[pair.session_id]
+        # Mismas claves en todas las filas: executemany arma la sentencia con la primera
+        rows.append({"id": first_id + len(rows), "user_id": user_id, "context": pair.context,
+                     "message_type": "USER", "message_text": pair.user_message, "created_at": pair.created_at,
+                     "prompt_tokens": None, "completion_tokens": None})
+        rows.append({"id": first_id + len(rows), "user_id": user_id, "context": pair.context,
+                     "message_type": "BOT", "message_text": pair.bot_reply, "created_at": pair.created_at,
+                     "prompt_tokens": pair.prompt_tokens, "completion_tokens": pair.completion_tokens})
+
+    # Compresión de message_text en un hilo; la columna deja pasar los bytes ya codificados
+    for row, value in zip(rows, await text_codec.encode_all([row["message_text"] for row in rows])):
+        row["message_text"] = value
+    with insert_seconds.time():
+        await conn.execute(insert(ChatInteraction), rows)
+    fingerprints = await insert_fingerprints(conn, pairs, [row["id"] for row in rows[1::2]])
+    # Agregados de /metrics/summary y rollups horarios en la misma transacción
+    await increment_counters(conn, context_deltas(pairs))
+    await increment_rollups(conn, rollup_deltas(pairs))
+    return user_ids, fingerprints
+
+
+async def insert_fingerprints(conn: AsyncConnection, pairs: list[InteractionPair],
+                              reply_ids: list[int]) -> list[tuple]:
+    """Guarda las huellas de los pares que traen una, apuntando a su fila BOT (`reply_ids[i]` es la del par i)."""
+    fingerprints = [
+        (reply_id, pair.context, pair.simhash)
+        for pair, reply_id in zip(pairs, reply_ids, strict=True)
+        if pair.simhash is not None
+    ]
+    if not fingerprints:
+        return []
+    await conn.execute(insert(ReplyFingerprint), [
+        {"reply_id": reply_id, "context": context, "simhash": to_signed(fingerprint)}
+        for reply_id, context, fingerprint in fingerprints
+    ])
+    return fingerprints
+
+
+async def persist_pairs(pairs: list[InteractionPair]) -> None:
+    """Persiste los pares en una transacción de escritura y, tras el commit, cachea los ids."""
+    async with write_transaction() as conn:
+        user_ids, fingerprints = await insert_interaction_pairs(conn, pairs)
+        commit_started = time.perf_counter()
+    commit_seconds.observe(time.perf_counter() - commit_started)
+    # Solo después del commit: un rollback no debe dejar ids inexistentes en caché
+    session_users.update(user_ids)
+    context_counters.apply(context_deltas(pairs))
+    for reply_id, context, fingerprint in fingerprints:
+        near_duplicates.add(reply_id, context, fingerprint)
+
+
+def ensure_usage_columns() -> None:
+    """Agrega prompt_tokens / completion_tokens a bases creadas antes de existir."""
+    existing = {column["name"] for column in inspect(engine).get_columns(ChatInteraction.__tablename__)}
+    with engine.begin() as conn:
+        for column in ("prompt_tokens", "completion_tokens"):
+            if column not in existing:
+                conn.execute(text(f"ALTER TABLE {ChatInteraction.__tablename__} ADD COLUMN {column} INTEGER"))
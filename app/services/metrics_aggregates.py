@@ -0,0 +1,156 @@
+# app/services/metrics_aggregates.py
+"""
+Contadores incrementales para /metrics/summary (total y distribución por
+contexto), mantenidos en la tabla 'chat_context_counters' más una foto en
+memoria del proceso.
+
+Reconstrucción / verificación contra las filas crudas:
+    python -m app.services.metrics_aggregates verify
+    python -m app.services.metrics_aggregates rebuild
+"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+from collections import Counter
+
+from sqlalchemy import Connection, delete, exists, func, insert, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.database import async_engine, engine, metadata
+from app.models.aggregates import ContextCounter
+from app.models.archive import ArchivePartition
+from app.models.interactions import ChatInteraction
+from app.models import users # noqa: F401 (registra User para la relación de ChatInteraction)
+from app.services.archive import interaction_tables_sync
+
+log = logging.getLogger(__name__)
+
+# Cada cuánto se relee la tabla de agregados (cubre escrituras de otros workers)
+METRICS_SNAPSHOT_TTL_SECONDS = float(os.getenv("METRICS_SNAPSHOT_TTL_SECONDS", "5"))
+
+NULL_CONTEXT_KEY = ""
+
+
+async def increment_counters(conn: AsyncConnection, deltas: Counter) -> None:
+    """Suma `deltas` ({context: n}) al agregado, dentro de la transacción de `conn`."""
+    rows = [
+        {"context": NULL_CONTEXT_KEY if context is None else context, "interactions": count}
+        for context, count in deltas.items()
+    ]
+    upsert = sqlite_insert(ContextCounter)
+    upsert = upsert.on_conflict_do_update(
+        index_elements=[ContextCounter.context],
+        set_={"interactions": ContextCounter.interactions + upsert.excluded.interactions},
+    )
+    await conn.execute(upsert, rows)
+
+
+class ContextCountersSnapshot:
+    """Foto en memoria de los contadores: lectura O(1) para /metrics/summary."""
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self._counts: dict[str, int] = {}
+        self._loaded_at = 0.0
+
+    def apply(self, deltas: Counter) -> None:
+        """Aplicar deltas ya confirmados (llamar solo después del commit)."""
+        if not self._loaded_at:
+            return
+        for context, count in deltas.items():
+            key = NULL_CONTEXT_KEY if context is None else context
+            self._counts[key] = self._counts.get(key, 0) + count
+
+    async def refresh(self) -> None:
+        async with async_engine.connect() as conn:
+            rows = (await conn.execute(
+                select(ContextCounter.context, ContextCounter.interactions)
+            )).all()
+        self._counts = dict(rows)
+        self._loaded_at = time.monotonic()
+
+    async def summary(self) -> tuple[int, dict[str, int]]:
+        if time.monotonic() - self._loaded_at > self.ttl_seconds:
+            await self.refresh()
+        total = sum(self._counts.values())
+        distribution = {context: count for context, count in self._counts.items() if context != NULL_CONTEXT_KEY}
+        return total, distribution
+
+
+context_counters = ContextCountersSnapshot(METRICS_SNAPSHOT_TTL_SECONDS)
+
+
+# --- Reconstrucción / verificación (síncrono, para CLI y arranque) ---
+
+def compute_from_raw(conn: Connection) -> dict[str, int]:
+    """Recalcula los contadores recorriendo 'chat_interactions' y sus particiones de archivo."""
+    counts = Counter()
+    for table in interaction_tables_sync(conn):
+        for context, count in conn.execute(select(table.c.context, func.count()).group_by(table.c.context)).all():
+            counts[NULL_CONTEXT_KEY if context is None else context] += count
+    return dict(counts)
+
+
+def stored_counters(conn: Connection) -> dict[str, int]:
+    return dict(conn.execute(select(ContextCounter.context, ContextCounter.interactions)).all())
+
+
+def rebuild(conn: Connection) -> dict[str, int]:
+    counts = compute_from_raw(conn)
+    conn.execute(delete(ContextCounter))
+    if counts:
+        conn.execute(insert(ContextCounter), [
+            {"context": context, "interactions": count} for context, count in counts.items()
+        ])
+    return counts
+
+
+def verify(conn: Connection) -> dict[str, tuple[int, int]]:
+    """Devuelve {context: (almacenado, real)} solo para los contextos que difieren."""
+    expected = compute_from_raw(conn)
+    stored = stored_counters(conn)
+    return {
+        context: (stored.get(context, 0), expected.get(context, 0))
+        for context in expected.keys() | stored.keys()
+        if stored.get(context, 0) != expected.get(context, 0)
+    }
+
+
+def ensure_built() -> None:
+    """En el primer arranque con historia previa, construye los agregados."""
+    with engine.begin() as conn:
+        has_counters = conn.execute(select(exists().select_from(ContextCounter))).scalar()
+        has_rows = conn.execute(select(exists().select_from(ChatInteraction))).scalar()
+        if has_rows and not has_counters:
+            rebuild(conn)
+            log.info("Agregados por contexto reconstruidos desde chat_interactions")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["verify", "rebuild"])
+    args = parser.parse_args()
+
+    metadata.create_all(engine, tables=[ContextCounter.__table__, ArchivePartition.__table__])
+    if args.command == "rebuild":
+        with engine.begin() as conn:
+            counts = rebuild(conn)
+        print(f"Agregados reconstruidos: {sum(counts.values())} interacciones, {len(counts)} contextos.")
+        return
+
+    with engine.connect() as conn:
+        mismatches = verify(conn)
+    if not mismatches:
+        print("OK: los agregados coinciden con chat_interactions.")
+        return
+    for context, (stored, expected) in sorted(mismatches.items()):
+        print(f"DIFERENCIA context={context!r}: almacenado={stored} real={expected}")
+    sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+# app/services/metrics_rollups.py
+"""
+Rollups horarios de 'chat_interactions' (tabla 'chat_interaction_rollups')
+y consultas por ventana de tiempo que los usan.
+
+Una consulta [start, end) se resuelve así:
+  - las horas completas dentro del rango salen de los rollups;
+  - los tramos parciales de los extremos (y los buckets por minuto) salen
+    de las filas crudas vía el índice (created_at, context), sumando las
+    particiones de archivo solo si el tramo es anterior al corte
+    (ver app/services/archive.py).
+
+Reconstrucción desde las filas crudas:
+    python -m app.services.metrics_rollups rebuild
+"""
+
+import argparse
+import datetime
+import logging
+from collections import Counter
+from contextlib import aclosing
+
+from sqlalchemy import Connection, Table, delete, exists, func, insert, literal_column, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.database import async_engine, engine, metadata
+from app.models.aggregates import InteractionRollup
+from app.models.archive import ArchivePartition
+from app.models.interactions import ChatInteraction
+from app.models import users # noqa: F401 (registra User para la relación de ChatInteraction)
+from app.services.archive import interaction_tables, interaction_tables_sync
+from app.services.metrics_aggregates import NULL_CONTEXT_KEY
+
+log = logging.getLogger(__name__)
+
+ROLLUP_BUCKET = datetime.timedelta(hours=1)
+
+BUCKET_SIZES = {
+    "minute": datetime.timedelta(minutes=1),
+    "hour": datetime.timedelta(hours=1),
+    "day": datetime.timedelta(days=1),
+}
+# Los buckets por minuto se calculan desde filas crudas: limitamos el rango
+MAX_MINUTE_RANGE = datetime.timedelta(hours=24)
+
+# Mismo formato con el que SQLAlchemy guarda DateTime en SQLite
+_SQLITE_HOUR_FORMAT = "%Y-%m-%d %H:00:00.000000"
+_SQLITE_MINUTE_FORMAT = "%Y-%m-%d %H:%M:00.000000"
+
+
+def floor_time(value: datetime.datetime, size: datetime.timedelta) -> datetime.datetime:
+    if size >= BUCKET_SIZES["day"]:
+        return value.replace(hour=0, minute=0, second=0, microsecond=0)
+    if size >= BUCKET_SIZES["hour"]:
+        return value.replace(minute=0, second=0, microsecond=0)
+    return value.replace(second=0, microsecond=0)
+
+
+def ceil_time(value: datetime.datetime, size: datetime.timedelta) -> datetime.datetime:
+    floored = floor_time(value, size)
+    return floored if floored == value else floored + size
+
+
+# --- Mantenimiento incremental ---
+
+def rollup_deltas(pairs) -> Counter:
+    """{(bucket_start, context, message_type): n} para una lista de InteractionPair."""
+    deltas = Counter()
+    for pair in pairs:
+        bucket_start = floor_time(pair.created_at, ROLLUP_BUCKET)
+        context = NULL_CONTEXT_KEY if pair.context is None else pair.context
+        deltas[(bucket_start, context, "USER")] += 1
+        deltas[(bucket_start, context, "BOT")] += 1
+    return deltas
+
+
+async def increment_rollups(conn: AsyncConnection, deltas: Counter) -> None:
+    """Suma `deltas` a los rollups, dentro de la transacción de `conn`."""
+    rows = [
+        {"bucket_start": bucket_start, "context": context, "message_type": message_type, "interactions": count}
+        for (bucket_start, context, message_type), count in deltas.items()
+    ]
+    upsert = sqlite_insert(InteractionRollup)
+    upsert = upsert.on_conflict_do_update(
+        index_elements=[InteractionRollup.bucket_start, InteractionRollup.context, InteractionRollup.message_type],
+        set_={"interactions": InteractionRollup.interactions + upsert.excluded.interactions},
+    )
+    await conn.execute(upsert, rows)
+
+
+# --- Consultas por ventana ---
+
+async def _raw_counts(conn: AsyncConnection, start: datetime.datetime, end: datetime.datetime, context: str | None):
+    """Conteos por minuto desde filas crudas (rango cubierto por el índice created_at, context)."""
+    async with aclosing(interaction_tables(conn, start, end)) as tables:
+        async for table in tables:
+            minute = func.strftime(_SQLITE_MINUTE_FORMAT, table.c.created_at).label("minute")
+            query = (
+                select(minute, table.c.context, table.c.message_type, func.count())
+                .where(table.c.created_at >= start, table.c.created_at < end)
+                .group_by(literal_column("minute"), table.c.context, table.c.message_type)
+            )
+            if context is not None:
+                query = query.where(table.c.context == context)
+            for minute_value, row_context, message_type, count in (await conn.execute(query)).all():
+                bucket = datetime.datetime.strptime(minute_value, "%Y-%m-%d %H:%M:%S.%f")
+                yield bucket, NULL_CONTEXT_KEY if row_context is None else row_context, message_type, count
+
+
+async def _rollup_counts(conn: AsyncConnection, start: datetime.datetime, end: datetime.datetime, context: str | None):
+    query = select(
+        InteractionRollup.bucket_start, InteractionRollup.context,
+        InteractionRollup.message_type, InteractionRollup.interactions,
+    ).where(InteractionRollup.bucket_start >= start, InteractionRollup.bucket_start < end)
+    if context is not None:
+        query = query.where(InteractionRollup.context == context)
+    for row in (await conn.execute(query)).all():
+        yield tuple(row)
+
+
+async def count_range(
+    start: datetime.datetime,
+    end: datetime.datetime,
+    bucket: datetime.timedelta | None = None,
+    context: str | None = None,
+) -> Counter:
+    """
+    Cuenta interacciones en [start, end) agrupadas por
+    (bucket_start | None, context, message_type).
+    """
+    if bucket is not None and bucket < ROLLUP_BUCKET:
+        # Granularidad menor que la del rollup: todo desde filas crudas
+        segments = [("raw", start, end)]
+    else:
+        full_start = ceil_time(start, ROLLUP_BUCKET)
+        full_end = floor_time(end, ROLLUP_BUCKET)
+        if full_start >= full_end:
+            segments = [("raw", start, end)]
+        else:
+            segments = [("raw", start, full_start), ("rollup", full_start, full_end), ("raw", full_end, end)]
+
+    counts = Counter()
+    async with async_engine.connect() as conn:
+        for kind, segment_start, segment_end in segments:
+            if segment_start >= segment_end:
+                continue
+            rows = _raw_counts if kind == "raw" else _rollup_counts
+            async with aclosing(rows(conn, segment_start, segment_end, context)) as segment_rows:
+                async for bucket_start, row_context, message_type, count in segment_rows:
+                    key_bucket = floor_time(bucket_start, bucket) if bucket is not None else None
+                    counts[(key_bucket, row_context, message_type)] += count
+    return counts
+
+
+# --- Construcción / reconstrucción (síncrono, para CLI y arranque) ---
+
+def _hourly_counts(conn: Connection, table: Table) -> list:
+    bucket_start = func.strftime(_SQLITE_HOUR_FORMAT, table.c.created_at).label("bucket_start")
+    context_key = func.coalesce(table.c.context, NULL_CONTEXT_KEY).label("context_key")
+    return conn.execute(
+        select(bucket_start, context_key, table.c.message_type, func.count())
+        .where(table.c.created_at.is_not(None))
+        .group_by(literal_column("bucket_start"), literal_column("context_key"), table.c.message_type)
+    ).all()
+
+
+def rebuild(conn: Connection) -> int:
+    """Recalcula todos los rollups desde 'chat_interactions' y sus particiones. Devuelve el nº de filas."""
+    # Se lee antes de escribir: ATTACH no se permite dentro de una transacción
+    counts = Counter()
+    for table in interaction_tables_sync(conn):
+        for bucket_start, context, message_type, count in _hourly_counts(conn, table):
+            counts[(bucket_start, context, message_type)] += count
+
+    conn.execute(delete(InteractionRollup))
+    if counts:
+        conn.execute(insert(InteractionRollup), [
+            {
+                "bucket_start": datetime.datetime.strptime(bucket_start, "%Y-%m-%d %H:%M:%S.%f"),
+                "context": context,
+                "message_type": message_type,
+                "interactions": count,
+            }
+            for (bucket_start, context, message_type), count in counts.items()
+        ])
+    return len(counts)
+
+
+def ensure_built() -> None:
+    """Crea el índice (created_at, context) y, si hay historia previa sin rollups, los construye."""
+    index = next(i for i in ChatInteraction.__table__.indexes if i.name == "ix_chat_interactions_created_at_context")
+    index.create(engine, checkfirst=True)
+    with engine.begin() as conn:
+        has_rollups = conn.execute(select(exists().select_from(InteractionRollup))).scalar()
+        has_rows = conn.execute(select(exists().select_from(ChatInteraction))).scalar()
+        if has_rows and not has_rollups:
+            rebuild(conn)
+            log.info("Rollups horarios reconstruidos desde chat_interactions")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["rebuild"])
+    parser.parse_args()
+
+    metadata.create_all(engine, tables=[InteractionRollup.__table__, ArchivePartition.__table__])
+    with engine.begin() as conn:
+        rows = rebuild(conn)
+    print(f"Rollups reconstruidos: {rows} filas.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,365 @@
+# app/services/near_duplicate.py
+"""
+Reutilización de respuestas para paráfrasis que la caché exacta no
+reconoce ("cómo bajo mi CPC" / "como reducir el cpc?"):
+
+  - el mensaje se normaliza como en el clasificador de intención, se
+    quitan las palabras vacías, los sinónimos se llevan a un término
+    canónico y cada palabra se trunca a sus primeros 5 caracteres
+    (near_duplicate_terms.json);
+  - SimHash de 64 bits sobre ese conjunto de términos; la similitud es
+    1 - distancia de Hamming / 64;
+  - índice en memoria por bandas: la huella se parte en d+1 bandas (d =
+    distancia máxima admitida), así dos huellas a distancia <= d
+    comparten al menos una banda entera. Cada banda es una tabla de
+    cabezas de lista indexada por el valor de la banda; las listas y las
+    entradas viven en array.array (sin objetos por entrada);
+  - solo se indexan respuestas de Azure a mensajes sin historial, y solo
+    se reutilizan dentro del mismo contexto (el del clasificador local
+    para la pregunta nueva);
+  - cada huella se guarda en 'chat_reply_fingerprints' en la misma
+    transacción que el par USER/BOT; al arrancar se recargan en segundo
+    plano las más recientes, sin recalcular nada.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sys
+import time
+from array import array
+from functools import lru_cache
+
+from sqlalchemy import select
+
+from app.database import async_engine, engine
+from app.models.fingerprints import ReplyFingerprint
+from app.models.interactions import ChatInteraction
+from app.services.intent import intent_classifier, normalize_text
+from app.services.structured_logging import debug_sampled
+
+log = logging.getLogger(__name__)
+
+# --- Configuración (variables de entorno) ---
+NEAR_DUP_ENABLED = os.getenv("NEAR_DUP_ENABLED", "1") == "1"
+# Similitud mínima (1 - Hamming/64) para reutilizar; 0.95 admite hasta 3 bits distintos
+NEAR_DUP_THRESHOLD = float(os.getenv("NEAR_DUP_THRESHOLD", "0.95"))
+# Entradas en memoria; al llenarse no se indexan más (la recarga toma las más recientes)
+NEAR_DUP_MAX_ENTRIES = int(os.getenv("NEAR_DUP_MAX_ENTRIES", "2000000"))
+# Mensajes con menos términos útiles no se indexan ni se buscan
+NEAR_DUP_MIN_TERMS = int(os.getenv("NEAR_DUP_MIN_TERMS", "2"))
+NEAR_DUP_TERMS_PATH = os.getenv(
+    "NEAR_DUP_TERMS_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "near_duplicate_terms.json"),
+)
+
+STEM_CHARS = 5
+_BITS = 64
+_MASK = (1 << _BITS) - 1
+# Bits por banda como máximo (tabla de cabezas de 2^16 = 64K entradas por banda)
+_MAX_BAND_BITS = 16
+_BIT_BYTES = bytes.maketrans(b"01", b"\x00\x01")
+
+
+def to_signed(fingerprint: int) -> int:
+    """Huella sin signo -> INTEGER de SQLite (64 bits con signo)."""
+    return fingerprint - (1 << _BITS) if fingerprint >> (_BITS - 1) else fingerprint
+
+
+def to_unsigned(value: int) -> int:
+    return value & _MASK
+
+
+@lru_cache(maxsize=65536)
+def _term_lanes(term: str) -> int:
+    """Hash de 64 bits del término con cada bit en su propio byte (cacheado: el vocabulario es chico)."""
+    term_hash = int.from_bytes(hashlib.blake2b(term.encode("utf-8"), digest_size=8).digest(), "little")
+    # "0101..." (bit 63 primero) -> bytes 0/1 en big-endian: el último byte es el bit 0
+    return int.from_bytes(format(term_hash, "064b").encode("ascii").translate(_BIT_BYTES), "big")
+
+
+@lru_cache(maxsize=256)
+def _majority_table(terms: int) -> bytes:
+    """Conteo por bit -> b"1" si supera la mitad de los términos (empate -> b"0")."""
+    return bytes(0x31 if 2 * count > terms else 0x30 for count in range(256))
+
+
+def simhash(terms: tuple[str, ...]) -> int:
+    """
+    SimHash de 64 bits con peso 1 por término: bit en 1 si lo tiene la
+    mayoría. Sumar los hashes "un bit por byte" cuenta los 64 bits a la vez
+    (sin acarreo entre bytes para menos de 256 términos).
+    """
+    terms = terms[:255]
+    counts = sum(map(_term_lanes, terms)).to_bytes(_BITS, "little")
+    return int(counts.translate(_majority_table(len(terms)))[::-1], 2)
+
+
+class _Table:
+    """
+    Entradas en arrays paralelos (slot = posición). Cada banda es una lista
+    de 2^bits cubetas; cada cubeta, un array con los slots cuyo valor de
+    banda coincide. Las distancias de una cubeta se calculan con map(), sin
+    recorrerla en Python.
+    """
+
+    def __init__(self, bands: int, band_bits: int):
+        self.bands = bands
+        self.band_bits = band_bits
+        self.band_mask = (1 << band_bits) - 1
+        self.fingerprints = array("Q")
+        self.reply_ids = array("q")     # 0 = entrada descartada (respuesta archivada)
+        self.contexts = array("B")
+        self.buckets: list[list[array | None]] = [[None] * (1 << band_bits) for _ in range(bands)]
+
+    def __len__(self) -> int:
+        return len(self.fingerprints)
+
+    def band_keys(self, fingerprint: int) -> list[int]:
+        return [(fingerprint >> (band * self.band_bits)) & self.band_mask for band in range(self.bands)]
+
+    def nearest(self, fingerprint: int, context_code: int, max_distance: int) -> tuple[int, int] | None:
+        """(slot, distancia) de la entrada más parecida del contexto, o None."""
+        best = None
+        best_distance = max_distance + 1
+        for band, key in enumerate(self.band_keys(fingerprint)):
+            slots = self.buckets[band][key]
+            if slots is None:
+                continue
+            distances = list(map(int.bit_count, map(fingerprint.__xor__, map(self.fingerprints.__getitem__, slots))))
+            if min(distances) >= best_distance:
+                continue
+            for position, distance in enumerate(distances):
+                if distance < best_distance:
+                    slot = slots[position]
+                    if self.contexts[slot] == context_code and self.reply_ids[slot]:
+                        best, best_distance = slot, distance
+                        if distance == 0:
+                            return best, 0
+        return None if best is None else (best, best_distance)
+
+    def contains(self, fingerprint: int, context_code: int) -> bool:
+        """Si ya hay una entrada idéntica del contexto (alcanza con mirar la primera banda)."""
+        slots = self.buckets[0][fingerprint & self.band_mask]
+        if slots is None or fingerprint not in map(self.fingerprints.__getitem__, slots):
+            return False
+        return any(self.fingerprints[slot] == fingerprint and self.contexts[slot] == context_code
+                   for slot in slots)
+
+    def append(self, fingerprint: int, reply_id: int, context_code: int) -> None:
+        slot = len(self.fingerprints)
+        self.fingerprints.append(fingerprint)
+        self.reply_ids.append(reply_id)
+        self.contexts.append(context_code)
+        for band, key in enumerate(self.band_keys(fingerprint)):
+            slots = self.buckets[band][key]
+            if slots is None:
+                slots = self.buckets[band][key] = array("I")
+            slots.append(slot)
+
+    def memory_bytes(self) -> int:
+        total = sum(sys.getsizeof(values) for values in (self.fingerprints, self.reply_ids, self.contexts))
+        for buckets in self.buckets:
+            total += sys.getsizeof(buckets)
+            total += sum(sys.getsizeof(slots) for slots in buckets if slots is not None)
+        return total
+
+
+class NearDuplicateIndex:
+    """Huellas de preguntas ya respondidas, por contexto, con búsqueda por distancia de Hamming."""
+
+    def __init__(self, enabled: bool, threshold: float, max_entries: int, min_terms: int,
+                 stopwords: set[str], synonyms: dict[str, str]):
+        self.enabled = enabled
+        self.threshold = threshold
+        self.max_distance = int((1.0 - threshold) * _BITS + 1e-9)
+        self.max_entries = max_entries
+        self.min_terms = min_terms
+        self.stopwords = stopwords
+        self.synonyms = synonyms
+
+        # Con d+1 bandas al menos una queda sin bits distintos (bits sobrantes: sin banda)
+        self._bands = max(4, self.max_distance + 1)
+        self._band_bits = min(_MAX_BAND_BITS, _BITS // self._bands)
+        self._table = _Table(self._bands, self._band_bits)
+        self._context_codes: dict[str, int] = {}
+
+        self._task: asyncio.Task | None = None
+        # Entradas agregadas mientras se recarga la tabla (se reaplican al final)
+        self._pending: list[tuple[int, int, str]] | None = None
+        self.load_ms: float | None = None
+
+        self.lookups = 0
+        self.hits = 0
+        self.skipped_duplicates = 0
+        self.dropped = 0
+        self.stale = 0
+
+    @classmethod
+    def from_file(cls, path: str = NEAR_DUP_TERMS_PATH) -> "NearDuplicateIndex":
+        with open(path, encoding="utf-8") as terms_file:
+            config = json.load(terms_file)
+        synonyms = {
+            normalize_text(word): normalize_text(canonical)
+            for canonical, words in config["synonyms"].items()
+            for word in words
+        }
+        stopwords = {normalize_text(word) for word in config["stopwords"]}
+        return cls(NEAR_DUP_ENABLED, NEAR_DUP_THRESHOLD, NEAR_DUP_MAX_ENTRIES, NEAR_DUP_MIN_TERMS, stopwords, synonyms)
+
+    # --- Huellas ---
+
+    def terms(self, message: str) -> tuple[str, ...]:
+        """Términos canónicos (sin repetir, ordenados) que entran en la huella."""
+        terms = set()
+        for word in normalize_text(message).split():
+            if word in self.stopwords:
+                continue
+            terms.add(self.synonyms.get(word, word)[:STEM_CHARS])
+        return tuple(sorted(terms))
+
+    def fingerprint(self, message: str) -> int | None:
+        """Huella del mensaje, o None si tiene muy pocos términos para compararlo."""
+        if not self.enabled:
+            return None
+        terms = self.terms(message)
+        if len(terms) < self.min_terms:
+            return None
+        return simhash(terms)
+
+    def _context_code(self, context: str, create: bool) -> int | None:
+        code = self._context_codes.get(context)
+        if code is None and create and len(self._context_codes) < 255:
+            code = self._context_codes[context] = len(self._context_codes) + 1
+        return code
+
+    # --- Índice ---
+
+    def add(self, reply_id: int, context: str, fingerprint: int) -> bool:
+        """Indexa una respuesta ya persistida; False si ya había una idéntica o no hay lugar."""
+        if self._pending is not None:
+            self._pending.append((reply_id, fingerprint, context))
+        return self._add(self._table, reply_id, context, fingerprint)
+
+    def _add(self, table: _Table, reply_id: int, context: str, fingerprint: int) -> bool:
+        code = self._context_code(context, create=True)
+        if code is None or len(table) >= self.max_entries:
+            self.dropped += 1
+            return False
+        if table.contains(fingerprint, code):
+            self.skipped_duplicates += 1
+            return False
+        table.append(fingerprint, reply_id, code)
+        return True
+
+    def _find_slot(self, message: str, context: str | None) -> tuple[int, float] | None:
+        fingerprint = self.fingerprint(message)
+        code = self._context_code(context, create=False) if context else None
+        if fingerprint is None or code is None:
+            return None
+        found = self._table.nearest(fingerprint, code, self.max_distance)
+        if found is None:
+            return None
+        slot, distance = found
+        return slot, 1.0 - distance / _BITS
+
+    def find(self, message: str, context: str | None) -> tuple[int, float] | None:
+        """(reply_id, similitud) de la respuesta más parecida del mismo contexto, o None."""
+        found = self._find_slot(message, context)
+        return None if found is None else (self._table.reply_ids[found[0]], found[1])
+
+    async def lookup(self, message: str) -> tuple[str, str] | None:
+        """(reply, context) guardado para una paráfrasis del mensaje, o None."""
+        if not self.enabled:
+            return None
+        self.lookups += 1
+        context = intent_classifier.classify(message).intent
+        table = self._table
+        found = self._find_slot(message, context)
+        if found is None:
+            return None
+
+        slot, similarity = found
+        reply_id = table.reply_ids[slot]
+        async with async_engine.connect() as conn:
+            reply = (await conn.execute(
+                select(ChatInteraction.message_text)
+                .where(ChatInteraction.id == reply_id, ChatInteraction.message_type == "BOT")
+            )).scalar()
+        if reply is None:
+            # La fila se archivó: la entrada deja de servir
+            table.reply_ids[slot] = 0
+            self.stale += 1
+            return None
+
+        self.hits += 1
+        debug_sampled(log, "Respuesta reutilizada por similitud", similarity=round(similarity, 3))
+        return reply, context
+
+    # --- Recarga al arrancar ---
+
+    async def start(self) -> None:
+        if self._task is None and self.enabled:
+            self._task = asyncio.create_task(self._reload(), name="near-duplicate-load")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _reload(self) -> None:
+        """Arma una tabla nueva en un hilo (las búsquedas siguen sobre la actual) y la reemplaza."""
+        started = time.perf_counter()
+        self._pending = []
+        try:
+            table = await asyncio.to_thread(self._load_table)
+            for reply_id, fingerprint, context in self._pending:
+                self._add(table, reply_id, context, fingerprint)
+            self._table = table
+            self.load_ms = round((time.perf_counter() - started) * 1000, 1)
+            log.info("Índice de casi duplicados cargado", extra={"entries": len(table), "load_ms": self.load_ms})
+        except Exception:
+            log.exception("Fallo al cargar el índice de casi duplicados")
+        finally:
+            self._pending = None
+
+    def _load_table(self) -> _Table:
+        table = _Table(self._bands, self._band_bits)
+        query = (
+            select(ReplyFingerprint.reply_id, ReplyFingerprint.context, ReplyFingerprint.simhash)
+            .order_by(ReplyFingerprint.reply_id.desc())
+            .limit(self.max_entries)
+        )
+        with engine.connect() as conn:
+            # Las más recientes primero: ante huellas idénticas queda la respuesta más nueva
+            for reply_id, context, value in conn.execute(query):
+                self._add(table, reply_id, context, to_unsigned(value))
+        return table
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "threshold": self.threshold,
+            "max_distance_bits": self.max_distance,
+            "entries": len(self._table),
+            "max_entries": self.max_entries,
+            "loading": self._pending is not None,
+            "load_ms": self.load_ms,
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "hit_ratio": round(self.hits / self.lookups, 4) if self.lookups else 0.0,
+            "skipped_duplicates": self.skipped_duplicates,
+            "dropped": self.dropped,
+            "stale": self.stale,
+            "memory_bytes": self._table.memory_bytes(),
+        }
+
+
+near_duplicates = NearDuplicateIndex.from_file()
@@ -0,0 +1,176 @@
+# app/services/reply_cache.py
+
+import asyncio
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+# --- Configuración (variables de entorno) ---
+REPLY_CACHE_MAX_ENTRIES = int(os.getenv("REPLY_CACHE_MAX_ENTRIES", "2048"))
+REPLY_CACHE_TTL_SECONDS = float(os.getenv("REPLY_CACHE_TTL_SECONDS", "3600"))
+# Ruta del nivel persistente en SQLite (vacío = deshabilitado)
+REPLY_CACHE_SQLITE_PATH = os.getenv("REPLY_CACHE_SQLITE_PATH", "")
+
+_WHITESPACE_RE = re.compile(r"\s+")
+_EDGE_PUNCTUATION = " ¿?¡!.,;:"
+
+
+def normalize_message(message: str) -> str:
+    """Normaliza el mensaje para que variaciones triviales compartan clave."""
+    text = unicodedata.normalize("NFKC", message).casefold()
+    text = _WHITESPACE_RE.sub(" ", text)
+    return text.strip(_EDGE_PUNCTUATION)
+
+
+def make_key(message: str, system_prompt: str, deployment: str, history: tuple = ()) -> str:
+    """
+    Clave = mensaje normalizado + SYSTEM_PROMPT + deployment + historial
+    enviado al LLM (pares (pregunta, respuesta, ...)); sin historial, la
+    clave es la misma para todas las sesiones.
+    """
+    digest = hashlib.sha256()
+    parts = [deployment, system_prompt]
+    for user_message, bot_reply, *_ in history:
+        parts.extend((normalize_message(user_message), bot_reply))
+    parts.append(normalize_message(message))
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+class ReplyCache:
+    """
+    Caché LRU con expiración por TTL para pares (reply, context), con un
+    nivel persistente opcional en SQLite que sobrevive a los reinicios.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float, sqlite_path: str = ""):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.sqlite_path = sqlite_path
+
+        self._entries: OrderedDict[str, tuple[float, str, str]] = OrderedDict()
+        self._conn: sqlite3.Connection | None = None
+        self._conn_lock = threading.Lock()
+
+        self.hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    # --- Nivel en memoria ---
+
+    def _get_memory(self, key: str, now: float) -> tuple[str, str] | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, reply, context = entry
+        if expires_at <= now:
+            del self._entries[key]
+            self.expirations += 1
+            return None
+        self._entries.move_to_end(key)
+        return reply, context
+
+    def _put_memory(self, key: str, expires_at: float, reply: str, context: str) -> None:
+        self._entries[key] = (expires_at, reply, context)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    # --- Nivel persistente (SQLite) ---
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.sqlite_path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS reply_cache ("
+                " key TEXT PRIMARY KEY, reply TEXT NOT NULL,"
+                " context TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._conn = conn
+        return self._conn
+
+    def _get_persistent(self, key: str, now: float) -> tuple[float, str, str] | None:
+        with self._conn_lock:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT expires_at, reply, context FROM reply_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and row[0] <= now:
+                conn.execute("DELETE FROM reply_cache WHERE key = ?", (key,))
+                conn.commit()
+                return None
+            return row
+
+    def _put_persistent(self, key: str, expires_at: float, reply: str, context: str) -> None:
+        with self._conn_lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO reply_cache (key, reply, context, expires_at) VALUES (?, ?, ?, ?)",
+                (key, reply, context, expires_at),
+            )
+            conn.commit()
+
+    # --- API pública ---
+
+    async def get(self, key: str) -> tuple[str, str] | None:
+        now = time.time()
+        cached = self._get_memory(key, now)
+        if cached is not None:
+            self.hits += 1
+            return cached
+
+        if self.sqlite_path:
+            row = await asyncio.to_thread(self._get_persistent, key, now)
+            if row is not None:
+                expires_at, reply, context = row
+                self._put_memory(key, expires_at, reply, context)
+                self.hits += 1
+                self.persistent_hits += 1
+                return reply, context
+
+        self.misses += 1
+        return None
+
+    async def put(self, key: str, reply: str, context: str) -> None:
+        expires_at = time.time() + self.ttl_seconds
+        self._put_memory(key, expires_at, reply, context)
+        if self.sqlite_path:
+            await asyncio.to_thread(self._put_persistent, key, expires_at, reply, context)
+
+    def close(self) -> None:
+        with self._conn_lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "persistent": bool(self.sqlite_path),
+            "hits": self.hits,
+            "persistent_hits": self.persistent_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+reply_cache = ReplyCache(
+    max_entries=REPLY_CACHE_MAX_ENTRIES,
+    ttl_seconds=REPLY_CACHE_TTL_SECONDS,
+    sqlite_path=REPLY_CACHE_SQLITE_PATH,
+)
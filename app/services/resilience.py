@@ -0,0 +1,186 @@
+# app/services/resilience.py
+"""
+Políticas para llamadas a servicios externos (Azure OpenAI):
+
+  - presupuesto de latencia por petición (asyncio.wait_for);
+  - circuit breaker: tras N fallos/timeouts consecutivos se abre y las
+    llamadas van directo al fallback; pasado el enfriamiento deja pasar
+    una sonda (half-open) que lo cierra si tiene éxito;
+  - hedging opcional: si el primer intento supera el p95 observado, se
+    lanza un segundo intento en paralelo y gana el primero que responda.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Awaitable, Callable, TypeVar
+
+from app.services.telemetry import Histogram
+
+T = TypeVar("T")
+
+log = logging.getLogger(__name__)
+
+# --- Configuración (variables de entorno) ---
+AZURE_LATENCY_BUDGET_MS = float(os.getenv("AZURE_LATENCY_BUDGET_MS", "8000"))
+AZURE_BREAKER_FAILURES = int(os.getenv("AZURE_BREAKER_FAILURES", "5"))
+AZURE_BREAKER_RESET_SECONDS = float(os.getenv("AZURE_BREAKER_RESET_SECONDS", "15"))
+AZURE_HEDGE_ENABLED = os.getenv("AZURE_HEDGE_ENABLED", "0") == "1"
+# El hedging solo se activa con suficientes muestras para estimar el p95
+AZURE_HEDGE_MIN_SAMPLES = int(os.getenv("AZURE_HEDGE_MIN_SAMPLES", "20"))
+AZURE_HEDGE_MIN_DELAY_MS = float(os.getenv("AZURE_HEDGE_MIN_DELAY_MS", "50"))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """El circuito está abierto: no se intenta la llamada."""
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+
+        self.rejected = 0
+        self.trips = 0
+
+    def allow(self) -> bool:
+        """¿Se puede intentar la llamada? En half-open solo pasa una sonda a la vez."""
+        if self.state == OPEN and time.monotonic() - self._opened_at >= self.reset_seconds:
+            self.state = HALF_OPEN
+        if self.state == CLOSED:
+            return True
+        if self.state == HALF_OPEN and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+        self.rejected += 1
+        return False
+
+    def record_success(self) -> None:
+        if self.state != CLOSED:
+            log.info("Circuit breaker cerrado: el servicio respondió a la sonda")
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        self.consecutive_failures += 1
+        if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self.state != OPEN:
+                self.trips += 1
+                log.warning("Circuit breaker abierto tras %d fallos consecutivos", self.consecutive_failures)
+            self.state = OPEN
+            self._opened_at = time.monotonic()
+        self._probe_in_flight = False
+
+    def release(self) -> None:
+        """La llamada se canceló sin resultado: libera la sonda sin contar fallo."""
+        self._probe_in_flight = False
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "trips": self.trips,
+            "rejected": self.rejected,
+        }
+
+
+class GuardedCall:
+    """Combina presupuesto de latencia, circuit breaker y hedging."""
+
+    def __init__(self, breaker: CircuitBreaker, budget_seconds: float, hedge: bool,
+                 latency: Histogram, hedge_min_samples: int, hedge_min_delay: float):
+        self.breaker = breaker
+        self.budget_seconds = budget_seconds
+        self.hedge = hedge
+        self.latency = latency
+        self.hedge_min_samples = hedge_min_samples
+        self.hedge_min_delay = hedge_min_delay
+
+        self.calls = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.hedges_launched = 0
+        self.hedges_won = 0
+
+    def hedge_delay(self) -> float | None:
+        """Retardo antes del intento de respaldo (p95 observado) o None si no aplica."""
+        if not self.hedge or self.latency.count < self.hedge_min_samples:
+            return None
+        return max(self.hedge_min_delay, self.latency.quantile(0.95))
+
+    async def _attempt(self, fn: Callable[[], Awaitable[T]]) -> T:
+        started = time.perf_counter()
+        result = await fn()
+        self.latency.observe(time.perf_counter() - started)
+        return result
+
+    async def _hedged(self, fn: Callable[[], Awaitable[T]], delay: float) -> T:
+        primary = asyncio.ensure_future(self._attempt(fn))
+        pending = {primary}
+        try:
+            done, _ = await asyncio.wait(pending, timeout=delay)
+            if not done:
+                self.hedges_launched += 1
+                pending.add(asyncio.ensure_future(self._attempt(fn)))
+
+            error: BaseException | None = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            self.hedges_won += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def __call__(self, fn: Callable[[], Awaitable[T]]) -> T:
+        """Ejecuta fn() con las políticas; CircuitOpenError/TimeoutError/errores de fn se propagan."""
+        if not self.breaker.allow():
+            raise CircuitOpenError("Circuito abierto para Azure OpenAI.")
+
+        self.calls += 1
+        delay = self.hedge_delay()
+        attempt = self._attempt(fn) if delay is None else self._hedged(fn, delay)
+        try:
+            result = await asyncio.wait_for(attempt, timeout=self.budget_seconds)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            self.breaker.record_failure()
+            raise
+        except asyncio.CancelledError:
+            self.breaker.release()
+            raise
+        except Exception:
+            self.failures += 1
+            self.breaker.record_failure()
+            raise
+        self.breaker.record_success()
+        return result
+
+    def stats(self) -> dict:
+        return {
+            "budget_ms": round(self.budget_seconds * 1000, 1),
+            "calls": self.calls,
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+            "hedging": self.hedge,
+            "hedge_delay_ms": round(d * 1000, 1) if (d := self.hedge_delay()) is not None else None,
+            "hedges_launched": self.hedges_launched,
+            "hedges_won": self.hedges_won,
+            "breaker": self.breaker.stats(),
+        }
@@ -0,0 +1,89 @@
+# app/services/schema.py
+"""
+Versión del esquema guardada en la propia base (PRAGMA user_version de
+SQLite). En el arranque se compara con SCHEMA_VERSION: si coincide, no se
+ejecuta create_all ni la reflexión de columnas/índices; si no, se aplican
+los pasos de migración (todos idempotentes) y se guarda la versión nueva.
+
+Al agregar una tabla, columna o índice: sumar el paso en migrate() e
+incrementar SCHEMA_VERSION.
+
+Uso:
+    python -m app.services.schema status
+    python -m app.services.schema migrate   # fuerza los pasos aunque la versión coincida
+"""
+
+import argparse
+import logging
+
+from app.database import engine, metadata
+from app.models import aggregates, archive, campaigns, fingerprints, interactions, text_dictionaries, users  # noqa: F401 (registra las tablas en metadata)
+from app.services import archive, campaign_ingest, conversation_memory, export, interaction_store, metrics_aggregates, metrics_rollups
+
+log = logging.getLogger(__name__)
+
+SCHEMA_VERSION = 10
+
+
+def stored_version() -> int:
+    with engine.connect() as conn:
+        return conn.exec_driver_sql("PRAGMA user_version").scalar()
+
+
+def _store_version(version: int) -> None:
+    with engine.begin() as conn:
+        conn.exec_driver_sql(f"PRAGMA user_version = {int(version)}")
+
+
+def migrate() -> None:
+    """Lleva cualquier base (vacía o anterior) al esquema actual."""
+    metadata.create_all(engine)
+    # Columnas de uso de tokens en bases anteriores a su introducción
+    interaction_store.ensure_usage_columns()
+    # Agregados de /metrics/summary (se construyen una vez si hay historia previa)
+    metrics_aggregates.ensure_built()
+    metrics_rollups.ensure_built()
+    # Índice (user_id, created_at, id, ...) del historial y la memoria de conversación (v3; v9 sin message_text)
+    conversation_memory.ensure_index()
+    # v6: métricas diarias de campañas; índice único por nombre también en 'campaigns' preexistentes
+    campaign_ingest.ensure_index()
+    # v7: valor de conversión (ROAS) en 'campaign_daily_stats' creadas en v6
+    campaign_ingest.ensure_columns()
+    # v8: ids de 'chat_interactions' con AUTOINCREMENT (no se reutilizan tras archivar)
+    archive.ensure_id_sequence()
+    # v10: índice de context para exportar solo por context
+    export.ensure_index()
+    # v9: el índice del historial de las particiones, también sin message_text; v10: el de context
+    archive.ensure_partition_indexes()
+    # v2: catálogo de particiones de archivo (chat_archive_partitions, lo crea create_all)
+    # v4: huellas de casi duplicados (chat_reply_fingerprints, lo crea create_all)
+    # v5: diccionarios de compresión de message_text (chat_text_dictionaries, lo crea create_all)
+    _store_version(SCHEMA_VERSION)
+
+
+def ensure_schema() -> bool:
+    """Migra solo si la versión guardada es anterior; devuelve True si migró."""
+    current = stored_version()
+    if current == SCHEMA_VERSION:
+        return False
+    if current > SCHEMA_VERSION:
+        # Base migrada por una versión más nueva de la app: no se toca
+        log.warning("Esquema de la base (v%d) más nuevo que el de la app (v%d)", current, SCHEMA_VERSION)
+        return False
+    migrate()
+    log.info("Esquema migrado de v%d a v%d", current, SCHEMA_VERSION)
+    return True
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["status", "migrate"])
+    args = parser.parse_args()
+
+    if args.command == "migrate":
+        migrate()
+    print(f"Esquema: base v{stored_version()}, app v{SCHEMA_VERSION}.")
+
+
+if __name__ == "__main__":
+    main()
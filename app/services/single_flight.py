@@ -0,0 +1,67 @@
+# app/services/single_flight.py
+
+import asyncio
+import os
+from typing import Awaitable, Callable, TypeVar
+
+# --- Configuración (variables de entorno) ---
+# Coalescencia de peticiones idénticas en vuelo hacia Azure (1 = activada)
+CHAT_SINGLE_FLIGHT = os.getenv("CHAT_SINGLE_FLIGHT", "1") == "1"
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """
+    Agrupa llamadas concurrentes con la misma clave: la primera (líder) lanza
+    la corrutina como tarea y las demás esperan ese mismo resultado.
+
+    La tarea compartida se protege con asyncio.shield: si un cliente se
+    desconecta, solo se cancela su espera, no la llamada de los demás.
+    Las excepciones también se comparten (cada llamador decide su fallback).
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._in_flight: dict[str, asyncio.Task] = {}
+
+        self.leaders = 0
+        self.joined = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        if not self.enabled:
+            self.leaders += 1
+            return await fn()
+
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.joined += 1
+        else:
+            self.leaders += 1
+            task = asyncio.ensure_future(fn())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._forget(key, task))
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task: asyncio.Task) -> None:
+        # Solo si sigue siendo la misma tarea (no una posterior con igual clave)
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        # Evita "Task exception was never retrieved" si todos los que
+        # esperaban se cancelaron antes de que terminara
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> dict:
+        calls = self.leaders + self.joined
+        return {
+            "enabled": self.enabled,
+            "in_flight": len(self._in_flight),
+            "upstream_calls": self.leaders,
+            "joined_waiters": self.joined,
+            "saved_calls": self.joined,
+            "saved_ratio": round(self.joined / calls, 4) if calls else 0.0,
+        }
+
+
+azure_single_flight = SingleFlight(enabled=CHAT_SINGLE_FLIGHT)
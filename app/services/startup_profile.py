@@ -0,0 +1,70 @@
+# app/services/startup_profile.py
+"""
+Perfil del arranque en frío: duración de cada fase (imports de app.main y
+pasos del lifespan) y edad del proceso al quedar listo para recibir
+tráfico. Se loguea una vez al terminar el arranque y se expone en
+/metrics/startup y como gauge en /metrics/prometheus.
+
+Para el detalle de imports: python -X importtime -c "import app.main"
+"""
+
+import logging
+import os
+import time
+from contextlib import contextmanager
+
+from app.services.telemetry import gauge
+
+log = logging.getLogger(__name__)
+
+
+def _process_age_seconds() -> float | None:
+    """Segundos desde que arrancó el proceso (incluye intérprete y uvicorn); solo Linux."""
+    try:
+        with open("/proc/self/stat", encoding="ascii") as stat_file:
+            # El campo 22 (starttime) va después del nombre entre paréntesis
+            start_ticks = int(stat_file.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime", encoding="ascii") as uptime_file:
+            uptime = float(uptime_file.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        return None
+    return uptime - start_ticks / os.sysconf("SC_CLK_TCK")
+
+
+class StartupProfile:
+    def __init__(self):
+        self.phases: dict[str, float] = {}
+        self.process_age_at_ready: float | None = None
+        self.ready = False
+
+    @contextmanager
+    def phase(self, name: str):
+        """Mide la duración del bloque `with` como una fase del arranque."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = time.perf_counter() - started
+
+    def total_seconds(self) -> float:
+        return sum(self.phases.values())
+
+    def mark_ready(self) -> None:
+        self.ready = True
+        self.process_age_at_ready = _process_age_seconds()
+        log.info("Arranque completado en %.0f ms", self.total_seconds() * 1000, extra={"startup": self.stats()})
+
+    def stats(self) -> dict:
+        return {
+            "ready": self.ready,
+            "phases_ms": {name: round(seconds * 1000, 1) for name, seconds in self.phases.items()},
+            "total_ms": round(self.total_seconds() * 1000, 1),
+            "process_age_at_ready_ms": (
+                round(self.process_age_at_ready * 1000, 1) if self.process_age_at_ready is not None else None
+            ),
+        }
+
+
+startup_profile = StartupProfile()
+gauge("app_startup_seconds", "Duración del arranque (imports de app.main + lifespan)",
+      read=startup_profile.total_seconds)
@@ -0,0 +1,79 @@
+# app/services/streaming.py
+
+import json
+import re
+
+_REPLY_KEY_RE = re.compile(r'"reply"\s*:\s*"')
+_SIMPLE_ESCAPES = {
+    '"': '"', "\\": "\\", "/": "/",
+    "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t",
+}
+
+
+class ReplyFieldExtractor:
+    """
+    Extrae incrementalmente el valor del campo "reply" de la salida JSON-mode
+    del modelo mientras llega por fragmentos.
+
+    feed() devuelve solo el texto nuevo ya decodificado; los escapes partidos
+    entre fragmentos (p. ej. "\\u00" + "f3") se retienen hasta completarse.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self._pos = 0
+        self._in_reply = False
+        self.done = False
+
+    def feed(self, chunk: str) -> str:
+        self.buffer += chunk
+        if self.done:
+            return ""
+
+        if not self._in_reply:
+            match = _REPLY_KEY_RE.search(self.buffer, self._pos)
+            if match is None:
+                return ""
+            self._pos = match.end()
+            self._in_reply = True
+
+        out = []
+        buffer = self.buffer
+        pos = self._pos
+        while pos < len(buffer):
+            char = buffer[pos]
+            if char == '"':
+                self.done = True
+                pos += 1
+                break
+            if char != "\\":
+                out.append(char)
+                pos += 1
+                continue
+            # Secuencia de escape: puede estar incompleta
+            if pos + 1 >= len(buffer):
+                break
+            escape = buffer[pos + 1]
+            if escape == "u":
+                if pos + 6 > len(buffer):
+                    break
+                code = int(buffer[pos + 2:pos + 6], 16)
+                # Par sustituto (emoji, etc.): necesita los 12 caracteres
+                if 0xD800 <= code < 0xDC00:
+                    if pos + 12 > len(buffer):
+                        break
+                    out.append(json.loads(f'"{buffer[pos:pos + 12]}"'))
+                    pos += 12
+                else:
+                    out.append(chr(code))
+                    pos += 6
+            else:
+                out.append(_SIMPLE_ESCAPES.get(escape, escape))
+                pos += 2
+
+        self._pos = pos
+        return "".join(out)
+
+    def result(self) -> dict:
+        """Parsea la salida completa (al finalizar el stream)."""
+        return json.loads(self.buffer)
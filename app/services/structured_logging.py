@@ -0,0 +1,163 @@
+# app/services/structured_logging.py
+"""
+Logging estructurado (una línea JSON por evento) y no bloqueante:
+
+  - los módulos usan logging.getLogger(__name__) con argumentos %-style,
+    así el mensaje no se arma si el nivel está deshabilitado;
+  - el handler de la app solo encola el LogRecord (QueueHandler acotado:
+    si la cola se llena, el evento se descarta y se cuenta); un hilo
+    QueueListener formatea, redacta secretos y escribe en stdout;
+  - niveles por módulo: LOG_LEVEL=INFO, LOG_LEVELS="app.routers.chat=DEBUG,..."
+  - las líneas DEBUG por petición se muestrean con debug_sampled()
+    (LOG_DEBUG_SAMPLE_RATE).
+"""
+
+import datetime
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import re
+import sys
+
+# --- Configuración (variables de entorno) ---
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# Niveles por logger: "app.routers.chat=DEBUG,app.services.azure_client=WARNING"
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+# Fracción de líneas DEBUG por petición que se emiten (1 = todas)
+LOG_DEBUG_SAMPLE_RATE = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "0.01"))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+REDACTED = "[REDACTED]"
+# Claves de campos estructurados cuyo valor nunca se escribe: la palabra secreta cierra la
+# clave ("access_token", "client_secret"); "prompt_tokens" o "token_count" son métricas
+_SECRET_FIELD_RE = re.compile(r"(?:^|[_-])(?:api[_-]?key|secret|password|token|authorization)$", re.IGNORECASE)
+# Secretos embebidos en texto libre (mensajes de excepción del SDK, URLs, cabeceras)
+_SECRET_TEXT_PATTERNS = (
+    re.compile(r"(?i)(bearer)(\s+)[^\s\"',}]+"),
+    re.compile(r"(?i)(api[_-]?key|authorization|password|secret)([\"']?\s*[:=]\s*)(?!bearer\b)[\"']?[^\s\"',}]+[\"']?"),
+    re.compile(r"\bsk-[A-Za-z0-9_-]{16,}\b"),
+)
+# Campos estándar de LogRecord (lo demás se considera `extra`)
+_RECORD_FIELDS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+_ENV_SECRETS = ("AZURE_OPENAI_API_KEY",)
+
+
+def _known_secrets() -> list[str]:
+    return [value for name in _ENV_SECRETS if (value := os.getenv(name)) and len(value) >= 6]
+
+
+def redact_text(text: str) -> str:
+    for secret in _known_secrets():
+        text = text.replace(secret, REDACTED)
+    for pattern in _SECRET_TEXT_PATTERNS:
+        text = pattern.sub(lambda m: f"{m.group(1)}{m.group(2)}{REDACTED}" if m.lastindex else REDACTED, text)
+    return text
+
+
+def _redact_value(key: str, value):
+    if _SECRET_FIELD_RE.search(key):
+        return REDACTED
+    if isinstance(value, str):
+        return redact_text(value)
+    return value
+
+
+class JsonFormatter(logging.Formatter):
+    """LogRecord -> una línea JSON con ts, level, logger, msg y los campos `extra`."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": redact_text(record.getMessage()),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS and not key.startswith("_"):
+                entry[key] = _redact_value(key, value)
+        exc_text = record.exc_text or (self.formatException(record.exc_info) if record.exc_info else None)
+        if exc_text:
+            entry["exc"] = redact_text(exc_text)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler que no formatea en el hilo que loguea (el listener lo hace)
+    y que descarta el evento si la cola está llena en lugar de bloquear.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # El traceback se convierte a texto aquí para no retener los frames
+        # (y sus variables locales) hasta que el listener procese el evento
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_listener: logging.handlers.QueueListener | None = None
+queue_handler: DroppingQueueHandler | None = None
+
+
+def _parse_levels(spec: str) -> dict[str, str]:
+    levels = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, level = item.partition("=")
+        levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def setup_logging() -> None:
+    """Configura el logger raíz con la cola y arranca el listener (idempotente)."""
+    global _listener, queue_handler
+    if _listener is not None:
+        return
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(JsonFormatter())
+
+    queue_handler = DroppingQueueHandler(queue.Queue(maxsize=LOG_QUEUE_SIZE))
+    _listener = logging.handlers.QueueListener(queue_handler.queue, stream_handler, respect_handler_level=False)
+    _listener.start()
+
+    root = logging.getLogger()
+    root.handlers[:] = [queue_handler]
+    root.setLevel(LOG_LEVEL)
+    for name, level in _parse_levels(LOG_LEVELS).items():
+        logging.getLogger(name).setLevel(level)
+
+
+def shutdown_logging() -> None:
+    """Vacía la cola y detiene el listener (evento 'shutdown')."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def debug_sampled(logger: logging.Logger, msg: str, *args, **fields) -> None:
+    """
+    DEBUG por petición: se descarta sin formatear si el nivel está apagado y,
+    si está encendido, solo se emite una fracción LOG_DEBUG_SAMPLE_RATE.
+    """
+    if logger.isEnabledFor(logging.DEBUG) and random.random() < LOG_DEBUG_SAMPLE_RATE:
+        logger.debug(msg, *args, extra=fields)
+
+
+def dropped_events() -> int:
+    return queue_handler.dropped if queue_handler is not None else 0
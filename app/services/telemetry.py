@@ -0,0 +1,179 @@
+# app/services/telemetry.py
+
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable
+
+# Límites (en segundos) por defecto para histogramas de latencia
+DEFAULT_LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+
+
+class Histogram:
+    """
+    Histograma de buckets fijos: observe() es O(log n) y no guarda muestras,
+    así que el coste es constante sin importar el volumen de tráfico.
+    """
+
+    def __init__(self, name: str, description: str, buckets: tuple = DEFAULT_LATENCY_BUCKETS):
+        self.name = name
+        self.description = description
+        self.bounds = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.bounds) + 1)  # último bucket = +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float:
+        """Cuantil aproximado por interpolación lineal dentro del bucket."""
+        if self.count == 0:
+            return 0.0
+        target = q * self.count
+        cumulative = 0
+        lower = 0.0
+        for index, bucket_count in enumerate(self.counts):
+            upper = self.bounds[index] if index < len(self.bounds) else self.bounds[-1]
+            if bucket_count and cumulative + bucket_count >= target:
+                fraction = (target - cumulative) / bucket_count
+                return lower + (upper - lower) * fraction
+            cumulative += bucket_count
+            lower = upper
+        return self.bounds[-1]
+
+    @contextmanager
+    def time(self):
+        """Observa la duración del bloque `with` (en segundos)."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+    def snapshot(self) -> dict:
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "p50": round(self.quantile(0.50), 6),
+            "p95": round(self.quantile(0.95), 6),
+            "p99": round(self.quantile(0.99), 6),
+        }
+
+
+class Counter:
+    """Contador monótono con una etiqueta opcional (p. ej. context)."""
+
+    def __init__(self, name: str, description: str, label: str | None = None):
+        self.name = name
+        self.description = description
+        self.label = label
+        self.values: dict[str | None, float] = {}
+
+    def inc(self, label_value: str | None = None, amount: float = 1) -> None:
+        self.values[label_value] = self.values.get(label_value, 0) + amount
+
+
+class Gauge:
+    """
+    Valor instantáneo: se actualiza con inc()/dec() o, si se pasa `read`,
+    se calcula solo al exportar (sin coste en la ruta caliente).
+    """
+
+    def __init__(self, name: str, description: str, read: Callable[[], float] | None = None):
+        self.name = name
+        self.description = description
+        self.read = read
+        self.value = 0.0
+
+    def inc(self, amount: float = 1) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1) -> None:
+        self.value -= amount
+
+    @contextmanager
+    def track(self):
+        """Suma 1 mientras dura el bloque `with` (p. ej. llamadas en vuelo)."""
+        self.value += 1
+        try:
+            yield
+        finally:
+            self.value -= 1
+
+    def current(self) -> float:
+        return self.read() if self.read is not None else self.value
+
+
+# Registros globales (nombre -> métrica)
+HISTOGRAMS: dict[str, Histogram] = {}
+COUNTERS: dict[str, Counter] = {}
+GAUGES: dict[str, Gauge] = {}
+
+
+def histogram(name: str, description: str, buckets: tuple = DEFAULT_LATENCY_BUCKETS) -> Histogram:
+    """Devuelve el histograma registrado con ese nombre (lo crea si no existe)."""
+    if name not in HISTOGRAMS:
+        HISTOGRAMS[name] = Histogram(name, description, buckets)
+    return HISTOGRAMS[name]
+
+
+def counter(name: str, description: str, label: str | None = None) -> Counter:
+    if name not in COUNTERS:
+        COUNTERS[name] = Counter(name, description, label)
+    return COUNTERS[name]
+
+
+def gauge(name: str, description: str, read: Callable[[], float] | None = None) -> Gauge:
+    if name not in GAUGES:
+        GAUGES[name] = Gauge(name, description, read)
+    return GAUGES[name]
+
+
+def latency_snapshot() -> dict[str, dict]:
+    return {name: hist.snapshot() for name, hist in HISTOGRAMS.items()}
+
+
+# --- Exposición en formato de texto de Prometheus (versión 0.0.4) ---
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+def prometheus_text() -> str:
+    lines = []
+    for hist in HISTOGRAMS.values():
+        lines.append(f"# HELP {hist.name} {hist.description}")
+        lines.append(f"# TYPE {hist.name} histogram")
+        cumulative = 0
+        for bound, bucket_count in zip(hist.bounds, hist.counts):
+            cumulative += bucket_count
+            lines.append(f'{hist.name}_bucket{{le="{bound}"}} {cumulative}')
+        lines.append(f'{hist.name}_bucket{{le="+Inf"}} {hist.count}')
+        lines.append(f"{hist.name}_sum {hist.sum!r}")
+        lines.append(f"{hist.name}_count {hist.count}")
+
+    for metric in COUNTERS.values():
+        lines.append(f"# HELP {metric.name} {metric.description}")
+        lines.append(f"# TYPE {metric.name} counter")
+        for label_value, value in metric.values.items():
+            labels = f'{{{metric.label}="{_escape_label(str(label_value))}"}}' if metric.label else ""
+            lines.append(f"{metric.name}{labels} {_format_value(value)}")
+
+    for metric in GAUGES.values():
+        lines.append(f"# HELP {metric.name} {metric.description}")
+        lines.append(f"# TYPE {metric.name} gauge")
+        lines.append(f"{metric.name} {_format_value(metric.current())}")
+
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,431 @@
+# app/services/text_codec.py
+"""
+Compresión transparente de 'chat_interactions.message_text': deflate crudo
+(zlib sin cabecera) con un diccionario prefijado (zdict) entrenado con una
+muestra de los propios mensajes. Las respuestas repiten mucho vocabulario
+y frases de una a otra, pero cada una es corta: sin diccionario deflate no
+tiene de dónde sacar referencias; con él, un mensaje de 150 palabras baja
+a una fracción de su tamaño.
+
+  - Formato: TEXT (filas anteriores a la compresión, se leen tal cual) o
+    BLOB = versión del diccionario (2 bytes, big endian) + deflate crudo.
+    La versión 0 es "sin comprimir" (UTF-8), para los mensajes en los
+    que deflate no achica.
+  - Los diccionarios se guardan versionados en 'chat_text_dictionaries';
+    las escrituras usan la versión más nueva y las lecturas la que dice
+    cada valor. Se cargan solo en start() (y cada
+    TEXT_CODEC_REFRESH_SECONDS) y en train/migrate, nunca dentro de la
+    columna: en el loop, leer una versión que el proceso no conoce
+    (entrenada por otro proceso) falla con UnknownDictionaryError y
+    agenda un refresco en un hilo; la lectura siguiente ya la encuentra.
+  - Sin diccionario cargado se sigue escribiendo TEXT: nada cambia hasta
+    correr 'train'.
+  - La compresión de las escrituras del chat corre en un hilo
+    (encode_all): la columna recibe los bytes ya codificados.
+  - Migración en línea de las filas existentes: lotes de
+    TEXT_CODEC_MIGRATE_BATCH_ROWS por id, cada uno en su propia
+    transacción de escritura (como la rotación del archivo) abierta con
+    BEGIN IMMEDIATE: el lock de escritura del proceso no cubre al
+    servidor, el lock del archivo sí (el servidor espera cada lote en
+    busy_timeout). Solo toca la tabla viva; las particiones archivadas
+    leen cualquier formato. SQLite reutiliza las páginas liberadas; para
+    achicar el archivo, VACUUM. Con el servidor corriendo, migrar con una
+    versión que el servidor ya cargó ('train' y esperar un refresco); si
+    no, sus lecturas de las filas recodificadas fallan hasta que refresca.
+
+Uso:
+    python -m app.services.text_codec status
+    python -m app.services.text_codec train     # nueva versión con las filas recientes
+    python -m app.services.text_codec migrate   # recodifica con la versión más nueva (entrena si no hay)
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import time
+import zlib
+from collections import Counter
+
+from sqlalchemy import String, and_, bindparam, cast, func, insert, literal, or_, select, update
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.types import LargeBinary, TypeDecorator
+
+from app.database import async_engine, engine, write_transaction
+from app.models.text_dictionaries import TextDictionary
+
+log = logging.getLogger(__name__)
+
+# --- Configuración (variables de entorno) ---
+# 0 = las escrituras nuevas quedan en TEXT (lo comprimido se sigue leyendo)
+TEXT_CODEC_ENABLED = os.getenv("TEXT_CODEC_ENABLED", "1") == "1"
+TEXT_CODEC_LEVEL = int(os.getenv("TEXT_CODEC_LEVEL", "6"))
+# Tamaño del diccionario (máximo 32 KiB, la ventana de deflate). Cargarlo es
+# la mayor parte del costo de comprimir un mensaje corto: 16 KiB es el punto medio
+TEXT_CODEC_DICT_BYTES = min(int(os.getenv("TEXT_CODEC_DICT_BYTES", "16384")), 32768)
+# Filas más recientes con las que se entrena; con menos no se entrena
+TEXT_CODEC_SAMPLE_ROWS = int(os.getenv("TEXT_CODEC_SAMPLE_ROWS", "5000"))
+TEXT_CODEC_MIN_SAMPLE_ROWS = int(os.getenv("TEXT_CODEC_MIN_SAMPLE_ROWS", "50"))
+TEXT_CODEC_MIGRATE_BATCH_ROWS = int(os.getenv("TEXT_CODEC_MIGRATE_BATCH_ROWS", "500"))
+# Cada cuánto se buscan versiones nuevas en la base (0 = solo al arrancar)
+TEXT_CODEC_REFRESH_SECONDS = float(os.getenv("TEXT_CODEC_REFRESH_SECONDS", "60"))
+
+STORED_VERSION = 0
+_HEADER_BYTES = 2
+# Frases candidatas al diccionario: secuencias de 2, 4 y 8 palabras
+_NGRAM_WORDS = (2, 4, 8)
+
+
+def _header(version: int) -> bytes:
+    return version.to_bytes(_HEADER_BYTES, "big")
+
+
+def _window_bits(dictionary: bytes) -> int:
+    # Ventana justa para el diccionario: con menos bits deflate inicializa menos memoria
+    return max(9, min(15, (len(dictionary) - 1).bit_length()))
+
+
+def _interactions_table():
+    # Importación diferida: app.models.interactions importa este módulo (CompressedText)
+    from app.models.interactions import ChatInteraction
+    return ChatInteraction.__table__
+
+
+class UnknownDictionaryError(LookupError):
+    """El valor está comprimido con una versión de diccionario que el proceso no tiene cargada."""
+
+
+def train_dictionary(samples: list[str], size: int = TEXT_CODEC_DICT_BYTES) -> bytes:
+    """
+    Diccionario de hasta `size` bytes con las frases que más bytes ahorran:
+    puntaje = (mensajes que la contienen - 1) * largo. Se descartan las que ya
+    están dentro de una elegida. Las mejores quedan al final, donde deflate
+    las alcanza con distancias más cortas.
+    """
+    counts: Counter[str] = Counter()
+    for text in samples:
+        words = text.split(" ")
+        # Una vez por mensaje: cuenta en cuántos aparece, no cuántas veces
+        counts.update({
+            " ".join(words[i:i + n])
+            for n in _NGRAM_WORDS
+            for i in range(len(words) - n + 1)
+        })
+
+    ranked = sorted(
+        ((frequency - 1) * len(phrase.encode("utf-8")), phrase)
+        for phrase, frequency in counts.items()
+        if frequency > 1
+    )
+    chosen: list[str] = []
+    chosen_text = ""
+    total = 0
+    while ranked and total < size:
+        _, phrase = ranked.pop()
+        if phrase in chosen_text:
+            continue
+        chosen.append(phrase)
+        chosen_text += "\x00" + phrase
+        total += len(phrase.encode("utf-8")) + 1
+    return " ".join(reversed(chosen)).encode("utf-8")[-size:]
+
+
+class TextCodec:
+    """Versiones de diccionario cargadas y codificación/decodificación de los valores de la columna."""
+
+    def __init__(self, enabled: bool, level: int, dict_bytes: int, sample_rows: int, min_sample_rows: int,
+                 migrate_batch_rows: int, refresh_seconds: float):
+        self.enabled = enabled
+        self.level = level
+        self.dict_bytes = dict_bytes
+        self.sample_rows = sample_rows
+        self.min_sample_rows = min_sample_rows
+        self.migrate_batch_rows = migrate_batch_rows
+        self.refresh_seconds = refresh_seconds
+
+        self._dictionaries: dict[int, bytes] = {}
+        # (versión, diccionario, bits de ventana) con el que se escribe
+        self._current: tuple[int, bytes, int] | None = None
+        self._refreshed = False
+        self._task: asyncio.Task | None = None
+        self._pending_refresh: asyncio.Task | None = None
+
+        self.encoded = 0
+        self.stored_plain = 0
+        self.raw_bytes = 0
+        self.encoded_bytes = 0
+        self.decoded = 0
+        self.migrated_rows = 0
+
+    @property
+    def current_version(self) -> int | None:
+        return self._current[0] if self._current is not None else None
+
+    # --- Versiones ---
+
+    def refresh(self) -> None:
+        """Carga las versiones nuevas de la base (síncrono: en un hilo o fuera del loop)."""
+        self._refreshed = True
+        known = max(self._dictionaries, default=STORED_VERSION)
+        try:
+            with engine.connect() as conn:
+                rows = conn.execute(
+                    select(TextDictionary.version, TextDictionary.dictionary)
+                    .where(TextDictionary.version > known)
+                    .order_by(TextDictionary.version)
+                ).all()
+        except OperationalError:
+            # Base sin migrar todavía (sin la tabla): se sigue escribiendo TEXT
+            return
+        for version, dictionary in rows:
+            self._dictionaries[version] = dictionary
+            self._current = (version, dictionary, _window_bits(dictionary))
+            log.info("Diccionario de compresión cargado", extra={"version": version, "bytes": len(dictionary)})
+
+    def _dictionary(self, version: int) -> bytes:
+        dictionary = self._dictionaries.get(version)
+        if dictionary is not None:
+            return dictionary
+        # Escrita por otro proceso con una versión más nueva
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Fuera del loop (CLI, motor síncrono en un hilo): se puede leer la base acá mismo
+            self.refresh()
+        else:
+            if self._pending_refresh is None or self._pending_refresh.done():
+                self._pending_refresh = loop.create_task(asyncio.to_thread(self.refresh), name="text-codec-refresh-now")
+        dictionary = self._dictionaries.get(version)
+        if dictionary is None:
+            raise UnknownDictionaryError(f"Diccionario de compresión v{version} no cargado")
+        return dictionary
+
+    # --- Codificación ---
+
+    def encode(self, text: str | None) -> str | bytes | None:
+        if text is None or not self.enabled or self._current is None:
+            return text
+
+        version, dictionary, wbits = self._current
+        raw = text.encode("utf-8")
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, -wbits, zdict=dictionary)
+        packed = compressor.compress(raw) + compressor.flush()
+        if len(packed) < len(raw):
+            value = _header(version) + packed
+        else:
+            value = _header(STORED_VERSION) + raw
+            self.stored_plain += 1
+        self.encoded += 1
+        self.raw_bytes += len(raw)
+        self.encoded_bytes += len(value)
+        return value
+
+    async def encode_all(self, texts: list[str | None]) -> list[str | bytes | None]:
+        """encode() de varios valores en un hilo: deflate con diccionario no corre en el loop."""
+        if not self.enabled or self._current is None:
+            return texts
+        return await asyncio.to_thread(lambda: [self.encode(text) for text in texts])
+
+    def decode(self, value: str | bytes | None) -> str | None:
+        if value is None or isinstance(value, str):
+            return value
+        self.decoded += 1
+        version = int.from_bytes(value[:_HEADER_BYTES], "big")
+        if version == STORED_VERSION:
+            return value[_HEADER_BYTES:].decode("utf-8")
+        # Ventana máxima al leer: vale para cualquier ventana usada al escribir
+        decompressor = zlib.decompressobj(-15, zdict=self._dictionary(version))
+        return (decompressor.decompress(value[_HEADER_BYTES:]) + decompressor.flush()).decode("utf-8")
+
+    # --- Entrenamiento y migración ---
+
+    async def train(self) -> int | None:
+        """Entrena con las filas más recientes y guarda una versión nueva; None si la muestra no alcanza."""
+        table = _interactions_table()
+        async with async_engine.connect() as conn:
+            samples = (await conn.execute(
+                select(table.c.message_text)
+                .where(table.c.message_text.is_not(None))
+                .order_by(table.c.id.desc())
+                .limit(self.sample_rows)
+            )).scalars().all()
+        if len(samples) < self.min_sample_rows:
+            log.warning("Muestra insuficiente para entrenar el diccionario", extra={"rows": len(samples)})
+            return None
+
+        dictionary = await asyncio.to_thread(train_dictionary, samples, self.dict_bytes)
+        async with write_transaction() as conn:
+            version = (await conn.execute(select(func.max(TextDictionary.version)))).scalar() or STORED_VERSION
+            version += 1
+            await conn.execute(insert(TextDictionary).values(
+                version=version, dictionary=dictionary, sample_rows=len(samples)))
+        await asyncio.to_thread(self.refresh)
+        log.info("Diccionario de compresión entrenado",
+                 extra={"version": version, "bytes": len(dictionary), "sample_rows": len(samples)})
+        return version
+
+    async def migrate(self) -> int:
+        """Recodifica con la versión actual las filas en TEXT o en versiones anteriores; devuelve cuántas."""
+        if not self._refreshed:
+            await asyncio.to_thread(self.refresh)
+        if self._current is None or not self.enabled:
+            return 0
+
+        table = _interactions_table()
+        column = table.c.message_text
+        prefix = func.substr(column, 1, _HEADER_BYTES)
+        outdated = or_(
+            func.typeof(column) == "text",
+            and_(prefix != literal(_header(self.current_version), LargeBinary),
+                 prefix != literal(_header(STORED_VERSION), LargeBinary)),
+        )
+        statement = (
+            update(table)
+            .where(table.c.id == bindparam("row_id"))
+            .values(message_text=bindparam("text", type_=column.type))
+        )
+
+        migrated = 0
+        last_id = 0
+        while True:
+            async with write_transaction() as conn:
+                # Lock del archivo desde la lectura: otro proceso (el servidor) no escribe entre SELECT y UPDATE
+                await conn.exec_driver_sql("BEGIN IMMEDIATE")
+                rows = (await conn.execute(
+                    select(table.c.id, column)
+                    .where(table.c.id > last_id, column.is_not(None), outdated)
+                    .order_by(table.c.id)
+                    .limit(self.migrate_batch_rows)
+                )).all()
+                if not rows:
+                    break
+                encoded = await self.encode_all([text for _, text in rows])
+                await conn.execute(statement, [{"row_id": row[0], "text": value} for row, value in zip(rows, encoded)])
+            last_id = rows[-1][0]
+            migrated += len(rows)
+            self.migrated_rows += len(rows)
+            # Entre lotes se suelta el lock: las escrituras del chat pasan
+            await asyncio.sleep(0)
+        return migrated
+
+    # --- Refresco periódico ---
+
+    async def start(self) -> None:
+        await asyncio.to_thread(self.refresh)
+        if self._task is None and self.refresh_seconds > 0:
+            self._task = asyncio.create_task(self._run(), name="text-codec-refresh")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.refresh_seconds)
+            try:
+                await asyncio.to_thread(self.refresh)
+            except Exception:
+                log.exception("Fallo al refrescar los diccionarios de compresión")
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "level": self.level,
+            "current_version": self.current_version,
+            "dictionaries": len(self._dictionaries),
+            "dictionary_bytes": len(self._current[1]) if self._current is not None else 0,
+            "encoded": self.encoded,
+            "stored_plain": self.stored_plain,
+            "raw_bytes": self.raw_bytes,
+            "encoded_bytes": self.encoded_bytes,
+            "ratio": round(self.encoded_bytes / self.raw_bytes, 4) if self.raw_bytes else None,
+            "decoded": self.decoded,
+            "migrated_rows": self.migrated_rows,
+        }
+
+
+text_codec = TextCodec(
+    enabled=TEXT_CODEC_ENABLED,
+    level=TEXT_CODEC_LEVEL,
+    dict_bytes=TEXT_CODEC_DICT_BYTES,
+    sample_rows=TEXT_CODEC_SAMPLE_ROWS,
+    min_sample_rows=TEXT_CODEC_MIN_SAMPLE_ROWS,
+    migrate_batch_rows=TEXT_CODEC_MIGRATE_BATCH_ROWS,
+    refresh_seconds=TEXT_CODEC_REFRESH_SECONDS,
+)
+
+
+class CompressedText(TypeDecorator):
+    """
+    Columna de texto guardada con text_codec. Para el resto del código es un
+    String: inserts, updates y selects (ORM o Core) reciben y devuelven str.
+    """
+    impl = String
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        # bytes: ya codificado con text_codec.encode_all (fuera del loop)
+        if isinstance(value, bytes):
+            return value
+        return text_codec.encode(value)
+
+    def process_result_value(self, value, dialect):
+        return text_codec.decode(value)
+
+
+async def _encoding_breakdown() -> list[tuple]:
+    """(formato, filas, bytes) de la tabla viva: 'text' o la versión de cada BLOB."""
+    table = _interactions_table()
+    column = table.c.message_text
+    kind = func.iif(func.typeof(column) == "blob", func.hex(func.substr(column, 1, _HEADER_BYTES)), func.typeof(column))
+    async with async_engine.connect() as conn:
+        rows = (await conn.execute(
+            select(kind, func.count(), func.sum(func.length(cast(column, LargeBinary))))
+            .select_from(table)
+            .group_by(kind)
+        )).all()
+    return [
+        (f"v{int(value, 16)}" if value not in ("text", "null") else value, count, total or 0)
+        for value, count, total in rows
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["status", "train", "migrate"])
+    args = parser.parse_args()
+    # Con `python -m` este módulo es __main__: la columna usa la instancia del módulo importado
+    from app.services.text_codec import text_codec
+
+    async def run() -> None:
+        try:
+            if args.command == "train":
+                version = await text_codec.train()
+                print("Muestra insuficiente: no se entrenó." if version is None else f"Diccionario v{version} entrenado.")
+            elif args.command == "migrate":
+                await asyncio.to_thread(text_codec.refresh)
+                if text_codec.current_version is None:
+                    await text_codec.train()
+                started = time.perf_counter()
+                migrated = await text_codec.migrate()
+                print(f"{migrated} filas recodificadas con v{text_codec.current_version} "
+                      f"({time.perf_counter() - started:.1f}s).")
+            else:
+                await asyncio.to_thread(text_codec.refresh)
+            print(f"Versión de escritura: {text_codec.current_version or 'ninguna (TEXT)'}")
+            for kind, count, total in await _encoding_breakdown():
+                print(f"{kind:>6}  {count:>10} filas  {total:>14} bytes")
+        finally:
+            await async_engine.dispose()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
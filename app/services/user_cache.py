@@ -0,0 +1,51 @@
+# app/services/user_cache.py
+
+import os
+from collections import OrderedDict
+
+# Máximo de sesiones recordadas (session_id -> users.id)
+SESSION_USER_CACHE_SIZE = int(os.getenv("SESSION_USER_CACHE_SIZE", "50000"))
+
+
+class SessionUserCache:
+    """
+    Mapa LRU acotado session_id -> users.id. El id de una sesión nunca
+    cambia, así que no hace falta expiración: solo desalojo por tamaño.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, int] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, session_id: str) -> int | None:
+        user_id = self._entries.get(session_id)
+        if user_id is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(session_id)
+        self.hits += 1
+        return user_id
+
+    def update(self, mapping: dict[str, int]) -> None:
+        """Registrar ids ya confirmados (llamar solo después del commit)."""
+        for session_id, user_id in mapping.items():
+            self._entries[session_id] = user_id
+            self._entries.move_to_end(session_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+session_users = SessionUserCache(SESSION_USER_CACHE_SIZE)
@@ -0,0 +1,124 @@
+# app/services/write_behind.py
+
+import asyncio
+import logging
+import os
+import time
+
+from app.services.interaction_store import InteractionPair, persist_pairs
+
+log = logging.getLogger(__name__)
+
+# --- Configuración (variables de entorno) ---
+# Modo write-behind: los pares USER/BOT se encolan y un flusher en segundo
+# plano los inserta por lotes en una sola transacción.
+WRITE_BEHIND_ENABLED = os.getenv("CHAT_WRITE_BEHIND", "0") == "1"
+# Flush cada N pares o cada M milisegundos (lo que ocurra primero)
+WRITE_BEHIND_BATCH_SIZE = int(os.getenv("WRITE_BEHIND_BATCH_SIZE", "256"))
+WRITE_BEHIND_FLUSH_MS = float(os.getenv("WRITE_BEHIND_FLUSH_MS", "50"))
+# Cola acotada: cuando se llena, submit() espera (backpressure)
+WRITE_BEHIND_QUEUE_SIZE = int(os.getenv("WRITE_BEHIND_QUEUE_SIZE", "10000"))
+# Durabilidad: "flush" = responder tras el commit del lote,
+#              "enqueue" = responder en cuanto el par está en la cola
+WRITE_BEHIND_ACK = os.getenv("WRITE_BEHIND_ACK", "flush")
+
+ACK_AFTER_FLUSH = "flush"
+ACK_AFTER_ENQUEUE = "enqueue"
+
+
+class WriteBehindQueue:
+    """Cola asyncio + tarea flusher que persiste los pares por lotes."""
+
+    def __init__(self, batch_size: int, flush_ms: float, max_queue: int, ack: str):
+        if ack not in (ACK_AFTER_FLUSH, ACK_AFTER_ENQUEUE):
+            raise ValueError(f"WRITE_BEHIND_ACK inválido: {ack!r}")
+        self.batch_size = batch_size
+        self.flush_seconds = flush_ms / 1000.0
+        self.max_queue = max_queue
+        self.ack = ack
+
+        self._queue: asyncio.Queue | None = None
+        self._flusher: asyncio.Task | None = None
+        self._closing = False
+
+    @property
+    def running(self) -> bool:
+        return self._flusher is not None
+
+    async def start(self) -> None:
+        if self._flusher is not None:
+            return
+        self._closing = False
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._flusher = asyncio.create_task(self._run(), name="write-behind-flusher")
+
+    async def submit(self, pair: InteractionPair) -> None:
+        """Encola el par; según la durabilidad espera o no al commit del lote."""
+        if self._closing or self._queue is None:
+            raise RuntimeError("La cola write-behind no está activa.")
+
+        future = asyncio.get_running_loop().create_future() if self.ack == ACK_AFTER_FLUSH else None
+        await self._queue.put((pair, future))
+        if future is not None:
+            # shield: si el cliente se va, el par igualmente se persiste
+            await asyncio.shield(future)
+
+    async def drain(self) -> None:
+        """Cierre ordenado (evento 'shutdown'): vacía la cola y detiene el flusher."""
+        if self._flusher is None:
+            return
+        self._closing = True
+        await self._queue.put(None) # centinela
+        await self._flusher
+        self._flusher = None
+        self._queue = None
+
+    async def _next_batch(self) -> tuple[list, bool]:
+        """Espera el primer elemento y junta hasta batch_size o hasta el plazo."""
+        first = await self._queue.get()
+        if first is None:
+            return [], True
+
+        batch = [first]
+        deadline = time.monotonic() + self.flush_seconds
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(self._queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    async def _run(self) -> None:
+        stop = False
+        while not stop:
+            batch, stop = await self._next_batch()
+            if batch:
+                await self._flush(batch)
+
+    async def _flush(self, batch: list) -> None:
+        try:
+            await persist_pairs([pair for pair, _ in batch])
+        except Exception as e:
+            log.error("Fallo al persistir lote write-behind. Rollback ejecutado: %s", e, extra={"batch_size": len(batch)})
+            for _, future in batch:
+                if future is not None and not future.done():
+                    future.set_exception(e)
+            return
+
+        for _, future in batch:
+            if future is not None and not future.done():
+                future.set_result(None)
+
+
+write_behind = WriteBehindQueue(
+    batch_size=WRITE_BEHIND_BATCH_SIZE,
+    flush_ms=WRITE_BEHIND_FLUSH_MS,
+    max_queue=WRITE_BEHIND_QUEUE_SIZE,
+    ack=WRITE_BEHIND_ACK,
+)
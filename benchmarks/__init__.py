@@ -0,0 +1 @@
+# Benchmarks y pruebas de carga (servidor Azure falso, arnés y escenarios)
@@ -0,0 +1,111 @@
+# benchmarks/admission.py
+"""
+Control de admisión (app/services/admission.py) contra el Azure falso:
+
+  - flood: una sesión manda el 90% de las peticiones y el resto llega de
+    sesiones normales. Con y sin límite por sesión: latencia de las
+    sesiones normales y cuántas peticiones de la sesión abusiva reciben 429;
+  - overload: más peticiones concurrentes de las que Azure atiende
+    (AZURE_OPENAI_MAX_CONCURRENCY bajo). Sin tope de pendientes todo se
+    encola; con tope, el excedente recibe 429 en pocos milisegundos.
+
+Uso:
+    python -m benchmarks.admission --requests 400 --latency-ms 200
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import httpx
+
+from benchmarks.harness import adgenie_app, fake_azure, percentile
+
+FLOOD_SESSION = "flood"
+
+
+def _summary(latencies: list[float]) -> dict:
+    if not latencies:
+        return {"count": 0}
+    return {
+        "count": len(latencies),
+        "p50_ms": round(statistics.median(latencies) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+    }
+
+
+async def _load(app_url: str, total: int, concurrency: int, session_for) -> dict:
+    """Como harness.run_load, pero separa latencias por clase de sesión y por estado."""
+    samples: dict[str, dict[str, list[float]]] = {}
+    counter = iter(range(total))
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=app_url, timeout=120.0, limits=limits) as client:
+
+        async def worker():
+            for i in counter:
+                session_id = session_for(i)
+                kind = "flood" if session_id == FLOOD_SESSION else "normal"
+                started = time.perf_counter()
+                response = await client.post("/chat/message", json={
+                    # Preguntas distintas: ninguna sale de la caché
+                    "message": f"Pregunta {i}: ¿qué presupuesto asigno al grupo {i}?",
+                    "session_id": session_id,
+                })
+                status = "ok" if response.status_code == 200 else str(response.status_code)
+                samples.setdefault(kind, {}).setdefault(status, []).append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    result = {"elapsed_s": round(elapsed, 2)}
+    for kind, by_status in sorted(samples.items()):
+        result[kind] = {status: _summary(latencies) for status, latencies in sorted(by_status.items())}
+    result["admission"] = httpx.get(f"{app_url}/metrics/admission").json()
+    return result
+
+
+def _run(azure_url: str, env: dict, total: int, concurrency: int, session_for) -> dict:
+    env = {"NEAR_DUP_ENABLED": "0", **env}
+    with adgenie_app(azure_url, env=env) as app_url:
+        return asyncio.run(_load(app_url, total, concurrency, session_for))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--latency-ms", type=float, default=200.0)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--azure-concurrency", type=int, default=8)
+    parser.add_argument("--max-pending", type=int, default=16)
+    args = parser.parse_args()
+
+    def flood_session(i: int) -> str:
+        return f"normal-{i}" if i % 10 == 0 else FLOOD_SESSION
+
+    def distinct_session(i: int) -> str:
+        return f"user-{i}"
+
+    azure = {"AZURE_OPENAI_MAX_CONCURRENCY": str(args.azure_concurrency)}
+    with fake_azure(latency_ms=args.latency_ms) as azure_url:
+        results = {
+            "flood_unlimited": _run(azure_url, {**azure, "ADMISSION_MAX_PENDING": "0"},
+                                    args.requests, args.concurrency, flood_session),
+            "flood_limited": _run(azure_url, {**azure, "ADMISSION_MAX_PENDING": "0",
+                                              "ADMISSION_SESSION_RATE": "2", "ADMISSION_SESSION_BURST": "20"},
+                                  args.requests, args.concurrency, flood_session),
+            "overload_queue": _run(azure_url, {**azure, "ADMISSION_MAX_PENDING": "0"},
+                                   args.requests, args.concurrency, distinct_session),
+            "overload_shed": _run(azure_url, {**azure, "ADMISSION_MAX_PENDING": str(args.max_pending)},
+                                  args.requests, args.concurrency, distinct_session),
+        }
+
+    print(json.dumps(results, indent=2))
+    for name, result in results.items():
+        assert result["admission"]["pending"] == 0, f"{name}: quedaron lugares pendientes sin liberar"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+# benchmarks/archive.py
+"""
+Archivo por meses (app.services.archive): latencia de las escrituras del
+chat sin rotación y durante una rotación en línea, y costo de consultas
+recientes (solo tabla viva) vs. rangos que llegan a particiones.
+
+Uso:
+    python -m benchmarks.archive --rows 1000000 --days 400
+    python -m benchmarks.archive --batch-rows 500 --reuse
+"""
+
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import shutil
+import statistics
+import tempfile
+import time
+
+from benchmarks.harness import percentile
+from benchmarks.seed import seed_interactions
+
+
+async def _write_latencies(duration: float | None, until: asyncio.Event | None = None) -> list[float]:
+    """Un escritor tipo chat: un par por iteración, durante `duration` segundos o hasta `until`."""
+    from app.services.interaction_store import InteractionPair, persist_pairs
+
+    latencies = []
+    deadline = time.monotonic() + duration if duration is not None else None
+    while (deadline is None or time.monotonic() < deadline) and not (until is not None and until.is_set()):
+        started = time.perf_counter()
+        await persist_pairs([InteractionPair(
+            session_id="bench-archive", user_message="hola", bot_reply="¡Hola!",
+            context="GENERAL_INQUIRY", created_at=datetime.datetime.utcnow(),
+        )])
+        latencies.append(time.perf_counter() - started)
+        await asyncio.sleep(0.005)
+    return latencies
+
+
+def _summary(latencies: list[float]) -> dict:
+    return {
+        "writes": len(latencies),
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "max_ms": round(max(latencies) * 1000, 2),
+    }
+
+
+async def _timed_range(start, end, bucket, repeat: int = 5) -> float:
+    from app.services import metrics_rollups
+
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await metrics_rollups.count_range(start, end, bucket)
+        samples.append(time.perf_counter() - started)
+    return round(statistics.median(samples) * 1000, 3)
+
+
+async def _queries() -> dict:
+    from app.services import metrics_rollups
+
+    now = datetime.datetime.utcnow()
+    minute = metrics_rollups.BUCKET_SIZES["minute"]
+    return {
+        "last_15m_by_minute_ms": await _timed_range(now - datetime.timedelta(minutes=15), now, minute),
+        "day_300d_ago_by_minute_ms": await _timed_range(
+            now - datetime.timedelta(days=300, hours=12), now - datetime.timedelta(days=299, hours=12), minute),
+    }
+
+
+async def _run(batch_rows: int) -> dict:
+    from app.database import async_engine
+    from app.services import schema
+    from app.services.archive import archive_rotator
+
+    schema.ensure_schema()
+    archive_rotator.batch_rows = batch_rows
+    result = {"batch_rows": batch_rows, "queries_before": await _queries()}
+    result["writes_idle"] = _summary(await _write_latencies(3.0))
+
+    done = asyncio.Event()
+    writer = asyncio.create_task(_write_latencies(None, until=done))
+    started = time.perf_counter()
+    moved = await archive_rotator.rotate()
+    result["rotation"] = {"rows_moved": moved, "seconds": round(time.perf_counter() - started, 2),
+                          "partitions": len(await archive_rotator.partitions())}
+    done.set()
+    result["writes_during_rotation"] = _summary(await writer)
+    result["queries_after"] = await _queries()
+    await async_engine.dispose()
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed-db", default=os.path.join(tempfile.gettempdir(), "adgenie_bench_archive_seed.db"))
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--days", type=int, default=400)
+    parser.add_argument("--batch-rows", type=int, default=500)
+    parser.add_argument("--reuse", action="store_true", help="no volver a sembrar si la base existe")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # app.database lee ADGENIE_DB_PATH al importarse (también al sembrar):
+        # se apunta a la copia antes de importar nada de la app
+        db_path = os.path.join(tmp, "archive.db")
+        os.environ["ADGENIE_DB_PATH"] = db_path
+        os.environ["ARCHIVE_DIR"] = os.path.join(tmp, "parts")
+
+        if not (args.reuse and os.path.exists(args.seed_db)):
+            print(f"Sembrando {args.rows} filas en {args.seed_db} ({args.days} días)...")
+            print(f"  listo en {seed_interactions(args.seed_db, args.rows, days=args.days):.1f}s")
+        # Cada corrida rota una copia de la base sembrada
+        shutil.copy(args.seed_db, db_path)
+        print(json.dumps(asyncio.run(_run(args.batch_rows)), indent=2))
+
+if __name__ == "__main__":
+    main()
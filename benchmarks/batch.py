@@ -0,0 +1,96 @@
+# benchmarks/batch.py
+"""
+Auditoría de campañas: N preguntas distintas enviadas una por una a
+/chat/message (como hoy), en paralelo a /chat/message, y en una sola
+petición a /chat/batch. Informa el tiempo total, las filas persistidas y
+las transacciones de escritura (muestras de db_commit_seconds).
+
+Uso:
+    python -m benchmarks.batch --items 300 --latency-ms 50 --concurrency 16
+"""
+
+import argparse
+import asyncio
+import json
+import re
+import time
+
+import httpx
+
+from benchmarks.harness import adgenie_app, fake_azure, run_load
+
+SESSIONS = 20
+
+
+def _item(i: int) -> dict:
+    # Preguntas distintas: ninguna sale de la caché de respuestas
+    return {"message": f"Auditoría campaña {i}: ¿cómo mejoro el CTR del grupo {i}?",
+            "session_id": f"audit-{i % SESSIONS}"}
+
+
+def _commits(app_url: str) -> int:
+    text = httpx.get(f"{app_url}/metrics/prometheus").text
+    match = re.search(r"^db_commit_seconds_count (\d+)", text, re.MULTILINE)
+    return int(match.group(1)) if match else 0
+
+
+def _summary(app_url: str, result: dict) -> dict:
+    result["persisted_interactions"] = httpx.get(f"{app_url}/metrics/summary").json()["total_interactions"]
+    result["commits"] = _commits(app_url)
+    return result
+
+
+def _run_messages(azure_url: str, items: int, concurrency: int) -> dict:
+    async def send(client, i):
+        return await client.post("/chat/message", json=_item(i))
+
+    with adgenie_app(azure_url) as app_url:
+        result = asyncio.run(run_load(app_url, send, concurrency, items))
+        return _summary(app_url, {"elapsed_s": result["elapsed_s"], "errors": result["errors"]})
+
+
+def _run_batch(azure_url: str, items: int, concurrency: int, stream: bool) -> dict:
+    env = {"CHAT_BATCH_CONCURRENCY": str(concurrency)}
+    with adgenie_app(azure_url, env=env) as app_url:
+        started = time.perf_counter()
+        first_result = None
+        with httpx.Client(base_url=app_url, timeout=600.0) as client:
+            if stream:
+                with client.stream("POST", "/chat/batch", params={"stream": "true"},
+                                   json=[_item(i) for i in range(items)]) as response:
+                    lines = []
+                    for line in response.iter_lines():
+                        if first_result is None:
+                            first_result = time.perf_counter() - started
+                        lines.append(json.loads(line))
+                failed = lines[-1]["failed"]
+            else:
+                failed = client.post("/chat/batch", json=[_item(i) for i in range(items)]).json()["failed"]
+        result = {"elapsed_s": round(time.perf_counter() - started, 3), "errors": failed}
+        if first_result is not None:
+            result["first_result_ms"] = round(first_result * 1000, 1)
+        return _summary(app_url, result)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=300)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    with fake_azure(latency_ms=args.latency_ms) as azure_url:
+        results = {
+            "message_sequential": _run_messages(azure_url, args.items, 1),
+            "message_concurrent": _run_messages(azure_url, args.items, args.concurrency),
+            "batch": _run_batch(azure_url, args.items, args.concurrency, stream=False),
+            "batch_stream": _run_batch(azure_url, args.items, args.concurrency, stream=True),
+        }
+
+    print(json.dumps(results, indent=2))
+    for name, result in results.items():
+        assert result["persisted_interactions"] == 2 * args.items, f"{name}: faltan filas persistidas"
+
+
+if __name__ == "__main__":
+    main()
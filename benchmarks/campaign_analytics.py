@@ -0,0 +1,186 @@
+# benchmarks/campaign_analytics.py
+"""
+Analítica de campañas en columnas de NumPy (app/services/campaign_analytics.py)
+contra el GROUP BY equivalente en SQLite, sobre --campaigns campañas con
+--days días de métricas cada una:
+
+  - load: carga de la tabla a columnas (lo que cuesta cada invalidación)
+    y memoria que ocupan;
+  - por ventana (--windows, en días): tabla por campaña con la variación
+    contra el período anterior (/metrics/campaigns), movers de ROAS y
+    resumen con serie diaria; p50/p99 de --queries consultas con 'end'
+    al azar. La referencia SQL es un único GROUP BY por campaign_id sobre
+    [anterior, end) con CASE por período y las razones en SQL (ordenado y
+    con LIMIT); para el resumen, un GROUP BY por día y los totales del
+    período anterior.
+
+Uso:
+    python -m benchmarks.campaign_analytics --campaigns 5000 --days 400
+"""
+
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from benchmarks.harness import percentile
+
+START = datetime.date(2025, 1, 1)
+
+SQL_BY_CAMPAIGN = """
+SELECT campaign_id,
+       sum(CASE WHEN date >= :start THEN impressions END) AS impressions,
+       sum(CASE WHEN date >= :start THEN clicks END) AS clicks,
+       sum(CASE WHEN date >= :start THEN cost END) AS cost,
+       sum(CASE WHEN date >= :start THEN conversions END) AS conversions,
+       sum(CASE WHEN date >= :start THEN conversion_value END) AS conversion_value,
+       sum(CASE WHEN date < :start THEN impressions END) AS prev_impressions,
+       sum(CASE WHEN date < :start THEN clicks END) AS prev_clicks,
+       sum(CASE WHEN date < :start THEN cost END) AS prev_cost,
+       sum(CASE WHEN date < :start THEN conversions END) AS prev_conversions,
+       sum(CASE WHEN date < :start THEN conversion_value END) AS prev_conversion_value
+FROM campaign_daily_stats
+WHERE date >= :previous_start AND date < :end
+GROUP BY campaign_id
+"""
+SQL_TABLE = f"""
+SELECT g.*, c.name,
+       1.0 * clicks / nullif(impressions, 0) AS ctr, cost / nullif(clicks, 0) AS cpc,
+       cost / nullif(conversions, 0) AS cpa, conversion_value / nullif(cost, 0) AS roas,
+       1.0 * prev_clicks / nullif(prev_impressions, 0) AS prev_ctr, prev_cost / nullif(prev_clicks, 0) AS prev_cpc,
+       prev_cost / nullif(prev_conversions, 0) AS prev_cpa,
+       prev_conversion_value / nullif(prev_cost, 0) AS prev_roas
+FROM ({SQL_BY_CAMPAIGN}) AS g JOIN campaigns AS c ON c.id = g.campaign_id
+WHERE impressions > 0 OR cost > 0
+ORDER BY cost DESC LIMIT 50
+"""
+SQL_MOVERS = f"""
+SELECT campaign_id, conversion_value / nullif(cost, 0) - prev_conversion_value / nullif(prev_cost, 0) AS delta
+FROM ({SQL_BY_CAMPAIGN})
+WHERE impressions >= 100 AND prev_impressions >= 100 AND delta IS NOT NULL
+ORDER BY delta DESC
+"""
+SQL_DAILY = """
+SELECT date, sum(impressions), sum(clicks), sum(cost), sum(conversions), sum(conversion_value)
+FROM campaign_daily_stats WHERE date >= :start AND date < :end GROUP BY date
+"""
+SQL_PREVIOUS_TOTALS = """
+SELECT sum(impressions), sum(clicks), sum(cost), sum(conversions), sum(conversion_value)
+FROM campaign_daily_stats WHERE date >= :previous_start AND date < :start
+"""
+
+
+def _seed(campaigns: int, days: int) -> int:
+    from app.database import engine
+
+    rng = random.Random(0)
+    dates = [(START + datetime.timedelta(days=day)).isoformat() for day in range(days)]
+
+    def rows():
+        for campaign_id in range(1, campaigns + 1):
+            scale = rng.uniform(0.2, 5)
+            for date in dates:
+                impressions = int(rng.randint(200, 5_000) * scale)
+                clicks = rng.randint(0, impressions // 15)
+                conversions = rng.randint(0, clicks // 10 + 1)
+                yield (campaign_id, date, impressions, clicks, round(clicks * rng.uniform(0.1, 2), 2),
+                       conversions, round(conversions * rng.uniform(5, 80), 2))
+
+    with engine.begin() as conn:
+        cursor = conn.connection.cursor()
+        cursor.executemany("INSERT INTO campaigns (id, name) VALUES (?, ?)",
+                           ((campaign_id, f"Campaña {campaign_id:05d}") for campaign_id in range(1, campaigns + 1)))
+        cursor.executemany("INSERT INTO campaign_daily_stats VALUES (?, ?, ?, ?, ?, ?, ?)", rows())
+    return campaigns * days
+
+
+def _summary(samples: list[float]) -> dict:
+    return {"p50_ms": round(statistics.median(samples) * 1000, 2), "p99_ms": round(percentile(samples, 99) * 1000, 2)}
+
+
+def _sql(conn, window: int, ends: list[datetime.date]) -> dict:
+    timings = {"table": [], "movers": [], "summary": []}
+    for end in ends:
+        start = end - datetime.timedelta(days=window)
+        params = {"previous_start": (start - datetime.timedelta(days=window)).isoformat(),
+                  "start": start.isoformat(), "end": end.isoformat()}
+        for name, queries in (("table", (SQL_TABLE,)), ("movers", (SQL_MOVERS,)),
+                              ("summary", (SQL_DAILY, SQL_PREVIOUS_TOTALS))):
+            started = time.perf_counter()
+            for query in queries:
+                conn.execute(query, params).fetchall()
+            timings[name].append(time.perf_counter() - started)
+    return {name: _summary(samples) for name, samples in timings.items()}
+
+
+async def _numpy(window: int, ends: list[datetime.date]) -> dict:
+    from app.services.campaign_analytics import campaign_analytics
+
+    timings = {"table": [], "movers": [], "summary": []}
+    for end in ends:
+        for name, call in (("table", lambda: campaign_analytics.campaigns(end, window, "cost", 50)),
+                           ("movers", lambda: campaign_analytics.movers(end, window, "roas", 10, 100)),
+                           ("summary", lambda: campaign_analytics.summary(end, window))):
+            started = time.perf_counter()
+            await call()
+            timings[name].append(time.perf_counter() - started)
+    return {name: _summary(samples) for name, samples in timings.items()}
+
+
+async def _run(args) -> dict:
+    import sqlite3
+    from app.database import DATABASE_PATH, async_engine
+    from app.services import schema
+    from app.services.campaign_analytics import campaign_analytics
+
+    schema.migrate()
+    started = time.perf_counter()
+    rows = _seed(args.campaigns, args.days)
+    results = {"rows": rows, "seed_s": round(time.perf_counter() - started, 1)}
+
+    started = time.perf_counter()
+    await campaign_analytics.load()
+    load_s = time.perf_counter() - started
+    results["load"] = {"load_s": round(load_s, 2), "rows_per_s": round(rows / load_s),
+                       "memory_mb": round(campaign_analytics.stats()["memory_bytes"] / 2**20, 1)}
+
+    rng = random.Random(1)
+    conn = sqlite3.connect(DATABASE_PATH)
+    for window in args.windows:
+        # 'end' al azar, con al menos dos ventanas completas de historia antes
+        ends = [START + datetime.timedelta(days=rng.randint(2 * window, args.days)) for _ in range(args.queries)]
+        sql = _sql(conn, window, ends)
+        vectorized = await _numpy(window, ends)
+        results[f"window_{window}d"] = {
+            "sql": sql,
+            "numpy": vectorized,
+            "speedup_table": round(sql["table"]["p50_ms"] / vectorized["table"]["p50_ms"], 1),
+        }
+    conn.close()
+    await async_engine.dispose()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--campaigns", type=int, default=5_000)
+    parser.add_argument("--days", type=int, default=400)
+    parser.add_argument("--windows", type=int, nargs="+", default=[7, 30, 90])
+    parser.add_argument("--queries", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Antes de importar app: app.database lee ADGENIE_DB_PATH al importarse
+        os.environ["ADGENIE_DB_PATH"] = os.path.join(tmp, "campaign_analytics.db")
+        results = asyncio.run(_run(args))
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
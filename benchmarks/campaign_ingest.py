@@ -0,0 +1,166 @@
+# benchmarks/campaign_ingest.py
+"""
+Ingesta masiva de métricas de campañas (app/services/campaign_ingest.py)
+sobre exports sintéticos con --campaigns campañas y un año de días
+(1 de cada --bad-every filas, inválida):
+
+  - csv / ndjson: filas/s de la primera carga de --rows filas y memoria
+    máxima del proceso (ru_maxrss) al terminar;
+  - reload: la misma carga otra vez (todas las filas son upsert sobre
+    (campaign_id, date));
+  - orm: línea base con csv.DictReader y session.merge() fila por fila
+    sobre --orm-rows filas (lo que haría un script ad hoc).
+
+Uso:
+    python -m benchmarks.campaign_ingest --rows 1000000 --campaigns 2000
+"""
+
+import argparse
+import asyncio
+import csv
+import datetime
+import json
+import os
+import random
+import resource
+import tempfile
+import time
+
+START = datetime.date(2025, 1, 1)
+HEADER = ("Campaign", "Day", "Impr.", "Clicks", "Cost", "Conversions")
+
+
+def _rows(count: int, campaigns: int, bad_every: int, seed: int = 0):
+    """Genera las filas sin materializarlas: (campaña, día) recorre el espacio en orden."""
+    rng = random.Random(seed)
+    for index in range(count):
+        campaign, day = divmod(index, 365)
+        impressions = rng.randint(100, 50_000)
+        clicks = rng.randint(0, impressions // 20)
+        row = [f"Campaña {campaign % campaigns:05d}",
+               (START + datetime.timedelta(days=day + 365 * (campaign // campaigns))).isoformat(),
+               impressions, clicks, round(clicks * rng.uniform(0.05, 2.5), 2), round(clicks * rng.random() * 0.1, 2)]
+        if bad_every and index % bad_every == bad_every - 1:
+            row[2] = "n/d"
+        yield row
+
+
+def _write(path: str, fmt: str, args) -> float:
+    """Escribe el export; devuelve su tamaño en MB."""
+    with open(path, "w", newline="", encoding="utf-8") as handle:
+        rows = _rows(args.rows, args.campaigns, args.bad_every)
+        if fmt == "csv":
+            writer = csv.writer(handle)
+            writer.writerow(HEADER)
+            writer.writerows(rows)
+        else:
+            keys = ("campaign", "date", "impressions", "clicks", "cost", "conversions")
+            handle.writelines(json.dumps(dict(zip(keys, row)), ensure_ascii=False) + "\n" for row in rows)
+    return round(os.path.getsize(path) / 2**20, 1)
+
+
+def _maxrss_mb() -> float:
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+async def _load(path: str, fmt: str) -> dict:
+    from app.services.campaign_ingest import campaign_ingestor, open_lines
+
+    with open_lines(path) as lines:
+        report = await campaign_ingestor.ingest(lines, fmt)
+    elapsed_s = report.elapsed_ms / 1000
+    return {
+        "rows": report.rows,
+        "accepted": report.accepted,
+        "rejected": report.rejected,
+        "campaigns_created": report.campaigns_created,
+        "batches": report.batches,
+        "elapsed_s": round(elapsed_s, 2),
+        "rows_per_s": round(report.rows / elapsed_s),
+        "maxrss_mb": _maxrss_mb(),
+    }
+
+
+def _orm_baseline(path: str, limit: int) -> dict:
+    from sqlalchemy import select
+    from app.database import SessionLocal
+    from app.models.campaigns import Campaign, CampaignDailyStat
+
+    started = time.perf_counter()
+    rows = accepted = 0
+    with SessionLocal() as db, open(path, newline="", encoding="utf-8") as handle:
+        ids = {}
+        for row in csv.DictReader(handle):
+            if rows == limit:
+                break
+            rows += 1
+            try:
+                values = dict(date=datetime.date.fromisoformat(row["Day"]), impressions=int(row["Impr."]),
+                              clicks=int(row["Clicks"]), cost=float(row["Cost"]),
+                              conversions=float(row["Conversions"]))
+            except ValueError:
+                continue
+            name = row["Campaign"]
+            if name not in ids:
+                campaign = db.scalar(select(Campaign).where(Campaign.name == name))
+                if campaign is None:
+                    campaign = Campaign(name=name)
+                    db.add(campaign)
+                    db.flush()
+                ids[name] = campaign.id
+            db.merge(CampaignDailyStat(campaign_id=ids[name], **values))
+            accepted += 1
+        db.commit()
+    elapsed_s = time.perf_counter() - started
+    return {"rows": rows, "accepted": accepted, "elapsed_s": round(elapsed_s, 2),
+            "rows_per_s": round(rows / elapsed_s)}
+
+
+async def _run(args, tmp: str) -> dict:
+    from app.database import async_engine, engine
+    from app.services import schema
+
+    schema.migrate()
+    results = {}
+    for fmt in ("csv", "ndjson"):
+        path = os.path.join(tmp, f"stats.{fmt}")
+        started = time.perf_counter()
+        size_mb = _write(path, fmt, args)
+        results[fmt] = {"file_mb": size_mb, "generate_s": round(time.perf_counter() - started, 1),
+                        **await _load(path, fmt)}
+        if fmt == "csv":
+            results["reload"] = await _load(path, fmt)
+            # La línea base parte de tablas vacías, como la primera carga
+            with engine.begin() as conn:
+                conn.exec_driver_sql("DELETE FROM campaign_daily_stats")
+                conn.exec_driver_sql("DELETE FROM campaigns")
+            results["orm"] = _orm_baseline(path, args.orm_rows)
+            with engine.begin() as conn:
+                conn.exec_driver_sql("DELETE FROM campaign_daily_stats")
+                conn.exec_driver_sql("DELETE FROM campaigns")
+        os.remove(path)
+
+    with engine.connect() as conn:
+        results["stored_rows"] = conn.exec_driver_sql("SELECT count(*) FROM campaign_daily_stats").scalar()
+    await async_engine.dispose()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--campaigns", type=int, default=20_000)
+    parser.add_argument("--bad-every", type=int, default=1_000)
+    parser.add_argument("--orm-rows", type=int, default=50_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Antes de importar app: app.database lee ADGENIE_DB_PATH al importarse
+        os.environ["ADGENIE_DB_PATH"] = os.path.join(tmp, "campaign_ingest.db")
+        results = asyncio.run(_run(args, tmp))
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
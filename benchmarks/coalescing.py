@@ -0,0 +1,61 @@
+# benchmarks/coalescing.py
+"""
+Ráfaga de la misma pregunta desde N sesiones distintas (lanzamiento de
+campaña), con y sin single-flight (CHAT_SINGLE_FLIGHT). Informa las
+llamadas reales a Azure, la latencia y comprueba que cada sesión
+persistió su propio par USER/BOT.
+
+Uso:
+    python -m benchmarks.coalescing --sessions 200 --latency-ms 500
+"""
+
+import argparse
+import asyncio
+import json
+
+import httpx
+
+from benchmarks.harness import adgenie_app, fake_azure, run_load
+
+QUESTIONS = (
+    "¿Cómo optimizo el CTR de mi campaña de lanzamiento?",
+    "¿Cómo optimizo el CTR de mi campaña de lanzamiento ?",  # variación trivial, misma clave
+    "¿Qué puja recomiendan para el lanzamiento?",
+)
+
+
+async def _send_burst_message(client, i):
+    return await client.post("/chat/message", json={
+        "message": QUESTIONS[i % len(QUESTIONS)],
+        "session_id": f"burst-{i}",
+    })
+
+
+def _run(azure_url: str, single_flight: str, sessions: int) -> dict:
+    env = {"CHAT_SINGLE_FLIGHT": single_flight, "REPLY_CACHE_MAX_ENTRIES": "2048"}
+    with adgenie_app(azure_url, env=env) as app_url:
+        result = asyncio.run(run_load(app_url, _send_burst_message, sessions, sessions))
+        result["coalescing"] = httpx.get(f"{app_url}/metrics/coalescing").json()
+        result["persisted_interactions"] = httpx.get(f"{app_url}/metrics/summary").json()["total_interactions"]
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=500.0)
+    args = parser.parse_args()
+
+    with fake_azure(latency_ms=args.latency_ms) as azure_url:
+        results = {
+            "single_flight_off": _run(azure_url, "0", args.sessions),
+            "single_flight_on": _run(azure_url, "1", args.sessions),
+        }
+
+    print(json.dumps(results, indent=2))
+    for name, result in results.items():
+        assert result["persisted_interactions"] == 2 * args.sessions, f"{name}: faltan filas persistidas"
+
+
+if __name__ == "__main__":
+    main()
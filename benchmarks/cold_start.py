@@ -0,0 +1,74 @@
+# benchmarks/cold_start.py
+"""
+Arranque en frío: tiempo desde lanzar uvicorn hasta que GET / responde, y
+latencia del primer /chat/message (incluye construir el cliente de Azure).
+Se mide con base nueva (migra el esquema) y con base existente (segundo
+arranque sobre la misma base, que es el caso típico al escalar).
+
+Uso:
+    python -m benchmarks.cold_start --runs 5
+    python -m benchmarks.cold_start --runs 5 --ref HEAD~1
+"""
+
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.harness import ROOT_DIR, adgenie_app, fake_azure, git_worktree
+
+
+def _boot(azure_url: str, db_path: str, app_dir: str) -> dict:
+    started = time.perf_counter()
+    with adgenie_app(azure_url, db_path=db_path, app_dir=app_dir) as app_url:
+        ready = time.perf_counter() - started
+        first = time.perf_counter()
+        httpx.post(f"{app_url}/chat/message", json={"message": "Quiero una campaña para mi cafetería"}, timeout=30.0)
+        first_chat = time.perf_counter() - first
+        # Versiones anteriores no exponen el perfil
+        response = httpx.get(f"{app_url}/metrics/startup", timeout=5.0)
+        profile = response.json() if response.status_code == 200 else None
+    return {"ready_s": ready, "first_chat_s": first_chat, "profile": profile}
+
+
+def _summary(boots: list[dict]) -> dict:
+    return {
+        "ready_ms_median": round(statistics.median(b["ready_s"] for b in boots) * 1000, 1),
+        "ready_ms_max": round(max(b["ready_s"] for b in boots) * 1000, 1),
+        "first_chat_ms_median": round(statistics.median(b["first_chat_s"] for b in boots) * 1000, 1),
+        "last_profile": boots[-1]["profile"],
+    }
+
+
+def run(args, app_dir: str) -> dict:
+    fresh, existing = [], []
+    with fake_azure(latency_ms=args.latency_ms) as azure_url:
+        for _ in range(args.runs):
+            with tempfile.TemporaryDirectory() as tmp:
+                db_path = os.path.join(tmp, "cold.db")
+                fresh.append(_boot(azure_url, db_path, app_dir))
+                existing.append(_boot(azure_url, db_path, app_dir))
+    return {"runs": args.runs, "fresh_db": _summary(fresh), "existing_db": _summary(existing)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="latencia del Azure falso")
+    parser.add_argument("--ref", default=None, help="revisión de git a medir (por defecto, el árbol actual)")
+    args = parser.parse_args()
+
+    if args.ref:
+        with git_worktree(args.ref) as app_dir:
+            results = run(args, app_dir)
+    else:
+        results = run(args, ROOT_DIR)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
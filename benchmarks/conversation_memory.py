@@ -0,0 +1,83 @@
+# benchmarks/conversation_memory.py
+"""
+Armado del historial para el prompt: recarga completa de las filas de la
+sesión en cada mensaje (enfoque ingenuo) vs. ring buffer en memoria
+(app.services.conversation_memory), que lee la base una vez por sesión.
+
+Uso:
+    python -m benchmarks.conversation_memory --rows 1000000 --sessions 10000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+
+from benchmarks.seed import seed_interactions
+
+
+async def _run(args) -> dict:
+    from sqlalchemy import select
+    from app.database import async_engine
+    from app.models.interactions import ChatInteraction
+    from app.services.conversation_memory import ConversationMemory, ensure_index
+
+    ensure_index()
+    rng = random.Random(7)
+    # Mensajes sucesivos de un subconjunto de sesiones activas
+    active = [f"seed-session-{rng.randrange(1, args.sessions + 1)}" for _ in range(args.active_sessions)]
+    messages = [rng.choice(active) for _ in range(args.messages)]
+
+    async def naive(session_id: str) -> list:
+        user_id = int(session_id.rsplit("-", 1)[1])
+        query = (
+            select(ChatInteraction.message_type, ChatInteraction.message_text)
+            .where(ChatInteraction.user_id == user_id)
+            .order_by(ChatInteraction.created_at)
+        )
+        async with async_engine.connect() as conn:
+            return (await conn.execute(query)).all()
+
+    started = time.perf_counter()
+    for session_id in messages:
+        await naive(session_id)
+    naive_seconds = time.perf_counter() - started
+
+    memory = ConversationMemory(max_turns=6, token_budget=1200, max_sessions=args.active_sessions)
+    started = time.perf_counter()
+    for session_id in messages:
+        memory.within_budget(await memory.history(session_id))
+    ring_seconds = time.perf_counter() - started
+
+    await async_engine.dispose()
+    return {
+        "messages": args.messages,
+        "active_sessions": args.active_sessions,
+        "naive_full_reload_ms_per_msg": round(naive_seconds / args.messages * 1000, 3),
+        "ring_buffer_ms_per_msg": round(ring_seconds / args.messages * 1000, 3),
+        "ring_buffer_db_reads": memory.hydrations,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default="/tmp/adgenie_bench_memory.db")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--sessions", type=int, default=10_000)
+    parser.add_argument("--active-sessions", type=int, default=200)
+    parser.add_argument("--messages", type=int, default=5000)
+    parser.add_argument("--reuse", action="store_true", help="no volver a sembrar si la base existe")
+    args = parser.parse_args()
+
+    os.environ["ADGENIE_DB_PATH"] = args.db
+    if not (args.reuse and os.path.exists(args.db)):
+        print(f"Sembrando {args.rows} filas en {args.db}...")
+        print(f"  listo en {seed_interactions(args.db, args.rows, args.sessions):.1f}s")
+
+    print(json.dumps(asyncio.run(_run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
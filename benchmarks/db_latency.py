@@ -0,0 +1,60 @@
+# benchmarks/db_latency.py
+"""
+Latencia p99 de /chat/message y /metrics/summary con 100 sesiones
+concurrentes, comparando el árbol actual contra otra revisión de git.
+
+El Azure falso responde rápido para que domine el coste de SQLite.
+
+Uso:
+    python -m benchmarks.db_latency --compare HEAD~1
+"""
+
+import argparse
+import asyncio
+import json
+
+from benchmarks.harness import ROOT_DIR, adgenie_app, fake_azure, git_worktree, run_load
+
+
+async def _chat(client, i):
+    return await client.post("/chat/message", json={
+        "message": f"pregunta #{i}",
+        "session_id": f"db-session-{i % 100}",
+    })
+
+
+async def _summary(client, i):
+    return await client.get("/metrics/summary")
+
+
+def _measure(label: str, azure_url: str, app_dir: str, concurrency: int, total: int) -> dict:
+    with adgenie_app(azure_url, app_dir=app_dir) as app_url:
+        chat = asyncio.run(run_load(app_url, _chat, concurrency, total))
+        summary = asyncio.run(run_load(app_url, _summary, concurrency, total))
+    return {"label": label, "chat_message": chat, "metrics_summary": summary}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--compare", default=None, help="revisión de git a comparar (p. ej. HEAD~1)")
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--latency-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    results = []
+    with fake_azure(latency_ms=args.latency_ms) as azure_url:
+        if args.compare:
+            with git_worktree(args.compare) as baseline_dir:
+                results.append(_measure(args.compare, azure_url, baseline_dir, args.concurrency, args.requests))
+        results.append(_measure("working-tree", azure_url, ROOT_DIR, args.concurrency, args.requests))
+
+    print(json.dumps(results, indent=2))
+    for result in results:
+        print(f"{result['label']:>14}  chat p99={result['chat_message']['p99_ms']}ms "
+              f"errors={result['chat_message']['errors']}  "
+              f"summary p99={result['metrics_summary']['p99_ms']}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+# benchmarks/fake_azure.py
+"""
+Servidor local que imita el endpoint chat/completions de Azure OpenAI.
+
+Inyección de fallos (para probar timeouts, circuit breaker y hedging):
+  --error-rate / --error-status   fracción de peticiones que responden 429/500
+  --slow-rate / --slow-ms         fracción de peticiones con latencia extra
+Los mismos parámetros se cambian en caliente con POST /_faults y
+GET /_faults devuelve la configuración y los contadores.
+
+Uso:
+    python -m benchmarks.fake_azure --port 9100 --latency-ms 200
+    python -m benchmarks.fake_azure --error-rate 0.2 --error-status 429
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+LATENCY_SECONDS = 0.2
+CHUNK_DELAY_SECONDS = 0.01
+CHUNK_SIZE = 8
+
+FAULTS = {
+    "latency_ms": 200.0,
+    "error_rate": 0.0,
+    "error_status": 500,
+    "slow_rate": 0.0,
+    "slow_ms": 0.0,
+}
+COUNTERS = {"requests": 0, "errors_injected": 0, "slow_injected": 0}
+_rng = random.Random(0)
+
+app = FastAPI(title="Fake Azure OpenAI")
+
+
+@app.get("/_faults")
+async def get_faults():
+    return {"faults": FAULTS, "counters": COUNTERS}
+
+
+@app.post("/_faults")
+async def set_faults(request: Request):
+    global LATENCY_SECONDS
+    FAULTS.update(await request.json())
+    LATENCY_SECONDS = FAULTS["latency_ms"] / 1000.0
+    return {"faults": FAULTS, "counters": COUNTERS}
+
+
+def _injected_error() -> JSONResponse:
+    status = int(FAULTS["error_status"])
+    headers = {"retry-after-ms": "10"} if status == 429 else {}
+    return JSONResponse(
+        status_code=status,
+        content={"error": {"code": str(status), "message": "Fallo inyectado por fake_azure."}},
+        headers=headers,
+    )
+
+
+def _reply_payload(user_message: str) -> str:
+    return json.dumps({
+        "reply": f"Respuesta simulada para: {user_message[:80]}",
+        "context": "MARKETING_OPTIMIZATION",
+    }, ensure_ascii=False)
+
+
+@app.post("/openai/deployments/{deployment}/chat/completions")
+async def chat_completions(deployment: str, request: Request):
+    body = await request.json()
+    user_message = body["messages"][-1]["content"]
+    COUNTERS["requests"] += 1
+
+    delay = LATENCY_SECONDS
+    if _rng.random() < FAULTS["slow_rate"]:
+        COUNTERS["slow_injected"] += 1
+        delay += FAULTS["slow_ms"] / 1000.0
+    await asyncio.sleep(delay)
+
+    if _rng.random() < FAULTS["error_rate"]:
+        COUNTERS["errors_injected"] += 1
+        return _injected_error()
+
+    content = _reply_payload(user_message)
+    if body.get("stream"):
+        include_usage = bool((body.get("stream_options") or {}).get("include_usage"))
+        return StreamingResponse(_stream_chunks(deployment, content, include_usage), media_type="text/event-stream")
+
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": deployment,
+        "choices": [{
+            "index": 0,
+            "finish_reason": "stop",
+            "message": {"role": "assistant", "content": content},
+        }],
+        "usage": _usage(content),
+    }
+
+
+def _usage(content: str) -> dict:
+    return {
+        "prompt_tokens": 120,
+        "completion_tokens": len(content) // 4,
+        "total_tokens": 120 + len(content) // 4,
+    }
+
+
+async def _stream_chunks(deployment: str, content: str, include_usage: bool = False):
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+
+    def chunk(delta: dict, finish_reason=None) -> str:
+        return "data: " + json.dumps({
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": deployment,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+        }) + "\n\n"
+
+    # Como Azure: primer chunk sin 'choices' (resultados del filtro de contenido)
+    yield "data: " + json.dumps({"id": "", "object": "", "created": 0, "model": "", "choices": []}) + "\n\n"
+    yield chunk({"role": "assistant", "content": ""})
+    for start in range(0, len(content), CHUNK_SIZE):
+        yield chunk({"content": content[start:start + CHUNK_SIZE]})
+        await asyncio.sleep(CHUNK_DELAY_SECONDS)
+    yield chunk({}, finish_reason="stop")
+    if include_usage:
+        # Como la API real: chunk final sin 'choices' con el uso de tokens
+        yield "data: " + json.dumps({
+            "id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()),
+            "model": deployment, "choices": [], "usage": _usage(content),
+        }) + "\n\n"
+    yield "data: [DONE]\n\n"
+
+
+def main() -> None:
+    global LATENCY_SECONDS, CHUNK_DELAY_SECONDS
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency-ms", type=float, default=200.0)
+    parser.add_argument("--chunk-delay-ms", type=float, default=10.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=500, choices=[429, 500, 503])
+    parser.add_argument("--slow-rate", type=float, default=0.0)
+    parser.add_argument("--slow-ms", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    FAULTS.update({
+        "latency_ms": args.latency_ms,
+        "error_rate": args.error_rate,
+        "error_status": args.error_status,
+        "slow_rate": args.slow_rate,
+        "slow_ms": args.slow_ms,
+    })
+    _rng.seed(args.seed)
+    LATENCY_SECONDS = args.latency_ms / 1000.0
+    CHUNK_DELAY_SECONDS = args.chunk_delay_ms / 1000.0
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
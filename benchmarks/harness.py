@@ -0,0 +1,140 @@
+# benchmarks/harness.py
+"""Utilidades compartidas: levantar procesos, esperar readiness y medir carga."""
+
+import asyncio
+import contextlib
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+
+def _wait_ready(url: str, proc: subprocess.Popen, timeout: float = 20.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"El proceso terminó antes de estar listo: {url}")
+        try:
+            httpx.get(url, timeout=1.0)
+            return
+        except httpx.HTTPError:
+            # Intervalo corto: benchmarks.cold_start mide el tiempo hasta estar listo
+            time.sleep(0.02)
+    raise RuntimeError(f"El proceso no respondió a tiempo: {url}")
+
+
+@contextlib.contextmanager
+def fake_azure(port: int = 9100, latency_ms: float = 200.0):
+    """Levanta benchmarks.fake_azure en un subproceso."""
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.fake_azure",
+         "--port", str(port), "--latency-ms", str(latency_ms)],
+        cwd=ROOT_DIR,
+    )
+    try:
+        _wait_ready(f"http://127.0.0.1:{port}/docs", proc)
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+@contextlib.contextmanager
+def adgenie_app(azure_endpoint: str, port: int = 8100, db_path: str | None = None,
+                env: dict | None = None, app_dir: str = ROOT_DIR):
+    """
+    Levanta app.main:app con uvicorn contra el Azure falso y una DB temporal.
+    `app_dir` permite arrancar otra versión del código (ver git_worktree).
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        proc_env = dict(os.environ)
+        proc_env.update({
+            "AZURE_OPENAI_ENDPOINT": azure_endpoint,
+            "AZURE_OPENAI_API_KEY": "fake-key",
+            "ADGENIE_DB_PATH": db_path or os.path.join(tmp, "bench.db"),
+            # Los generadores de carga reparten miles de peticiones entre pocas
+            # sesiones: sin límite por sesión salvo que el benchmark lo pida
+            "ADMISSION_SESSION_RATE": "0",
+        })
+        proc_env.update(env or {})
+        proc = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app",
+             "--port", str(port), "--log-level", "warning"],
+            cwd=app_dir,
+            env=proc_env,
+            stdout=subprocess.DEVNULL,
+        )
+        try:
+            _wait_ready(f"http://127.0.0.1:{port}/", proc)
+            yield f"http://127.0.0.1:{port}"
+        finally:
+            proc.terminate()
+            proc.wait()
+
+
+@contextlib.contextmanager
+def git_worktree(ref: str):
+    """Checkout temporal (git worktree) de `ref` para comparar antes/después."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "worktree")
+        subprocess.run(["git", "worktree", "add", "--detach", path, ref],
+                       cwd=ROOT_DIR, check=True, capture_output=True)
+        try:
+            yield path
+        finally:
+            subprocess.run(["git", "worktree", "remove", "--force", path],
+                           cwd=ROOT_DIR, check=False, capture_output=True)
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run_load(base_url: str, make_request, concurrency: int, total: int) -> dict:
+    """
+    Ejecuta `total` peticiones con `concurrency` trabajadores.
+    `make_request(client, i)` debe devolver la respuesta httpx.
+    """
+    latencies: list[float] = []
+    errors = 0
+    counter = iter(range(total))
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=60.0, limits=limits) as client:
+
+        async def worker():
+            nonlocal errors
+            for i in counter:
+                started = time.perf_counter()
+                try:
+                    response = await make_request(client, i)
+                    if response.status_code >= 400:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        "concurrency": concurrency,
+        "requests": total,
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "rps": round(total / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(statistics.median(latencies) * 1000, 2) if latencies else 0.0,
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
@@ -0,0 +1,100 @@
+# benchmarks/history.py
+"""
+Historial de una sesión con 100k mensajes: carga de User.interactions por
+el ORM (lo que haría un endpoint ingenuo) vs. páginas keyset de
+app.services.history sobre el índice del historial.
+
+Uso:
+    python -m benchmarks.history --rows 1000000 --sessions 10
+    python -m benchmarks.history --reuse
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+
+from benchmarks.seed import seed_interactions
+
+
+def _median_ms(samples: list[float]) -> float:
+    return round(statistics.median(samples) * 1000, 3)
+
+
+def _orm_full_load(session_id: str) -> tuple[float, int]:
+    from sqlalchemy import select
+    from app.database import SessionLocal
+    from app.models.users import User
+
+    started = time.perf_counter()
+    with SessionLocal() as db:
+        user = db.execute(select(User).where(User.session_id == session_id)).scalar_one()
+        count = len(user.interactions)
+    return time.perf_counter() - started, count
+
+
+async def _paged(session_id: str, limit: int, pages: int, repeat: int) -> dict:
+    from app.services.history import read_page
+
+    newest, walk, since = [], [], []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        page = await read_page(session_id, limit)
+        newest.append(time.perf_counter() - started)
+
+        # Hacia atrás `pages` páginas; la última sirve de cursor para "desde"
+        started = time.perf_counter()
+        for _ in range(pages):
+            page = await read_page(session_id, limit, before=page.before)
+        walk.append((time.perf_counter() - started) / pages)
+
+        started = time.perf_counter()
+        await read_page(session_id, limit, after=page.before)
+        since.append(time.perf_counter() - started)
+    return {
+        "newest_page_ms": _median_ms(newest),
+        "older_page_ms": _median_ms(walk),
+        "since_cursor_page_ms": _median_ms(since),
+        "pages_walked": pages,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default="/tmp/adgenie_bench_history.db")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--sessions", type=int, default=10, help="filas/sesiones = mensajes por sesión")
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--pages", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--reuse", action="store_true", help="no volver a sembrar si la base existe")
+    args = parser.parse_args()
+
+    # app.database lee ADGENIE_DB_PATH al importarse
+    os.environ["ADGENIE_DB_PATH"] = args.db
+    if not (args.reuse and os.path.exists(args.db)):
+        print(f"Sembrando {args.rows} filas en {args.db} ({args.sessions} sesiones)...")
+        print(f"  listo en {seed_interactions(args.db, args.rows, args.sessions, days=365):.1f}s")
+
+    from app.database import async_engine
+    from app.services import schema
+    schema.ensure_schema()
+
+    session_id = "seed-session-1"
+    orm_seconds, messages = _orm_full_load(session_id)
+
+    async def paged() -> dict:
+        try:
+            return await _paged(session_id, args.limit, args.pages, args.repeat)
+        finally:
+            await async_engine.dispose()
+
+    results = {"session_messages": messages, "orm_full_load_ms": round(orm_seconds * 1000, 1), "limit": args.limit}
+    results.update(asyncio.run(paged()))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
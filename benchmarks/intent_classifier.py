@@ -0,0 +1,71 @@
+# benchmarks/intent_classifier.py
+"""
+Micro-benchmark del clasificador local de intención (app/services/intent.py)
+contra el escaneo lineal original de get_ai_response_fallback, y tasa de
+llamadas al LLM evitadas sobre un corpus de ejemplo.
+
+Uso:
+    python -m benchmarks.intent_classifier --corpus benchmarks/data/chat_corpus.txt
+"""
+
+import argparse
+import json
+import os
+import time
+
+from app.services.intent import IntentClassifier
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "chat_corpus.txt")
+
+
+def legacy_fallback(message: str) -> str:
+    """Escaneo lineal original (tres lower() y any() sobre listas)."""
+    marketing_keywords = ["optimizar", "ctr", "cpc", "campaña", "métricas"]
+    tech_keywords = ["python", "fastapi", "react", "vite", "azure"]
+    off_topic_keywords = ["capital", "tiempo", "edad", "quién eres"]
+    if any(keyword in message.lower() for keyword in marketing_keywords):
+        return "MARKETING_OPTIMIZATION"
+    if any(keyword in message.lower() for keyword in tech_keywords):
+        return "TECH_STACK"
+    if any(keyword in message.lower() for keyword in off_topic_keywords):
+        return "GENERAL_INQUIRY"
+    return "DEFAULT_PROCESSING"
+
+
+def _throughput(fn, messages: list[str], rounds: int) -> float:
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for message in messages:
+            fn(message)
+    elapsed = time.perf_counter() - started
+    return round(rounds * len(messages) / elapsed)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS)
+    parser.add_argument("--rounds", type=int, default=2000)
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    with open(args.corpus, encoding="utf-8") as corpus_file:
+        messages = [line.strip() for line in corpus_file if line.strip()]
+
+    classifier = IntentClassifier.from_file()
+    answered_locally = [message for message in messages if classifier.answer_locally(message)]
+
+    if args.verbose:
+        for message in messages:
+            print(f"{classifier.classify(message)!r:<40.40}  {message}")
+
+    print(json.dumps({
+        "corpus_messages": len(messages),
+        "answered_without_llm": len(answered_locally),
+        "llm_call_rate_saved": round(len(answered_locally) / len(messages), 3),
+        "classifier_msgs_per_s": _throughput(classifier.classify, messages, args.rounds),
+        "legacy_scan_msgs_per_s": _throughput(legacy_fallback, messages, args.rounds),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
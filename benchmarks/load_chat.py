@@ -0,0 +1,49 @@
+# benchmarks/load_chat.py
+"""
+Prueba de carga de /chat/message contra el Azure falso.
+
+Muestra cómo escalan las peticiones/segundo con la concurrencia: con el
+cliente asíncrono la latencia del LLM de sesiones concurrentes se solapa.
+
+Uso:
+    python -m benchmarks.load_chat --latency-ms 200 --concurrency 1 4 16 64
+"""
+
+import argparse
+import asyncio
+import json
+
+from benchmarks.harness import adgenie_app, fake_azure, run_load
+
+
+async def _send_message(client, i):
+    return await client.post("/chat/message", json={
+        "message": f"¿Cómo optimizo mi CTR? #{i}",
+        "session_id": f"load-{i % 50}",
+    })
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--latency-ms", type=float, default=200.0)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--requests-per-worker", type=int, default=8)
+    args = parser.parse_args()
+
+    results = []
+    with fake_azure(latency_ms=args.latency_ms) as azure_url:
+        with adgenie_app(azure_url) as app_url:
+            for concurrency in args.concurrency:
+                total = concurrency * args.requests_per_worker
+                result = asyncio.run(run_load(app_url, _send_message, concurrency, total))
+                results.append(result)
+                print(json.dumps(result))
+
+    base = results[0]["rps"] or 1.0
+    for result in results:
+        print(f"concurrency={result['concurrency']:>4}  rps={result['rps']:>8}  "
+              f"speedup={result['rps'] / base:5.1f}x  p99={result['p99_ms']}ms")
+
+
+if __name__ == "__main__":
+    main()
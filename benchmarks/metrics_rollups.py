@@ -0,0 +1,85 @@
+# benchmarks/metrics_rollups.py
+"""
+Consultas por ventana de tiempo: GROUP BY sobre filas crudas vs. rollups
+horarios (app.services.metrics_rollups.count_range), con la tabla de
+interacciones sembrada (10M filas por defecto).
+
+Uso:
+    python -m benchmarks.metrics_rollups --rows 10000000 --db /tmp/adgenie_10m.db
+    python -m benchmarks.metrics_rollups --db /tmp/adgenie_10m.db --reuse
+"""
+
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import sqlite3
+import statistics
+import time
+
+from benchmarks.seed import seed_interactions
+
+
+def _timed(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return round(statistics.median(samples) * 1000, 3)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default="/tmp/adgenie_bench_rollups.db")
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--reuse", action="store_true", help="no volver a sembrar si la base existe")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    # El motor asíncrono de la app debe apuntar a la base sembrada (se lee al importar app.database)
+    os.environ["ADGENIE_DB_PATH"] = args.db
+
+    if not (args.reuse and os.path.exists(args.db)):
+        print(f"Sembrando {args.rows} filas en {args.db}...")
+        print(f"  listo en {seed_interactions(args.db, args.rows):.1f}s")
+
+    from app.services import metrics_rollups
+
+    now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+    windows = {
+        "last_15m_by_context": (now - datetime.timedelta(minutes=15), None, "%Y-%m-%d %H:%M:00"),
+        "hourly_30d": (now - datetime.timedelta(days=30), metrics_rollups.BUCKET_SIZES["hour"], "%Y-%m-%d %H:00:00"),
+        "daily_30d": (now - datetime.timedelta(days=30), metrics_rollups.BUCKET_SIZES["day"], "%Y-%m-%d"),
+    }
+
+    raw = sqlite3.connect(args.db)
+    results = {"rows": raw.execute("SELECT count(*) FROM chat_interactions").fetchone()[0], "queries": {}}
+
+    loop = asyncio.new_event_loop()
+    for name, (start, bucket, raw_format) in windows.items():
+        start_str = start.strftime("%Y-%m-%d %H:%M:%S.%f")
+        if bucket is None:
+            sql = ("SELECT context, message_type, count(*) FROM chat_interactions "
+                   "WHERE created_at >= ? GROUP BY context, message_type")
+        else:
+            sql = (f"SELECT strftime('{raw_format}', created_at) AS b, context, message_type, count(*) "
+                   "FROM chat_interactions WHERE created_at >= ? GROUP BY b, context, message_type")
+
+        raw_ms = _timed(lambda: raw.execute(sql, (start_str,)).fetchall(), args.repeat)
+        rollup_ms = _timed(
+            lambda: loop.run_until_complete(metrics_rollups.count_range(start, now, bucket)), args.repeat
+        )
+        results["queries"][name] = {
+            "raw_group_by_ms": raw_ms,
+            "rollups_ms": rollup_ms,
+            "speedup": round(raw_ms / rollup_ms, 1) if rollup_ms else None,
+        }
+    loop.close()
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+# benchmarks/near_duplicate.py
+"""
+Índice de casi duplicados (app/services/near_duplicate.py):
+
+  - corpus: qué mensajes del corpus de ejemplo reutilizarían la respuesta
+    de uno anterior (paráfrasis detectadas);
+  - escala: N entradas sintéticas (por defecto 1M), tiempo de alta,
+    memoria del índice (sys.getsizeof de arrays y cubetas) y latencia de búsqueda
+    (huella + recorrido de las bandas) para aciertos y fallos;
+  - recarga: leer las N huellas de 'chat_reply_fingerprints' y armar la
+    tabla, como al arrancar.
+
+Uso:
+    python -m benchmarks.near_duplicate --entries 1000000
+"""
+
+import argparse
+import json
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+
+from benchmarks.harness import percentile
+from benchmarks.intent_classifier import DEFAULT_CORPUS
+
+CONTEXTS = ("MARKETING_OPTIMIZATION", "TECH_STACK", "GENERAL_INQUIRY")
+
+
+def _corpus_matches(index, corpus_path: str) -> list[dict]:
+    from app.services.intent import intent_classifier
+
+    with open(corpus_path, encoding="utf-8") as corpus_file:
+        messages = [line.strip() for line in corpus_file if line.strip()]
+    matches = []
+    for reply_id, message in enumerate(messages, start=1):
+        context = intent_classifier.classify(message).intent
+        found = index.find(message, context)
+        if found is not None:
+            matches.append({"message": message, "reuses": messages[found[0] - 1], "similarity": found[1]})
+        else:
+            fingerprint = index.fingerprint(message)
+            if fingerprint is not None and context is not None:
+                index.add(reply_id, context, fingerprint)
+    return matches
+
+
+def _synthetic_messages(count: int, vocabulary: int, rng: random.Random) -> list[str]:
+    # Palabras de 8 letras: el truncado a 5 caracteres no las junta (salvo colisiones raras)
+    words = ["".join(rng.choices("abcdefghijklmnopqrstuvwxyz", k=8)) for _ in range(vocabulary)]
+    return [" ".join(rng.sample(words, rng.randint(2, 8))) for _ in range(count)]
+
+
+def _latencies(index, queries: list[tuple[str, str]]) -> dict:
+    samples = []
+    hits = 0
+    for message, context in queries:
+        started = time.perf_counter()
+        found = index.find(message, context)
+        samples.append(time.perf_counter() - started)
+        hits += found is not None
+    return {
+        "lookups": len(queries),
+        "found": hits,
+        "p50_us": round(statistics.median(samples) * 1e6, 1),
+        "p99_us": round(percentile(samples, 99) * 1e6, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=1_000_000)
+    parser.add_argument("--vocabulary", type=int, default=20_000)
+    parser.add_argument("--lookups", type=int, default=20_000)
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Antes de importar app: app.database lee ADGENIE_DB_PATH al importarse
+        os.environ["ADGENIE_DB_PATH"] = os.path.join(tmp, "near_duplicate.db")
+        from app.services import schema
+        from app.services.near_duplicate import NearDuplicateIndex, to_signed
+
+        schema.migrate()
+        results = {"corpus_matches": _corpus_matches(NearDuplicateIndex.from_file(), args.corpus)}
+
+        rng = random.Random(0)
+        messages = _synthetic_messages(args.entries, args.vocabulary, rng)
+        index = NearDuplicateIndex.from_file()
+        index.max_entries = args.entries
+
+        started = time.perf_counter()
+        fingerprints = [index.fingerprint(message) for message in messages]
+        fingerprint_s = time.perf_counter() - started
+
+        # Solo el alta en el índice, con las huellas ya calculadas
+        started = time.perf_counter()
+        for reply_id, fingerprint in enumerate(fingerprints, start=1):
+            index.add(reply_id, CONTEXTS[reply_id % len(CONTEXTS)], fingerprint)
+        build_s = time.perf_counter() - started
+
+        stats = index.stats()
+        entries, memory = stats["entries"], stats["memory_bytes"]
+        sample = rng.sample(range(args.entries), args.lookups)
+        known = [(messages[i], CONTEXTS[(i + 1) % len(CONTEXTS)]) for i in sample]
+        # Misma consulta con palabras vacías y otro orden: misma huella
+        paraphrases = [(f"¿cómo {' '.join(reversed(message.split()))} para mi?", context) for message, context in known]
+        misses = [(message, CONTEXTS[0]) for message in _synthetic_messages(args.lookups, args.vocabulary, random.Random(1))]
+
+        results["scale"] = {
+            "entries": entries,
+            "fingerprints_per_s": round(args.entries / fingerprint_s),
+            "build_s": round(build_s, 2),
+            "adds_per_s": round(args.entries / build_s),
+            "index_mb": round(memory / 2**20, 1),
+            "lookup_known": _latencies(index, known),
+            "lookup_paraphrase": _latencies(index, paraphrases),
+            "lookup_miss": _latencies(index, misses),
+        }
+
+        table = index._table
+        rows = (
+            (reply_id, CONTEXTS[reply_id % len(CONTEXTS)], to_signed(fingerprint))
+            for reply_id, fingerprint in zip(table.reply_ids, table.fingerprints)
+        )
+        conn = sqlite3.connect(os.environ["ADGENIE_DB_PATH"])
+        conn.executemany("INSERT INTO chat_reply_fingerprints (reply_id, context, simhash) VALUES (?, ?, ?)", rows)
+        conn.commit()
+        conn.close()
+        del messages, fingerprints, table, index
+        reloaded = NearDuplicateIndex.from_file()
+        reloaded.max_entries = args.entries
+        started = time.perf_counter()
+        table = reloaded._load_table()
+        results["reload"] = {"entries": len(table), "load_s": round(time.perf_counter() - started, 2)}
+
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
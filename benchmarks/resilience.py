@@ -0,0 +1,101 @@
+# benchmarks/resilience.py
+"""
+Presupuesto de latencia, circuit breaker y hedging contra el Azure falso
+con fallos inyectados (POST /_faults de benchmarks.fake_azure).
+
+Escenario "breaker" (una sola instancia de la app):
+  healthy -> outage (100% HTTP 500) -> slow (latencia > presupuesto)
+  -> recovery (espera el enfriamiento; la sonda half-open cierra el circuito)
+Escenario "hedging": 5% de peticiones lentas (+2s), con y sin AZURE_HEDGE_ENABLED,
+tras un calentamiento que estima el p95 base.
+
+Uso:
+    python -m benchmarks.resilience --requests 200 --concurrency 16
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import time
+
+import httpx
+
+from benchmarks.harness import adgenie_app, fake_azure, run_load
+
+# Mensajes únicos en toda la corrida: ni caché de respuestas ni single-flight
+_message_ids = itertools.count()
+
+
+async def _send_unique_message(client, i):
+    return await client.post("/chat/message", json={
+        "message": f"¿Cómo optimizo mi CTR en la campaña {next(_message_ids)}?",
+        "session_id": f"resilience-{i % 50}",
+    })
+
+
+def _phase(app_url: str, azure_url: str, faults: dict, requests: int, concurrency: int) -> dict:
+    httpx.post(f"{azure_url}/_faults", json=faults)
+    upstream_before = httpx.get(f"{azure_url}/_faults").json()["counters"]["requests"]
+    result = asyncio.run(run_load(app_url, _send_unique_message, concurrency, requests))
+    result["upstream_requests"] = httpx.get(f"{azure_url}/_faults").json()["counters"]["requests"] - upstream_before
+    result["azure"] = httpx.get(f"{app_url}/metrics/azure").json()
+    return result
+
+
+def breaker_scenario(azure_url: str, requests: int, concurrency: int, reset_seconds: float) -> dict:
+    env = {
+        "AZURE_LATENCY_BUDGET_MS": "1000",
+        "AZURE_BREAKER_FAILURES": "5",
+        "AZURE_BREAKER_RESET_SECONDS": str(reset_seconds),
+        # Sin reintentos del SDK: cada fallo inyectado llega al breaker
+        "AZURE_OPENAI_MAX_RETRIES": "0",
+    }
+    healthy = {"latency_ms": 200, "error_rate": 0.0, "slow_rate": 0.0}
+    phases = {}
+    with adgenie_app(azure_url, env=env) as app_url:
+        phases["healthy"] = _phase(app_url, azure_url, healthy, requests, concurrency)
+        phases["outage_http_500"] = _phase(
+            app_url, azure_url, {**healthy, "error_rate": 1.0, "error_status": 500}, requests, concurrency
+        )
+        time.sleep(reset_seconds)
+        phases["slow_5s"] = _phase(app_url, azure_url, {**healthy, "latency_ms": 5000}, requests, concurrency)
+        time.sleep(reset_seconds)
+        phases["recovery"] = _phase(app_url, azure_url, healthy, requests, concurrency)
+    return phases
+
+
+def hedging_scenario(azure_url: str, requests: int, concurrency: int) -> dict:
+    faults = {"latency_ms": 100, "error_rate": 0.0, "slow_rate": 0.05, "slow_ms": 2000}
+    results = {}
+    for hedge in ("0", "1"):
+        env = {"AZURE_HEDGE_ENABLED": hedge, "AZURE_HEDGE_MIN_SAMPLES": "20", "AZURE_LATENCY_BUDGET_MS": "8000"}
+        with adgenie_app(azure_url, env=env) as app_url:
+            # Calentamiento sin lentitud: el p95 base (retardo del hedge) ya está estimado
+            _phase(app_url, azure_url, {**faults, "slow_rate": 0.0}, 50, concurrency)
+            results[f"hedge_{'on' if hedge == '1' else 'off'}"] = _phase(app_url, azure_url, faults, requests, concurrency)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--reset-seconds", type=float, default=2.0)
+    args = parser.parse_args()
+
+    with fake_azure(latency_ms=200) as azure_url:
+        results = {
+            "breaker": breaker_scenario(azure_url, args.requests, args.concurrency, args.reset_seconds),
+            "hedging": hedging_scenario(azure_url, args.requests, args.concurrency),
+        }
+
+    print(json.dumps(results, indent=2))
+    for scenario, phases in results.items():
+        for name, phase in phases.items():
+            print(f"{scenario:>8}/{name:<16} p50={phase['p50_ms']:>9}ms  p99={phase['p99_ms']:>9}ms  "
+                  f"upstream={phase['upstream_requests']:>4}  breaker={phase['azure']['breaker']['state']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+# benchmarks/seed.py
+"""
+Genera una base SQLite con N interacciones sintéticas repartidas en los
+últimos D días (y sus agregados), para benchmarks.
+
+Uso:
+    python -m benchmarks.seed --db /tmp/adgenie_10m.db --rows 10000000
+"""
+
+import argparse
+import datetime
+import os
+import random
+import sqlite3
+import time
+
+CONTEXTS = ("MARKETING_OPTIMIZATION", "TECH_STACK", "GENERAL_INQUIRY", "DEFAULT_PROCESSING")
+CONTEXT_WEIGHTS = (0.6, 0.15, 0.15, 0.1)
+
+SAMPLE_QUESTIONS = (
+    "¿Cómo optimizo mi CTR en Google Ads?",
+    "¿Qué puja me conviene para bajar el CPC?",
+    "¿Cómo segmento audiencias en Meta Ads?",
+    "¿Usan FastAPI y React?",
+    "Hola, ¿quién eres?",
+    "¿Cuál es la capital de Francia?",
+)
+SAMPLE_REPLY = (
+    "Para mejorar el CTR revisa la relevancia de tus anuncios, prueba variantes "
+    "de titulares, ajusta las extensiones y excluye términos de búsqueda poco "
+    "relevantes. Mide cada cambio durante al menos una semana."
+)
+
+
+def _create_schema(db_path: str) -> None:
+    # Importación diferida: app.database lee ADGENIE_DB_PATH al importarse
+    from sqlalchemy import create_engine
+    from app.database import metadata
+    from app.models import aggregates, archive, campaigns, fingerprints, interactions, text_dictionaries, users # noqa: F401
+
+    engine = create_engine(f"sqlite:///{db_path}")
+    metadata.create_all(engine)
+    engine.dispose()
+
+
+def _build_aggregates(db_path: str) -> None:
+    from sqlalchemy import create_engine
+    from app.services import metrics_aggregates, metrics_rollups
+
+    engine = create_engine(f"sqlite:///{db_path}")
+    with engine.begin() as conn:
+        metrics_aggregates.rebuild(conn)
+        metrics_rollups.rebuild(conn)
+    engine.dispose()
+
+
+def _interaction_rows(rows: int, sessions: int, days: int, seed: int):
+    """Genera (user_id, context, message_type, message_text, created_at) en orden temporal."""
+    rng = random.Random(seed)
+    end = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+    start = end - datetime.timedelta(days=days)
+    step = (end - start) / max(rows // 2, 1)
+
+    current = start
+    for i in range(0, rows, 2):
+        user_id = rng.randrange(1, sessions + 1)
+        context = rng.choices(CONTEXTS, CONTEXT_WEIGHTS)[0]
+        created_at = current.strftime("%Y-%m-%d %H:%M:%S.%f")
+        yield (user_id, context, "USER", rng.choice(SAMPLE_QUESTIONS), created_at)
+        if i + 1 < rows:
+            yield (user_id, context, "BOT", SAMPLE_REPLY, created_at)
+        current += step
+
+
+def seed_interactions(db_path: str, rows: int, sessions: int = 10000, days: int = 30, seed: int = 42) -> float:
+    """Crea y llena la base; devuelve los segundos empleados."""
+    started = time.perf_counter()
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    _create_schema(db_path)
+
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode=OFF")
+    conn.execute("PRAGMA synchronous=OFF")
+    with conn:
+        conn.executemany(
+            "INSERT INTO users (id, session_id, name, created_at) VALUES (?, ?, 'Anonymous', CURRENT_TIMESTAMP)",
+            ((user_id, f"seed-session-{user_id}") for user_id in range(1, sessions + 1)),
+        )
+        conn.executemany(
+            "INSERT INTO chat_interactions (user_id, context, message_type, message_text, created_at) VALUES (?, ?, ?, ?, ?)",
+            _interaction_rows(rows, sessions, days, seed),
+        )
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.close()
+
+    _build_aggregates(db_path)
+    return time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", required=True)
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--sessions", type=int, default=10_000)
+    parser.add_argument("--days", type=int, default=30)
+    args = parser.parse_args()
+
+    elapsed = seed_interactions(args.db, args.rows, args.sessions, args.days)
+    print(f"{args.rows} interacciones sembradas en {args.db} ({elapsed:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+# benchmarks/suite.py
+"""
+Suite de benchmarks reproducible: levanta app.main:app contra el Azure
+falso (latencia configurable), con la base pre-sembrada en varios tamaños
+(10k / 1M / 10M interacciones), y mide /chat/message y /metrics/summary
+a distintas concurrencias. El resultado es un JSON (throughput y
+p50/p95/p99 por escenario) que se puede comparar entre commits.
+
+Las bases sembradas se guardan en --seed-dir y se reutilizan; cada corrida
+trabaja sobre una copia, así todas parten del mismo estado. Los mensajes y
+sesiones salen de un generador con semilla fija.
+
+Uso:
+    python -m benchmarks.suite --sizes 10k 1m --output /tmp/bench_head.json
+    python -m benchmarks.suite --sizes 10k --ref HEAD~3 --output /tmp/bench_old.json
+    python -m benchmarks.suite --sizes 10k --baseline /tmp/bench_old.json
+"""
+
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import tempfile
+
+from benchmarks.harness import ROOT_DIR, adgenie_app, fake_azure, git_worktree, run_load
+from benchmarks.seed import seed_interactions
+
+SIZES = {"10k": 10_000, "1m": 1_000_000, "10m": 10_000_000}
+SEED_SESSIONS = 10_000
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "chat_corpus.txt")
+
+
+def _git(*args: str, cwd: str = ROOT_DIR) -> str:
+    return subprocess.run(["git", *args], cwd=cwd, capture_output=True, text=True).stdout.strip()
+
+
+def _seeded_db(seed_dir: str, size: str) -> str:
+    """Ruta de la base sembrada para `size` (la crea la primera vez)."""
+    os.makedirs(seed_dir, exist_ok=True)
+    path = os.path.join(seed_dir, f"adgenie_seed_{size}.db")
+    if not os.path.exists(path):
+        print(f"Sembrando {SIZES[size]} interacciones en {path}...")
+        print(f"  listo en {seed_interactions(path, SIZES[size], SEED_SESSIONS):.1f}s")
+    return path
+
+
+def _chat_request_factory(seed: int):
+    """Peticiones deterministas: mensaje del corpus + sufijo único, sesión sembrada."""
+    with open(CORPUS_PATH, encoding="utf-8") as corpus_file:
+        corpus = [line.strip() for line in corpus_file if line.strip()]
+    rng = random.Random(seed)
+    plan = [(rng.choice(corpus), rng.randrange(1, SEED_SESSIONS + 1)) for _ in range(100_000)]
+
+    async def chat(client, i):
+        message, session = plan[i % len(plan)]
+        return await client.post("/chat/message", json={
+            "message": f"{message} (#{i})",
+            "session_id": f"seed-session-{session}",
+        })
+
+    return chat
+
+
+async def _metrics_summary(client, i):
+    return await client.get("/metrics/summary")
+
+
+def run_suite(args, app_dir: str) -> dict:
+    scenarios = []
+    with fake_azure(latency_ms=args.latency_ms) as azure_url:
+        for size in args.sizes:
+            seeded = _seeded_db(args.seed_dir, size)
+            for concurrency in args.concurrency:
+                with tempfile.TemporaryDirectory() as tmp:
+                    db_path = os.path.join(tmp, "bench.db")
+                    shutil.copy(seeded, db_path)
+                    with adgenie_app(azure_url, db_path=db_path, app_dir=app_dir, env=args.env) as app_url:
+                        for name, make_request in (
+                            ("chat_message", _chat_request_factory(args.seed)),
+                            ("metrics_summary", _metrics_summary),
+                        ):
+                            result = asyncio.run(run_load(app_url, make_request, concurrency, args.requests))
+                            result.update({"scenario": name, "db_size": size})
+                            scenarios.append(result)
+                            print(f"{size:>4} {name:<16} c={concurrency:<4} rps={result['rps']:>8} "
+                                  f"p50={result['p50_ms']}ms p95={result['p95_ms']}ms p99={result['p99_ms']}ms "
+                                  f"errors={result['errors']}")
+    return {
+        "meta": {
+            "ref": args.ref or "working-tree",
+            "commit": _git("rev-parse", "HEAD", cwd=app_dir),
+            "dirty": bool(_git("status", "--porcelain", "--untracked-files=no", cwd=app_dir)),
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+            "params": {
+                "sizes": args.sizes,
+                "concurrency": args.concurrency,
+                "requests": args.requests,
+                "latency_ms": args.latency_ms,
+                "seed": args.seed,
+                "env": args.env,
+            },
+        },
+        "scenarios": scenarios,
+    }
+
+
+def _scenario_key(scenario: dict) -> tuple:
+    return scenario["db_size"], scenario["scenario"], scenario["concurrency"]
+
+
+def compare(current: dict, baseline: dict) -> list[dict]:
+    """Deltas (%) de rps y p99 por escenario común a ambas corridas."""
+    previous = {_scenario_key(s): s for s in baseline["scenarios"]}
+    deltas = []
+    for scenario in current["scenarios"]:
+        before = previous.get(_scenario_key(scenario))
+        if before is None:
+            continue
+        deltas.append({
+            "db_size": scenario["db_size"],
+            "scenario": scenario["scenario"],
+            "concurrency": scenario["concurrency"],
+            "rps": [before["rps"], scenario["rps"]],
+            "rps_delta_pct": round((scenario["rps"] / before["rps"] - 1) * 100, 1) if before["rps"] else None,
+            "p99_ms": [before["p99_ms"], scenario["p99_ms"]],
+            "p99_delta_pct": round((scenario["p99_ms"] / before["p99_ms"] - 1) * 100, 1) if before["p99_ms"] else None,
+        })
+    return deltas
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", nargs="+", choices=list(SIZES), default=["10k", "1m"])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 16, 64])
+    parser.add_argument("--requests", type=int, default=500, help="peticiones por escenario")
+    parser.add_argument("--latency-ms", type=float, default=200.0, help="latencia del Azure falso")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--seed-dir", default=os.path.join(tempfile.gettempdir(), "adgenie_bench_seeds"))
+    parser.add_argument("--ref", default=None, help="revisión de git a medir (por defecto, el árbol actual)")
+    parser.add_argument("--env", type=json.loads, default={}, help='variables extra para la app, p. ej. \'{"CHAT_WRITE_BEHIND": "1"}\'')
+    parser.add_argument("--output", default=None, help="archivo JSON de resultados")
+    parser.add_argument("--baseline", default=None, help="JSON de una corrida anterior para comparar")
+    args = parser.parse_args()
+
+    if args.ref:
+        with git_worktree(args.ref) as app_dir:
+            results = run_suite(args, app_dir)
+    else:
+        results = run_suite(args, ROOT_DIR)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as baseline_file:
+            baseline = json.load(baseline_file)
+        results["comparison"] = {
+            "baseline_commit": baseline["meta"]["commit"],
+            "deltas": compare(results, baseline),
+        }
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output_file:
+            output_file.write(output + "\n")
+        print(f"Resultados en {args.output}")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+# benchmarks/text_codec.py
+"""
+Compresión de message_text con diccionario (app/services/text_codec.py)
+sobre un corpus sintético de preguntas y respuestas de marketing (frases
+de plantilla combinadas, con cifras y nombres variables):
+
+  - plain: N filas en TEXT; tamaño de la tabla y del índice del historial
+    (dbstat), filas/s de insert, latencia de una página de historial y
+    tiempo de una exportación completa;
+  - migrate: entrenamiento del diccionario, migración en línea de las N
+    filas, VACUUM y las mismas mediciones;
+  - insert: filas/s de insert sin y con compresión, sobre la misma tabla.
+
+Uso:
+    python -m benchmarks.text_codec --rows 200000 --sessions 5000
+"""
+
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from benchmarks.harness import percentile
+
+QUESTIONS = (
+    "¿Cómo mejoro el CTR de mi campaña {campaign}?",
+    "¿Qué presupuesto diario le asigno a {campaign} si vendo {product}?",
+    "Tengo un CPC de {money} en {network}, ¿es mucho?",
+    "¿Cómo segmento audiencias para {product} en {network}?",
+    "Genera un copy para lanzar {product} el {day} de noviembre",
+    "¿Qué palabras clave negativas agrego en {campaign}?",
+    "¿Conviene usar puja automática en {network} con {number} conversiones al mes?",
+    "Mi tasa de conversión bajó {percent} esta semana, ¿qué reviso?",
+)
+SENTENCES = (
+    "Para mejorar el CTR de {campaign}, revisa la relevancia de tus anuncios y prueba al menos {number} variantes de titulares.",
+    "Ajusta las extensiones de anuncio y excluye los términos de búsqueda poco relevantes que aparecen en el informe.",
+    "Mide cada cambio durante al menos una semana antes de sacar conclusiones.",
+    "Con un presupuesto diario de {money}, te recomiendo concentrar la inversión en {network} y en las audiencias que ya convierten.",
+    "Segmenta por intereses relacionados con {product} y crea audiencias similares a partir de tus clientes actuales.",
+    "Una puja automática necesita historial: con menos de {number} conversiones al mes conviene empezar con CPC manual.",
+    "Revisa la página de destino: tiempo de carga, coherencia con el anuncio y un llamado a la acción claro.",
+    "Una caída del {percent} en la tasa de conversión suele deberse a cambios en la segmentación, en la oferta o en la página de destino.",
+    "Te sugiero un copy breve que destaque el beneficio principal de {product} y una fecha concreta: el {day} de noviembre.",
+    "Agrega palabras clave negativas como 'gratis', 'curso' o 'empleo' si no aplican a {product}.",
+    "En {network}, los anuncios con imágenes de producto en uso suelen tener mejor tasa de clics que los genéricos.",
+    "Compara el costo por adquisición de {campaign} con el margen de {product} para decidir si escalar el presupuesto.",
+    "Puedes programar los anuncios en las franjas horarias con mejor rendimiento según el informe de las últimas {number} semanas.",
+    "No cambies más de una variable a la vez: así sabrás qué ajuste produjo la mejora.",
+    "Si el CPC de {money} está por encima del promedio de tu sector, mejora el nivel de calidad antes de subir la puja.",
+    "Para el remarketing, excluye a quienes ya compraron en los últimos {number} días.",
+)
+FILLS = {
+    "campaign": ["Verano", "Black Friday", "Lanzamiento", "Marca", "Búsqueda genérica", "Remarketing", "Navidad"],
+    "product": ["zapatillas", "cursos online", "seguros de auto", "software contable", "muebles", "cosméticos"],
+    "network": ["Google Ads", "Meta Ads", "TikTok Ads", "LinkedIn Ads", "Google Display"],
+}
+CONTEXTS = ("MARKETING_OPTIMIZATION", "TECH_STACK", "GENERAL_INQUIRY")
+
+
+def _fill(template: str, rng: random.Random) -> str:
+    return template.format(
+        campaign=rng.choice(FILLS["campaign"]), product=rng.choice(FILLS["product"]),
+        network=rng.choice(FILLS["network"]), money=f"${rng.uniform(0.1, 5):.2f}",
+        number=rng.randint(2, 60), percent=f"{rng.randint(5, 60)}%", day=rng.randint(1, 30),
+    )
+
+
+def _pairs(count: int, rng: random.Random) -> list[tuple[str, str]]:
+    return [
+        (_fill(rng.choice(QUESTIONS), rng),
+         " ".join(_fill(sentence, rng) for sentence in rng.sample(SENTENCES, rng.randint(3, 7))))
+        for _ in range(count)
+    ]
+
+
+def _insert(table, pairs: list[tuple[str, str]], sessions: int, rng: random.Random, batch_rows: int = 500) -> float:
+    """Inserta los pares (USER + BOT) en transacciones de `batch_rows` filas; devuelve filas/s."""
+    from sqlalchemy import insert
+    from app.database import engine
+
+    now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+    rows = []
+    for index, (question, reply) in enumerate(pairs):
+        user_id = rng.randrange(1, sessions + 1)
+        created_at = now + datetime.timedelta(microseconds=index)
+        context = rng.choice(CONTEXTS)
+        rows.append({"user_id": user_id, "context": context, "message_type": "USER",
+                     "message_text": question, "created_at": created_at})
+        rows.append({"user_id": user_id, "context": context, "message_type": "BOT",
+                     "message_text": reply, "created_at": created_at})
+
+    started = time.perf_counter()
+    for start in range(0, len(rows), batch_rows):
+        with engine.begin() as conn:
+            conn.execute(insert(table), rows[start:start + batch_rows])
+    return round(len(rows) / (time.perf_counter() - started))
+
+
+def _sizes() -> dict:
+    from app.database import engine
+
+    with engine.connect() as conn:
+        pages = dict(conn.exec_driver_sql(
+            "SELECT name, SUM(pgsize) FROM dbstat "
+            "WHERE name IN ('chat_interactions', 'ix_chat_interactions_user_history') GROUP BY name"
+        ).all())
+        page_size = conn.exec_driver_sql("PRAGMA page_size").scalar()
+        used = conn.exec_driver_sql("PRAGMA page_count").scalar() - conn.exec_driver_sql("PRAGMA freelist_count").scalar()
+    return {
+        "table_mb": round(pages.get("chat_interactions", 0) / 2**20, 1),
+        "history_index_mb": round(pages.get("ix_chat_interactions_user_history", 0) / 2**20, 1),
+        "db_used_mb": round(used * page_size / 2**20, 1),
+    }
+
+
+async def _reads(sessions: int, lookups: int, rng: random.Random) -> dict:
+    from app.services.export import ExportFilters, iter_pages
+    from app.services.history import read_page
+
+    samples = []
+    for _ in range(lookups):
+        session_id = f"bench-session-{rng.randrange(1, sessions + 1)}"
+        started = time.perf_counter()
+        await read_page(session_id, 20)
+        samples.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    rows = 0
+    async for page in iter_pages(ExportFilters()):
+        rows += len(page)
+    export_s = time.perf_counter() - started
+    return {
+        "history_p50_ms": round(statistics.median(samples) * 1000, 2),
+        "history_p99_ms": round(percentile(samples, 99) * 1000, 2),
+        "export_s": round(export_s, 2),
+        "export_rows_per_s": round(rows / export_s),
+    }
+
+
+async def _run(args) -> dict:
+    from sqlalchemy import text
+    from app.database import async_engine, engine
+    from app.models.interactions import ChatInteraction
+    from app.services import schema
+    from app.services.text_codec import text_codec
+
+    schema.migrate()
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO users (id, session_id, name) VALUES (:id, :session_id, 'Anonymous')"),
+                     [{"id": i, "session_id": f"bench-session-{i}"} for i in range(1, args.sessions + 1)])
+
+    rng = random.Random(0)
+    table = ChatInteraction.__table__
+    results = {}
+
+    text_codec.enabled = False
+    results["plain"] = {"insert_rows_per_s": _insert(table, _pairs(args.rows // 2, rng), args.sessions, rng),
+                        **_sizes(), **await _reads(args.sessions, args.lookups, random.Random(1))}
+
+    text_codec.enabled = True
+    started = time.perf_counter()
+    version = await text_codec.train()
+    train_s = time.perf_counter() - started
+    started = time.perf_counter()
+    migrated = await text_codec.migrate()
+    migrate_s = time.perf_counter() - started
+    with engine.connect() as conn:
+        conn.exec_driver_sql("VACUUM")
+    results["migrate"] = {
+        "dictionary_version": version,
+        "dictionary_bytes": text_codec.stats()["dictionary_bytes"],
+        "train_s": round(train_s, 2),
+        "migrated_rows": migrated,
+        "migrate_rows_per_s": round(migrated / migrate_s),
+        **_sizes(),
+        **await _reads(args.sessions, args.lookups, random.Random(1)),
+    }
+
+    # Misma tabla (ya comprimida) para las dos tasas de insert
+    extra = _pairs(args.insert_rows // 2, rng)
+    text_codec.enabled = False
+    plain_rate = _insert(table, extra, args.sessions, rng)
+    text_codec.enabled = True
+    compressed_rate = _insert(table, extra, args.sessions, rng)
+    results["insert"] = {"plain_rows_per_s": plain_rate, "compressed_rows_per_s": compressed_rate,
+                         "ratio": text_codec.stats()["ratio"]}
+
+    await async_engine.dispose()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--sessions", type=int, default=5_000)
+    parser.add_argument("--lookups", type=int, default=2_000)
+    parser.add_argument("--insert-rows", type=int, default=20_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Antes de importar app: app.database lee ADGENIE_DB_PATH al importarse
+        os.environ["ADGENIE_DB_PATH"] = os.path.join(tmp, "text_codec.db")
+        results = asyncio.run(_run(args))
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
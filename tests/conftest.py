@@ -0,0 +1,35 @@
+# tests/conftest.py
+
+import asyncio
+import os
+import tempfile
+
+import pytest
+
+# Antes de importar app: app.database lee ADGENIE_DB_PATH al importarse
+_TMP = tempfile.mkdtemp(prefix="adgenie-tests-")
+os.environ["ADGENIE_DB_PATH"] = os.path.join(_TMP, "adgenie.db")
+os.environ["ARCHIVE_DIR"] = os.path.join(_TMP, "archive")
+
+
+@pytest.fixture(scope="session", autouse=True)
+def schema():
+    from app.services import schema
+
+    schema.migrate()
+
+
+@pytest.fixture
+def run():
+    """Corre una corrutina en un loop nuevo y cierra el pool asíncrono (sus conexiones quedan atadas al loop)."""
+    from app.database import async_engine
+
+    def _run(coro):
+        async def main():
+            try:
+                return await coro
+            finally:
+                await async_engine.dispose()
+        return asyncio.run(main())
+
+    return _run
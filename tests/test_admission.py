@@ -0,0 +1,97 @@
+# tests/test_admission.py
+
+import pytest
+from fastapi import HTTPException
+
+from app.services import admission as admission_module
+from app.services.admission import AdmissionController, AdmissionRejected
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(admission_module, "time", fake)
+    return fake
+
+
+def _controller(rate: float = 2, burst: int = 3, max_pending: int = 0, max_sessions: int = 100) -> AdmissionController:
+    return AdmissionController(session_rate=rate, session_burst=burst, max_pending=max_pending,
+                               max_sessions=max_sessions, retry_after_seconds=1)
+
+
+def test_burst_then_rejection_with_exact_wait(clock):
+    controller = _controller(rate=2, burst=3)
+    for _ in range(3):
+        controller.admit("s").release()
+
+    with pytest.raises(AdmissionRejected) as rejected:
+        controller.admit("s")
+    assert rejected.value.reason == "session_rate"
+    # Ritmo de 2/s: el próximo lugar se libera en medio segundo
+    assert rejected.value.retry_after == pytest.approx(0.5)
+    assert rejected.value.retry_after_header == "1"
+
+    clock.now += 0.5
+    controller.admit("s").release()
+    # Otras sesiones no comparten el bucket
+    controller.admit("otra").release()
+    assert controller.stats()["throttled"] == 1
+
+
+def test_retry_after_header_rounds_up_the_wait(clock):
+    controller = _controller(rate=0.1, burst=1)
+    controller.admit("s").release()
+    clock.now += 2.5
+
+    with pytest.raises(AdmissionRejected) as rejected:
+        controller.admit("s")
+    assert rejected.value.retry_after == pytest.approx(7.5)
+    assert rejected.value.retry_after_header == "8"
+
+
+def test_overload_sheds_until_a_ticket_is_released(clock):
+    controller = _controller(rate=0, max_pending=2)
+    first, second = controller.admit("a"), controller.admit("b")
+
+    with pytest.raises(AdmissionRejected) as rejected:
+        controller.admit("c")
+    assert rejected.value.reason == "overload" and rejected.value.retry_after_header == "1"
+
+    with first:
+        pass
+    first.release()  # liberar dos veces no devuelve dos lugares
+    controller.admit("c")
+    with pytest.raises(AdmissionRejected):
+        controller.admit("d")
+    second.release()
+    assert controller.pending == 1 and controller.stats()["shed"] == 2
+
+
+def test_idle_sessions_are_forgotten(clock):
+    controller = _controller(rate=1, burst=2, max_sessions=2)
+    for session_id in ("a", "b"):
+        controller.admit(session_id).release()
+    clock.now += 10
+    controller.admit("c").release()
+    # TAT vencido = bucket lleno: olvidarlas no cambia ninguna decisión
+    assert controller.stats()["sessions"] == 1
+
+
+def test_chat_answers_429_with_retry_after(clock, monkeypatch):
+    from app.routers import chat
+
+    monkeypatch.setattr(chat, "admission", _controller(rate=1, burst=1))
+    chat.admit_or_429("s").release()
+
+    with pytest.raises(HTTPException) as response:
+        chat.admit_or_429("s")
+    assert response.value.status_code == 429
+    assert response.value.headers == {"Retry-After": "1"}
@@ -0,0 +1,121 @@
+# tests/test_archive.py
+
+import datetime
+
+import pytest
+from sqlalchemy import delete, func, insert, select
+
+from app.database import engine
+from app.models.archive import ArchivePartition
+from app.models.fingerprints import ReplyFingerprint
+from app.services.archive import LIVE_TABLE, ArchiveConflictError, ArchiveRotator, interaction_tables_sync
+from app.services.interaction_store import InteractionPair, persist_pairs
+
+NOW = datetime.datetime(2025, 1, 1)
+OLD = datetime.datetime(2024, 1, 5, 10, 0)
+
+
+@pytest.fixture
+def rotator(tmp_path):
+    with engine.begin() as conn:
+        conn.execute(delete(LIVE_TABLE))
+        conn.execute(delete(ReplyFingerprint))
+        conn.execute(delete(ArchivePartition))
+    # Lotes chicos: la rotación cruza varios lotes por mes
+    return ArchiveRotator(after_days=180, batch_rows=2, interval_seconds=0, archive_dir=str(tmp_path))
+
+
+def _insert_live(count: int, created_at: datetime.datetime = OLD) -> list[int]:
+    with engine.begin() as conn:
+        return [
+            conn.execute(insert(LIVE_TABLE).values(
+                user_id=1, context="GENERAL_INQUIRY", message_type="USER" if index % 2 == 0 else "BOT",
+                message_text=f"mensaje {index}", created_at=created_at,
+            )).inserted_primary_key[0]
+            for index in range(count)
+        ]
+
+
+def _counts() -> tuple[int, int]:
+    """(filas vivas, filas archivadas)."""
+    with engine.connect() as conn:
+        counts = [conn.execute(select(func.count()).select_from(table)).scalar() for table in interaction_tables_sync(conn)]
+    return counts[0], sum(counts[1:])
+
+
+def test_rotating_everything_twice_keeps_every_row(rotator, run):
+    first = _insert_live(4)
+    assert run(rotator.rotate(NOW)) == 4
+    assert _counts() == (0, 4)
+
+    # Con la tabla viva vacía, los ids siguen después de los archivados
+    second = _insert_live(3)
+    assert min(second) > max(first)
+
+    assert run(rotator.rotate(NOW)) == 3
+    assert _counts() == (0, 7)
+
+
+def test_pair_with_fingerprint_after_full_rotation(rotator, run):
+    archived = _insert_live(2)
+    run(rotator.rotate(NOW))
+
+    pair = InteractionPair(session_id="test-archive-session", user_message="¿Cómo mejoro el CTR?",
+                           bot_reply="Prueba otros titulares.", context="MARKETING_OPTIMIZATION",
+                           created_at=datetime.datetime(2024, 12, 30), simhash=0x1234)
+    run(persist_pairs([pair]))
+
+    with engine.connect() as conn:
+        reply_ids = conn.execute(select(ReplyFingerprint.reply_id)).scalars().all()
+    assert len(reply_ids) == 1 and reply_ids[0] > max(archived)
+
+
+def test_fingerprints_of_archived_replies_are_removed(rotator, run):
+    user_id, bot_id = _insert_live(2)
+    with engine.begin() as conn:
+        conn.execute(insert(ReplyFingerprint).values(reply_id=bot_id, context="GENERAL_INQUIRY", simhash=1))
+
+    run(rotator.rotate(NOW))
+    with engine.connect() as conn:
+        assert conn.execute(select(func.count()).select_from(ReplyFingerprint)).scalar() == 0
+
+
+def test_id_conflict_in_partition_fails_without_deleting(rotator, run):
+    (archived,) = _insert_live(1)
+    run(rotator.rotate(NOW))
+
+    # Misma id que la archivada, otro contenido (p. ej. una base restaurada de un respaldo)
+    with engine.begin() as conn:
+        conn.execute(insert(LIVE_TABLE).values(id=archived, user_id=2, message_type="USER",
+                                               message_text="otro", created_at=OLD + datetime.timedelta(days=1)))
+
+    with pytest.raises(ArchiveConflictError):
+        run(rotator.rotate(NOW))
+    assert _counts() == (1, 1)
+
+
+def test_same_keys_with_other_text_is_a_conflict(rotator, run):
+    (archived,) = _insert_live(1)
+    run(rotator.rotate(NOW))
+
+    # Mismo id, fecha, tipo y usuario que la archivada, pero otro texto: no es una copia previa
+    with engine.begin() as conn:
+        conn.execute(insert(LIVE_TABLE).values(id=archived, user_id=1, context="GENERAL_INQUIRY",
+                                               message_type="USER", message_text="otro texto", created_at=OLD))
+
+    with pytest.raises(ArchiveConflictError):
+        run(rotator.rotate(NOW))
+    assert _counts() == (1, 1)
+
+
+def test_batch_copied_before_a_crash_is_completed(rotator, run):
+    (archived,) = _insert_live(1)
+    run(rotator.rotate(NOW))
+
+    # Como si el proceso hubiera muerto tras el commit de la partición: la fila sigue viva, idéntica
+    with engine.begin() as conn:
+        conn.execute(insert(LIVE_TABLE).values(id=archived, user_id=1, context="GENERAL_INQUIRY",
+                                               message_type="USER", message_text="mensaje 0", created_at=OLD))
+
+    assert run(rotator.rotate(NOW)) == 1
+    assert _counts() == (0, 1)
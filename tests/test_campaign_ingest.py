@@ -0,0 +1,102 @@
+# tests/test_campaign_ingest.py
+
+import gzip
+
+import pytest
+from sqlalchemy import delete, select
+
+from app.database import engine
+from app.models.campaigns import Campaign, CampaignDailyStat
+from app.services.campaign_ingest import CampaignIngestor, IngestError
+
+HEADER = "Campaign,Day,Impr.,Clicks,Cost (USD),Conversions\n"
+
+
+@pytest.fixture(autouse=True)
+def empty_tables():
+    with engine.begin() as conn:
+        conn.execute(delete(CampaignDailyStat))
+        conn.execute(delete(Campaign))
+
+
+def _ingestor(batch_rows: int = 100, max_errors: int = 100) -> CampaignIngestor:
+    return CampaignIngestor(batch_rows=batch_rows, max_errors=max_errors, spool_bytes=1024)
+
+
+def _stored() -> list[tuple]:
+    with engine.connect() as conn:
+        return [tuple(row) for row in conn.execute(
+            select(Campaign.name, CampaignDailyStat.date, CampaignDailyStat.impressions, CampaignDailyStat.clicks,
+                   CampaignDailyStat.cost, CampaignDailyStat.conversions)
+            .join(Campaign, Campaign.id == CampaignDailyStat.campaign_id)
+            .order_by(Campaign.name, CampaignDailyStat.date)
+        )]
+
+
+def test_malformed_rows_are_rejected_with_their_reason(run):
+    lines = (HEADER
+             + "Búsqueda,2025-03-01,100,5,2.5,1\n"
+             + ",2025-03-01,10,1,1,0\n"
+             + "Búsqueda,01/03/2025,10,1,1,0\n"
+             + "Búsqueda,2025-03-02,diez,1,1,0\n"
+             + "Búsqueda,2025-03-03,10,-1,1,0\n"
+             + "Búsqueda,2025-03-04\n"
+             + "Display,2025-03-01,200,4,3,\n").splitlines(keepends=True)
+
+    # Lotes de 3: los números de fila siguen la numeración del archivo entre lotes
+    report = run(_ingestor(batch_rows=3).ingest(lines, "csv"))
+
+    assert (report.rows, report.accepted, report.rejected, report.campaigns_created) == (7, 2, 5, 2)
+    assert report.errors == [
+        {"row": 2, "reason": "campaña vacía"},
+        {"row": 3, "reason": "fecha inválida (se espera AAAA-MM-DD)"},
+        {"row": 4, "reason": "métrica no numérica o negativa"},
+        {"row": 5, "reason": "métrica no numérica o negativa"},
+        {"row": 6, "reason": "fila incompleta o ilegible"},
+    ]
+    # Conversiones en blanco = 0
+    assert [(name, str(day), *metrics) for name, day, *metrics in _stored()] == [
+        ("Búsqueda", "2025-03-01", 100, 5, 2.5, 1.0),
+        ("Display", "2025-03-01", 200, 4, 3.0, 0.0),
+    ]
+
+
+def test_ndjson_reload_updates_the_day_instead_of_duplicating(run):
+    first = ['{"campaign": "Meta", "date": "2025-03-01", "impressions": 10, "clicks": 1, "cost": 1, "conversions": 0}\n']
+    second = [
+        '{"campaign": "Meta", "date": "2025-03-01", "impressions": 30, "clicks": 3, "cost": 2, "conversions": 1}\n',
+        "{no es json\n",
+    ]
+
+    run(_ingestor().ingest(first, "ndjson"))
+    report = run(_ingestor().ingest(second, "ndjson"))
+
+    assert (report.accepted, report.rejected, report.campaigns_created) == (1, 1, 0)
+    assert report.errors == [{"row": 2, "reason": "fila incompleta o ilegible"}]
+    assert [metrics for _, _, *metrics in _stored()] == [[30, 3, 2.0, 1.0]]
+
+
+def test_error_detail_is_capped_but_every_rejection_is_counted(run):
+    lines = [HEADER] + [f"X,2025-03-{day:02d},-1,0,0,0\n" for day in range(1, 11)]
+
+    report = run(_ingestor(max_errors=3).ingest(lines, "csv"))
+
+    assert report.rejected == 10
+    assert [error["row"] for error in report.errors] == [1, 2, 3]
+
+
+def test_missing_column_and_unknown_format_are_refused(run):
+    with pytest.raises(IngestError):
+        run(_ingestor().ingest(["Campaign,Day,Clicks\n"], "csv"))
+    with pytest.raises(IngestError):
+        run(_ingestor().ingest([HEADER], "xlsx"))
+
+
+def test_truncated_gzip_body_is_an_ingest_error(run):
+    body = gzip.compress((HEADER + "Búsqueda,2025-03-01,100,5,2.5,1\n").encode("utf-8"))
+
+    async def chunks():
+        yield body[:len(body) // 2]
+
+    with pytest.raises(IngestError):
+        run(_ingestor().ingest_stream(chunks(), "csv", gzipped=True))
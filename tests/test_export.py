@@ -0,0 +1,109 @@
+# tests/test_export.py
+
+import asyncio
+import datetime
+import gc
+import json
+
+import pytest
+from sqlalchemy import delete, event, insert
+
+from app.database import async_engine, engine
+from app.models.archive import ArchivePartition
+from app.models.fingerprints import ReplyFingerprint
+from app.services import archive
+from app.services.archive import LIVE_TABLE, ArchiveRotator
+from app.services.export import ExportFilters, export_stream
+
+ARCHIVED_ROWS = 4
+
+
+@pytest.fixture
+def archived(tmp_path, run):
+    """Tabla viva vacía y ARCHIVED_ROWS filas en una partición: la exportación entera lee la partición."""
+    with engine.begin() as conn:
+        conn.execute(delete(LIVE_TABLE))
+        conn.execute(delete(ReplyFingerprint))
+        conn.execute(delete(ArchivePartition))
+        conn.execute(insert(LIVE_TABLE), [
+            {"user_id": 1, "context": "GENERAL_INQUIRY", "message_type": "USER",
+             "message_text": f"mensaje {index}", "created_at": datetime.datetime(2024, 1, 5, 10, index)}
+            for index in range(ARCHIVED_ROWS)
+        ])
+    rotator = ArchiveRotator(after_days=180, batch_rows=100, interval_seconds=0, archive_dir=str(tmp_path))
+    assert run(rotator.rotate(datetime.datetime(2025, 1, 1))) == ARCHIVED_ROWS
+
+
+async def _export_all() -> int:
+    rows = 0
+    async for chunk in export_stream(ExportFilters(), "ndjson", page_rows=1):
+        rows += sum(1 for line in chunk.decode().splitlines() if json.loads(line))
+    return rows
+
+
+def test_abandoned_export_detaches_partition(archived, run):
+    async def abandon_then_export() -> list[int]:
+        stream = export_stream(ExportFilters(), "ndjson", page_rows=1)
+        async for _ in stream:
+            # El cliente se va con la partición adjunta (una fila por página)
+            break
+        # Como un StreamingResponse abandonado: nadie llama aclose(); lo finaliza el GC
+        del stream
+        gc.collect()
+        for _ in range(5):
+            await asyncio.sleep(0)
+        # Cada conexión del pool debe poder volver a adjuntar la partición
+        return [await _export_all() for _ in range(async_engine.pool.size() + 1)]
+
+    assert run(abandon_then_export()) == [ARCHIVED_ROWS] * (async_engine.pool.size() + 1)
+
+
+def test_attach_tolerates_partition_left_attached(archived, run):
+    async def attach_twice() -> int:
+        (month, path), = await _partitions()
+        async with async_engine.connect() as conn:
+            # Un DETACH que nunca corrió en esta conexión
+            await conn.exec_driver_sql(f"ATTACH DATABASE ? AS archive_{month:%Y_%m}", (path,))
+            async with archive.attach(conn, month, path) as table:
+                return len((await conn.execute(table.select())).all())
+
+    assert run(attach_twice()) == ARCHIVED_ROWS
+
+
+def test_context_only_export_is_bounded_by_the_context_index(archived, run):
+    with engine.begin() as conn:
+        conn.execute(insert(LIVE_TABLE), [
+            {"user_id": 1, "context": context, "message_type": "BOT", "message_text": context,
+             "created_at": datetime.datetime(2025, 6, 1)}
+            for context in ("MARKETING_OPTIMIZATION", "TECH_STACK", "MARKETING_OPTIMIZATION")
+        ])
+
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("SELECT") and "FROM chat_interactions" in statement:
+            statements.append((statement, parameters))
+
+    async def export_context() -> list[dict]:
+        rows = []
+        async for chunk in export_stream(ExportFilters(context="MARKETING_OPTIMIZATION"), "ndjson", page_rows=1):
+            rows += [json.loads(line) for line in chunk.decode().splitlines()]
+        return rows
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", record)
+    try:
+        rows = run(export_context())
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", record)
+
+    assert [row["message_text"] for row in rows] == ["MARKETING_OPTIMIZATION"] * 2
+    # Límites y páginas de la tabla viva: por el índice de context, sin recorrer la PK entera
+    with engine.connect() as conn:
+        plans = [" ".join(row[3] for row in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters))
+                 for statement, parameters in statements]
+    assert plans and all("ix_chat_interactions_context (context=?" in plan for plan in plans)
+
+
+async def _partitions() -> list[tuple]:
+    async with async_engine.connect() as conn:
+        return await archive.archived_partitions(conn, None, None)
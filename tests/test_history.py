@@ -0,0 +1,100 @@
+# tests/test_history.py
+
+import datetime
+
+import pytest
+from sqlalchemy import delete, insert
+
+from app.database import engine
+from app.models.archive import ArchivePartition
+from app.models.fingerprints import ReplyFingerprint
+from app.models.interactions import ChatInteraction
+from app.models.users import User
+from app.services import archive, conversation_memory, history
+from app.services.archive import LIVE_TABLE, ArchiveRotator
+
+SESSION = "test-history-session"
+MONTHS = [datetime.datetime(2024, month, 10) for month in (1, 2, 3, 4)]
+LIVE_ROWS = 2
+ARCHIVED_PER_MONTH = 3
+
+
+@pytest.fixture
+def session_rows(tmp_path, run):
+    """ARCHIVED_PER_MONTH filas por mes archivado en MONTHS y LIVE_ROWS recientes; devuelve los textos en orden."""
+    with engine.begin() as conn:
+        conn.execute(delete(LIVE_TABLE))
+        conn.execute(delete(ReplyFingerprint))
+        conn.execute(delete(ArchivePartition))
+        conn.execute(delete(User).where(User.session_id == SESSION))
+        user_id = conn.execute(insert(User).values(session_id=SESSION)).inserted_primary_key[0]
+        created = [month + datetime.timedelta(hours=index) for month in MONTHS for index in range(ARCHIVED_PER_MONTH)]
+        rows = [{"user_id": user_id, "message_type": "USER", "message_text": f"archivado {index}", "created_at": at}
+                for index, at in enumerate(created)]
+        conn.execute(insert(LIVE_TABLE), rows)
+    rotator = ArchiveRotator(after_days=180, batch_rows=100, interval_seconds=0, archive_dir=str(tmp_path))
+    run(rotator.rotate(datetime.datetime(2025, 1, 1)))
+
+    now = archive.archive_cutoff() + datetime.timedelta(days=1)
+    live = [{"user_id": user_id, "message_type": "BOT", "message_text": f"vivo {index}",
+             "created_at": now + datetime.timedelta(minutes=index)} for index in range(LIVE_ROWS)]
+    with engine.begin() as conn:
+        conn.execute(insert(LIVE_TABLE), live)
+    return [row["message_text"] for row in rows + live]
+
+
+@pytest.fixture
+def attached(monkeypatch):
+    """Meses de las particiones que read_page adjunta."""
+    months = []
+    real_attach = history.attach
+
+    def counting_attach(conn, month, path, *args, **kwargs):
+        months.append(month)
+        return real_attach(conn, month, path, *args, **kwargs)
+
+    monkeypatch.setattr(history, "attach", counting_attach)
+    return months
+
+
+def test_newest_page_attaches_only_the_partitions_it_needs(session_rows, attached, run):
+    page = run(history.read_page(SESSION, limit=LIVE_ROWS + 2))
+
+    assert [row["message_text"] for row in page.rows] == session_rows[-(LIVE_ROWS + 2):]
+    assert page.has_more
+    # La tabla viva no llena la página: solo se abre el último mes archivado
+    assert attached == [datetime.datetime(2024, 4, 1)]
+
+
+def test_paging_backwards_and_forwards_covers_every_row(session_rows, run):
+    texts, before = [], None
+    while True:
+        page = run(history.read_page(SESSION, limit=2, before=before))
+        texts = [row["message_text"] for row in page.rows] + texts
+        before = page.before
+        if not page.has_more:
+            break
+    assert texts == session_rows
+
+    texts, after = [], history.Cursor(datetime.datetime(2023, 12, 31), 0)
+    while True:
+        page = run(history.read_page(SESSION, limit=4, after=after))
+        texts += [row["message_text"] for row in page.rows]
+        after = page.after
+        if not page.has_more:
+            break
+    assert texts == session_rows
+
+
+def test_history_index_does_not_store_message_text():
+    index = next(i for i in ChatInteraction.__table__.indexes if i.name == "ix_chat_interactions_user_history")
+    with engine.begin() as conn:
+        # Índice de v3, con message_text
+        conn.exec_driver_sql(f"DROP INDEX {index.name}")
+        conn.exec_driver_sql(f"CREATE INDEX {index.name} ON chat_interactions "
+                             "(user_id, created_at, id, message_type, context, message_text)")
+
+    conversation_memory.ensure_index()
+    with engine.connect() as conn:
+        columns = [row[2] for row in conn.exec_driver_sql(f"PRAGMA index_info({index.name})")]
+    assert columns == ["user_id", "created_at", "id", "message_type", "context"]
@@ -0,0 +1,32 @@
+# tests/test_intent.py
+
+import pytest
+
+from app.services.intent import IntentClassifier
+
+classifier = IntentClassifier.from_file()
+
+
+@pytest.mark.parametrize("message", [
+    "Hola",
+    "Buenos días",
+    "buenas tardes, ¿cómo estás?",
+    "hola, ¿qué eres?",
+    "Gracias!",
+    "Chau, hasta luego",
+    "qué tal",
+])
+def test_greetings_are_answered_locally(message):
+    assert classifier.classify(message).short_circuit
+
+
+@pytest.mark.parametrize("message", [
+    # Saludo o palabra "fuera de tema" dentro de una consulta real: debe llegar al LLM
+    "Hola, ¿cómo mejoro mis ventas en Instagram?",
+    "¿En cuánto tiempo veo resultados?",
+    "gracias, y cómo escalo mi tienda online?",
+    "que tal funciona tiktok para vender",
+    "Hola, ¿qué tal? Quiero bajar el CPC",
+])
+def test_mixed_messages_reach_the_llm(message):
+    assert not classifier.classify(message).short_circuit
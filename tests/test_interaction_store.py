@@ -0,0 +1,47 @@
+# tests/test_interaction_store.py
+
+import datetime
+
+from sqlalchemy import insert, select
+
+from app.database import engine
+from app.models.fingerprints import ReplyFingerprint
+from app.models.interactions import ChatInteraction
+from app.services.interaction_store import InteractionPair, persist_pairs
+
+
+def test_fingerprints_point_at_their_bot_rows(run):
+    created_at = datetime.datetime(2025, 1, 2)
+    pairs = [
+        InteractionPair(session_id=f"test-store-{index}", user_message=f"pregunta {index}",
+                        bot_reply=f"respuesta {index}", context="MARKETING_OPTIMIZATION",
+                        created_at=created_at, simhash=None if index == 1 else 1000 + index)
+        for index in range(4)
+    ]
+    run(persist_pairs(pairs))
+
+    with engine.connect() as conn:
+        rows = conn.execute(
+            select(ReplyFingerprint.simhash, ChatInteraction.message_type, ChatInteraction.message_text)
+            .join(ChatInteraction, ChatInteraction.id == ReplyFingerprint.reply_id)
+            .where(ReplyFingerprint.simhash.between(1000, 1003))
+            .order_by(ReplyFingerprint.simhash)
+        ).all()
+    assert [tuple(row) for row in rows] == [
+        (1000, "BOT", "respuesta 0"), (1002, "BOT", "respuesta 2"), (1003, "BOT", "respuesta 3"),
+    ]
+
+
+def test_ids_continue_after_rows_inserted_elsewhere(run):
+    with engine.begin() as conn:
+        # Un id suelto muy por encima de la secuencia (p. ej. una fila restaurada a mano)
+        conn.execute(insert(ChatInteraction).values(id=10_000_000, message_type="USER", message_text="suelta"))
+
+    pair = InteractionPair(session_id="test-store-gap", user_message="hola", bot_reply="respuesta con hueco",
+                           context="GENERAL_INQUIRY", created_at=datetime.datetime(2025, 1, 3), simhash=2000)
+    run(persist_pairs([pair]))
+
+    with engine.connect() as conn:
+        reply_id = conn.execute(select(ReplyFingerprint.reply_id).where(ReplyFingerprint.simhash == 2000)).scalar()
+        text = conn.execute(select(ChatInteraction.message_text).where(ChatInteraction.id == reply_id)).scalar()
+    assert reply_id == 10_000_002 and text == "respuesta con hueco"
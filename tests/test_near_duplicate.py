@@ -0,0 +1,122 @@
+# tests/test_near_duplicate.py
+
+import asyncio
+import hashlib
+
+import pytest
+from sqlalchemy import delete, insert
+
+from app.database import engine
+from app.models.fingerprints import ReplyFingerprint
+from app.services.archive import LIVE_TABLE
+from app.services.near_duplicate import NearDuplicateIndex, simhash, to_signed, to_unsigned
+
+CONTEXT = "MARKETING_OPTIMIZATION"
+QUESTION = "cómo bajo mi CPC en Google Ads"
+
+
+@pytest.fixture
+def index() -> NearDuplicateIndex:
+    index = NearDuplicateIndex.from_file()
+    index.enabled, index.max_entries = True, 1000
+    return index
+
+
+@pytest.fixture
+def empty_tables():
+    with engine.begin() as conn:
+        conn.execute(delete(LIVE_TABLE))
+        conn.execute(delete(ReplyFingerprint))
+    yield
+    with engine.begin() as conn:
+        conn.execute(delete(LIVE_TABLE))
+        conn.execute(delete(ReplyFingerprint))
+
+
+def _naive_simhash(terms: tuple[str, ...]) -> int:
+    counts = [0] * 64
+    for term in terms:
+        term_hash = int.from_bytes(hashlib.blake2b(term.encode("utf-8"), digest_size=8).digest(), "little")
+        for bit in range(64):
+            counts[bit] += term_hash >> bit & 1
+    return sum(1 << bit for bit, count in enumerate(counts) if 2 * count > len(terms))
+
+
+def test_simhash_matches_the_bit_by_bit_definition():
+    for terms in (("cpc",), ("cpc", "googl"), ("a", "b", "c", "d"), tuple(f"t{n}" for n in range(40))):
+        assert simhash(terms) == _naive_simhash(terms)
+    fingerprint = simhash(("cpc", "googl", "reduc"))
+    assert to_unsigned(to_signed(fingerprint)) == fingerprint
+    assert -(1 << 63) <= to_signed(fingerprint) < 1 << 63
+
+
+def test_paraphrases_share_a_fingerprint(index):
+    # Sin palabras vacías, sinónimos a su forma canónica y truncado a 5 letras
+    assert index.terms(QUESTION) == index.terms("como reducir el cpc de google ads?")
+    assert index.fingerprint(QUESTION) == index.fingerprint("Cómo REDUCIR el CPC de Google ads")
+    assert index.fingerprint("hola") is None
+
+
+def test_find_within_the_distance_and_the_context(index):
+    fingerprint = index.fingerprint(QUESTION)
+    # Un bit distinto en tres bandas distintas: distancia 3, el máximo con umbral 0.95
+    assert index.add(7, CONTEXT, fingerprint ^ (1 << 2 | 1 << 20 | 1 << 40))
+    assert index.add(9, "TECH_STACK", index.fingerprint("qué framework usa el backend"))
+
+    assert index.find(QUESTION, CONTEXT) == (7, pytest.approx(1 - 3 / 64))
+    assert index.find(QUESTION, "TECH_STACK") is None
+    assert index.find("presupuesto diario para campañas de Meta", CONTEXT) is None
+
+    index.add(8, CONTEXT, fingerprint ^ (1 << 2 | 1 << 20 | 1 << 40 | 1 << 60))
+    # La más parecida gana; a distancia 4 ya no se reutiliza
+    assert index.find(QUESTION, CONTEXT)[0] == 7
+
+
+def test_identical_fingerprint_is_indexed_once_per_context(index):
+    fingerprint = index.fingerprint(QUESTION)
+    assert index.add(1, CONTEXT, fingerprint)
+    assert not index.add(2, CONTEXT, fingerprint)
+    assert index.add(3, "TECH_STACK", fingerprint)
+
+    index.max_entries = 2
+    assert not index.add(4, CONTEXT, fingerprint ^ 1)
+    assert index.stats()["skipped_duplicates"] == 1 and index.stats()["dropped"] == 1
+
+
+def test_lookup_reads_the_reply_and_drops_archived_ones(index, empty_tables, run):
+    with engine.begin() as conn:
+        reply_id = conn.execute(insert(LIVE_TABLE).values(
+            message_type="BOT", message_text="Revisá la concordancia de palabras clave.", context=CONTEXT,
+        )).inserted_primary_key[0]
+    index.add(reply_id, CONTEXT, index.fingerprint(QUESTION))
+
+    assert run(index.lookup("como reducir el cpc de google ads?")) == ("Revisá la concordancia de palabras clave.",
+                                                                       CONTEXT)
+
+    with engine.begin() as conn:
+        conn.execute(delete(LIVE_TABLE))
+    assert run(index.lookup(QUESTION)) is None
+    # La entrada quedó descartada: la siguiente búsqueda no vuelve a la base
+    assert run(index.lookup(QUESTION)) is None
+    assert index.stats()["stale"] == 1 and index.stats()["hits"] == 1
+
+
+def test_reload_keeps_the_newest_reply_and_entries_added_meanwhile(index, empty_tables, run):
+    fingerprint = index.fingerprint(QUESTION)
+    with engine.begin() as conn:
+        conn.execute(insert(ReplyFingerprint), [
+            {"reply_id": reply_id, "context": CONTEXT, "simhash": to_signed(fingerprint)} for reply_id in (10, 20)
+        ])
+
+    async def reload():
+        await index.start()
+        await asyncio.sleep(0)
+        # Llega mientras se arma la tabla nueva: se reaplica al terminar
+        index.add(30, "TECH_STACK", fingerprint)
+        await index._task
+        await index.stop()
+
+    run(reload())
+    assert index.stats()["entries"] == 2 and index.stats()["load_ms"] is not None
+    assert index.find(QUESTION, CONTEXT)[0] == 20
+    assert index.find(QUESTION, "TECH_STACK")[0] == 30
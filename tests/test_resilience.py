@@ -0,0 +1,135 @@
+# tests/test_resilience.py
+
+import asyncio
+import time
+
+import pytest
+
+from app.services.resilience import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError, GuardedCall
+from app.services.telemetry import Histogram
+
+RESET_SECONDS = 0.05
+
+
+class Boom(Exception):
+    pass
+
+
+def _guard(breaker: CircuitBreaker, budget_seconds: float = 1.0) -> GuardedCall:
+    return GuardedCall(breaker, budget_seconds=budget_seconds, hedge=False, latency=Histogram("test", "test"),
+                       hedge_min_samples=20, hedge_min_delay=0.05)
+
+
+def _opened(failures: int = 3) -> CircuitBreaker:
+    breaker = CircuitBreaker(failure_threshold=failures, reset_seconds=RESET_SECONDS)
+    for _ in range(failures):
+        assert breaker.allow()
+        breaker.record_failure()
+    return breaker
+
+
+def test_opens_after_consecutive_failures():
+    breaker = CircuitBreaker(failure_threshold=3, reset_seconds=RESET_SECONDS)
+    for _ in range(2):
+        breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    # Un éxito reinicia la cuenta: todavía cerrado
+    assert breaker.state == CLOSED and breaker.allow()
+
+    breaker = _opened()
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+    assert breaker.stats()["trips"] == 1 and breaker.stats()["rejected"] == 1
+
+
+def test_half_open_lets_a_single_probe_through():
+    breaker = _opened()
+    time.sleep(RESET_SECONDS)
+
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    # Con la sonda en vuelo, el resto sigue yendo al fallback
+    assert not breaker.allow()
+    assert not breaker.allow()
+
+    breaker.record_success()
+    assert breaker.state == CLOSED and breaker.consecutive_failures == 0
+    assert breaker.allow() and breaker.allow()
+
+
+def test_failed_probe_reopens_for_another_cooldown():
+    breaker = _opened()
+    time.sleep(RESET_SECONDS)
+    assert breaker.allow()
+
+    breaker.record_failure()
+    assert breaker.state == OPEN and breaker.stats()["trips"] == 2
+    assert not breaker.allow()
+    time.sleep(RESET_SECONDS)
+    assert breaker.allow() and breaker.state == HALF_OPEN
+
+
+def test_guarded_call_sends_one_probe_and_rejects_the_rest():
+    breaker = _opened()
+    guard = _guard(breaker)
+
+    async def scenario():
+        with pytest.raises(CircuitOpenError):
+            await guard(lambda: asyncio.sleep(0, "no llega"))
+        await asyncio.sleep(RESET_SECONDS)
+
+        release = asyncio.Event()
+
+        async def slow_probe():
+            await release.wait()
+            return "ok"
+
+        probe = asyncio.create_task(guard(slow_probe))
+        await asyncio.sleep(0)
+        # Mientras la sonda espera, las demás llamadas no llegan al servicio
+        with pytest.raises(CircuitOpenError):
+            await guard(slow_probe)
+        release.set()
+        assert await probe == "ok"
+        return await guard(lambda: asyncio.sleep(0, "cerrado"))
+
+    assert asyncio.run(scenario()) == "cerrado"
+    assert breaker.state == CLOSED
+
+
+def test_cancelled_probe_releases_the_slot_without_counting_a_failure():
+    breaker = _opened()
+    guard = _guard(breaker)
+
+    async def scenario():
+        await asyncio.sleep(RESET_SECONDS)
+        probe = asyncio.create_task(guard(asyncio.Event().wait))
+        await asyncio.sleep(0)
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+        # El cliente se fue: la próxima llamada puede ser la sonda
+        return await guard(lambda: asyncio.sleep(0, "ok"))
+
+    assert asyncio.run(scenario()) == "ok"
+    assert breaker.state == CLOSED and breaker.stats()["trips"] == 1
+
+
+def test_timeouts_count_as_failures():
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=RESET_SECONDS)
+    guard = _guard(breaker, budget_seconds=0.01)
+
+    async def scenario():
+        for _ in range(2):
+            with pytest.raises(asyncio.TimeoutError):
+                await guard(asyncio.Event().wait)
+
+        async def failing():
+            raise Boom
+
+        with pytest.raises(CircuitOpenError):
+            await guard(failing)
+
+    asyncio.run(scenario())
+    assert breaker.state == OPEN and guard.stats()["timeouts"] == 2
@@ -0,0 +1,25 @@
+# tests/test_structured_logging.py
+
+import json
+import logging
+
+import pytest
+
+from app.services.structured_logging import REDACTED, JsonFormatter
+
+
+def _format(**extra) -> dict:
+    record = logging.LogRecord("app.test", logging.INFO, __file__, 1, "respuesta", (), None)
+    record.__dict__.update(extra)
+    return json.loads(JsonFormatter().format(record))
+
+
+@pytest.mark.parametrize("key", ["prompt_tokens", "completion_tokens", "total_tokens", "token_count"])
+def test_usage_counts_are_logged(key):
+    assert _format(**{key: 42})[key] == 42
+
+
+@pytest.mark.parametrize("key", ["token", "access_token", "refresh-token", "api_key", "AZURE_OPENAI_API_KEY",
+                                 "client_secret", "password", "Authorization"])
+def test_secret_fields_are_redacted(key):
+    assert _format(**{key: "valor-secreto"})[key] == REDACTED
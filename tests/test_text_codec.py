@@ -0,0 +1,97 @@
+# tests/test_text_codec.py
+
+import asyncio
+
+import pytest
+from sqlalchemy import delete, insert, select
+
+from app.database import engine
+from app.models.interactions import ChatInteraction
+from app.models.text_dictionaries import TextDictionary
+from app.services.archive import LIVE_TABLE
+from app.services.text_codec import STORED_VERSION, TextCodec, UnknownDictionaryError, text_codec, train_dictionary
+
+SAMPLES = [
+    f"Para mejorar el CTR de la campaña {index} conviene probar otros titulares y revisar la segmentación "
+    f"de la audiencia; después comparar el CPC contra el promedio de la cuenta."
+    for index in range(60)
+]
+
+
+def _codec() -> TextCodec:
+    return TextCodec(enabled=True, level=6, dict_bytes=4096, sample_rows=100, min_sample_rows=10,
+                     migrate_batch_rows=7, refresh_seconds=0)
+
+
+@pytest.fixture
+def dictionary(monkeypatch):
+    """Un diccionario entrenado con SAMPLES como única versión guardada."""
+    # migrate() carga el diccionario en la instancia de la columna: se restaura al terminar
+    for name, value in (("_dictionaries", {}), ("_current", None), ("_refreshed", False)):
+        monkeypatch.setattr(text_codec, name, value)
+    with engine.begin() as conn:
+        conn.execute(delete(LIVE_TABLE))
+        conn.execute(delete(TextDictionary))
+        conn.execute(insert(TextDictionary).values(version=1, dictionary=train_dictionary(SAMPLES, 4096),
+                                                   sample_rows=len(SAMPLES)))
+    yield 1
+    with engine.begin() as conn:
+        conn.execute(delete(LIVE_TABLE))
+        conn.execute(delete(TextDictionary))
+
+
+def test_round_trip_with_dictionary(dictionary):
+    codec = _codec()
+    codec.refresh()
+
+    value = codec.encode(SAMPLES[0])
+    assert int.from_bytes(value[:2], "big") == dictionary
+    assert len(value) < len(SAMPLES[0].encode("utf-8")) // 2
+    assert codec.decode(value) == SAMPLES[0]
+
+
+def test_version_zero_and_text_pass_through(dictionary):
+    codec = _codec()
+    codec.refresh()
+
+    # Deflate no achica un mensaje de dos letras: se guarda como versión 0 (UTF-8 tal cual)
+    value = codec.encode("ok")
+    assert value == STORED_VERSION.to_bytes(2, "big") + b"ok"
+    assert codec.decode(value) == "ok"
+    assert codec.decode(STORED_VERSION.to_bytes(2, "big") + "señal".encode("utf-8")) == "señal"
+    # Filas anteriores a la compresión (TEXT)
+    assert codec.decode("texto plano") == "texto plano"
+    assert codec.decode(None) is None
+
+
+def test_unloaded_codec_writes_text_without_touching_the_database(dictionary):
+    codec = _codec()
+    assert codec.encode(SAMPLES[0]) == SAMPLES[0]
+    assert codec.current_version is None
+
+
+def test_unknown_version_in_the_loop_raises_and_schedules_a_refresh(dictionary, run):
+    writer, reader = _codec(), _codec()
+    writer.refresh()
+    value = writer.encode(SAMPLES[1])
+
+    async def read_twice():
+        with pytest.raises(UnknownDictionaryError):
+            reader.decode(value)
+        # El refresco corre en un hilo; la lectura siguiente ya tiene la versión
+        await asyncio.wait_for(reader._pending_refresh, timeout=5)
+        return reader.decode(value)
+
+    assert run(read_twice()) == SAMPLES[1]
+
+
+def test_migrate_recodes_text_rows(dictionary, run):
+    with engine.begin() as conn:
+        conn.execute(insert(LIVE_TABLE), [{"message_type": "BOT", "message_text": text} for text in SAMPLES[:20]])
+
+    assert run(text_codec.migrate()) == 20
+    with engine.connect() as conn:
+        kinds = conn.exec_driver_sql("SELECT DISTINCT typeof(message_text) FROM chat_interactions").scalars().all()
+        texts = conn.execute(select(ChatInteraction.message_text).order_by(ChatInteraction.id)).scalars().all()
+    assert kinds == ["blob"]
+    assert texts == SAMPLES[:20]
@@ -0,0 +1,97 @@
+# tests/test_write_behind.py
+
+import asyncio
+import datetime
+
+import pytest
+from sqlalchemy import func, select
+
+from app.database import engine
+from app.models.interactions import ChatInteraction
+from app.models.users import User
+from app.services import write_behind as write_behind_module
+from app.services.interaction_store import InteractionPair
+from app.services.write_behind import ACK_AFTER_ENQUEUE, ACK_AFTER_FLUSH, WriteBehindQueue
+
+
+def _pairs(prefix: str, count: int) -> list[InteractionPair]:
+    return [InteractionPair(session_id=f"{prefix}-{index}", user_message=f"pregunta {index}",
+                            bot_reply=f"respuesta {index}", context="GENERAL_INQUIRY",
+                            created_at=datetime.datetime(2025, 1, 4))
+            for index in range(count)]
+
+
+def _stored(prefix: str) -> int:
+    with engine.connect() as conn:
+        return conn.execute(
+            select(func.count()).select_from(ChatInteraction)
+            .join(User, User.id == ChatInteraction.user_id).where(User.session_id.like(f"{prefix}-%"))
+        ).scalar()
+
+
+def _queue(ack: str) -> WriteBehindQueue:
+    # Plazo largo: lo que quede en la cola solo se escribe si drain() lo vacía
+    return WriteBehindQueue(batch_size=4, flush_ms=60_000, max_queue=100, ack=ack)
+
+
+def test_enqueue_ack_returns_before_the_commit_and_drain_persists_everything(run):
+    queue = _queue(ACK_AFTER_ENQUEUE)
+
+    async def scenario() -> int:
+        await queue.start()
+        for pair in _pairs("test-wb-enqueue", 10):
+            await queue.submit(pair)
+        # Dos lotes completos (4 + 4) ya van en camino; los 2 restantes esperan el plazo
+        before_drain = _stored("test-wb-enqueue")
+        await queue.drain()
+        return before_drain
+
+    assert run(scenario()) < 20
+    assert _stored("test-wb-enqueue") == 20
+    assert not queue.running
+
+
+def test_flush_ack_waits_for_the_commit_and_drain_flushes_the_partial_batch(run):
+    queue = _queue(ACK_AFTER_FLUSH)
+
+    async def scenario() -> list:
+        await queue.start()
+        submits = [asyncio.create_task(queue.submit(pair)) for pair in _pairs("test-wb-flush", 6)]
+        # El lote de 4 se confirma; los 2 del lote parcial siguen esperando el commit
+        await asyncio.wait(submits[:4], timeout=5)
+        done = [task.done() for task in submits]
+        await queue.drain()
+        await asyncio.gather(*submits)
+        return done
+
+    assert run(scenario()) == [True] * 4 + [False] * 2
+    assert _stored("test-wb-flush") == 12
+
+
+def test_flush_ack_propagates_a_failed_batch(run, monkeypatch):
+    async def failing(pairs):
+        raise RuntimeError("base caída")
+
+    monkeypatch.setattr(write_behind_module, "persist_pairs", failing)
+    queue = _queue(ACK_AFTER_FLUSH)
+
+    async def scenario():
+        await queue.start()
+        submits = [asyncio.create_task(queue.submit(pair)) for pair in _pairs("test-wb-fail", 2)]
+        await asyncio.sleep(0)
+        await queue.drain()
+        return await asyncio.gather(*submits, return_exceptions=True)
+
+    assert [str(error) for error in run(scenario())] == ["base caída"] * 2
+
+
+def test_submit_after_drain_is_refused(run):
+    queue = _queue(ACK_AFTER_ENQUEUE)
+
+    async def scenario():
+        await queue.start()
+        await queue.drain()
+        with pytest.raises(RuntimeError):
+            await queue.submit(_pairs("test-wb-closed", 1)[0])
+
+    run(scenario())